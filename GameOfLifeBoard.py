@@ -22,169 +22,321 @@
 ## SOFTWARE.
 ##
 
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import (QGridLayout, QStyleOption, QStyle, QWidget)
-from PyQt5.QtGui import QPainter
+from PyQt5.QtCore import Qt, QSize, QRect, QRectF, QPointF, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtGui import QPainter, QImage, QColor, QRegion
+from PyQt5 import sip
+
+import math
+import threading
 
 import numpy as np
 
-class GameOfLifeTile(QWidget):
-	""" Custom widget that represents a cell of the game.
+from GameOfLifeModel import BLACK, WHITE, SILVER, DEAD_ONCE, COLOR_MASK
+from GameOfLifeViewport import DensityMipmap, Viewport, aliveMask, coalesceTiles
+
+class GameOfLifeBoard(QWidget):
+	""" Custom widget that displays the cells of the game through a viewport, that can be zoomed (mouse wheel) and panned (dragging with the 
+		right or the middle button, 'F' fits the whole board into the widget again). Only the visible cells are drawn: they are copied into 
+		an indexed QImage (one pixel per cell), scaled to the widget, whose color table is the palette lookup from the states to the colors. 
+		When a cell is smaller than a pixel, the board is drawn from a density mipmap of the alive cells instead, one pixel per block of cells, 
+		so that the cost of a frame depends on the size of the widget and not on the size of the board.
+		The cells changed by a frame are collected into a few rectangles (the tiles whose states changed, merged together), only they are copied 
+		and the regions of the density mipmap covering them recomputed, and the widget is updated once per frame, only in the region covering them.
+		The known patterns found on the board (see GameOfLifeSearch) can be framed and named over the cells.
 
 		Attributes:
-			color       the color of the cell (black: inactive, white: active/alive, green: alive for more than a generation, lime: new born, silver: dead)
-			deadOnce    boolean value which is set to True if a cell has dead once
-			i,j         indices of the cell in the board
 			model       reference to the model
-			notBlack    reference to the list used to keep track of the tiles that are not black
-			aliveCells  reference to the label that display the number of alive cells.
+			rows        number of rows of the board, taken from the model
+			columns     number of columns of the board, taken from the model
+			pixels      matrix of the states of the cells, a copy of the states kept by the model
+			viewport    the mapping between the cells and the pixels of the widget (zoom and pan)
+			mipmap      the density mipmap of the alive cells, updated from the regions of the board that changed
+			aliveCells  reference to the label that display the number of alive cells
+			lock        the lock to hold while modifying the model (shared with the thread computing the generations)
+			editedGeneration  the generation of the model when a cell was last edited by the user
+			profiler    the profiler of the model, it measures the copy of the states ('render') and the repaint ('paint')
+			overlay     the lines of text drawn over the board (e.g. the timings of the profiler), an empty list if there is no overlay
+			scanner     the scanner of the known patterns of the displayed cells, None until they are shown the first time
+			objects     the known patterns found on the displayed cells (ObjectMatch), None if they are not shown
 	"""
 
-	def __init__(self, i, j, model, notBlackList, aliveCellsLabel):
-		""" Init Method """
-		super().__init__()
-
-		self.setFixedWidth(10)
-		self.setFixedHeight(10)
-		self.setStyleSheet("background: black")
-		self.color = "black"
-		self.deadOnce = False
-		self.i = i 
-		self.j = j
-		self.model = model
-		self.notBlack = notBlackList
-		self.aliveCells = aliveCellsLabel
-
-	def paintEvent(self, event):
-		""" re-implementation of paintEvent to show subclass of QWidget """
-		o = QStyleOption()
-		o.initFrom(self)
-		p = QPainter(self)
-		self.style().drawPrimitive(QStyle.PE_Widget, o, p, self) 
-
-	def mousePressEvent(self, event):
-		""" Method to change the color of a cell. If a cell is pressed, by the reference to the model, the related cell in the model is set as active or inactive """
-		if self.color == "black" or self.color == "silver":
-
-			self.setStyleSheet("background: white")
-			self.color = "white"
-			self.model.setCellActive(self.i , self.j )
-			self.notBlack[self.i, self.j] = 1
-
-			self.aliveCells.updateInfoLabel(self.model.getAliveCells())
-
-		elif self.color == "white" and self.deadOnce == False:
+	# the messages for the user (e.g. a cell that cannot be edited), shown by the window in its status bar
+	message = pyqtSignal(str)
 
-			self.setStyleSheet("background: black")
-			self.color = "black" 
-			self.model.setCellInactive(self.i , self.j )
-			self.notBlack[self.i, self.j] = 0
+	# the colors of the states of the cells, indexed by color index (the flag DEAD_ONCE does not change the color)
+	PALETTE = ['black', 'white', 'lime', 'green', 'silver', 'black', 'black', 'black']
 
-			self.aliveCells.updateInfoLabel(self.model.getAliveCells())
+	# the color beyond the edges of the board
+	BACKGROUND = '#303030'
 
-		elif self.color == "white" and self.deadOnce == True:
-
-			self.setStyleSheet("background: silver")
-			self.color = "silver" 
-			self.model.setCellInactive(self.i , self.j )
-
-			self.aliveCells.updateInfoLabel(self.model.getAliveCells())
-
-		else:
+	# the largest number of damaged rectangles repainted separately, more rectangles are repainted as their bounding box
+	MAX_DAMAGED_RECTANGLES = 32
 
-			print('Cell is already occupied.')
+	# the color of the frames and of the names of the known patterns, and the smallest size of a cell (in pixels) for which the names are drawn
+	OBJECTS_COLOR = 'orange'
+	MIN_NAMED_SCALE = 4
 
-
-	def setColor(self, color):
-		""" Method to set the Color of a cell """
-		self.setStyleSheet('background: ' + color)
-		self.color = color
-
-	def getColor(self):
-		""" Method that get the color of a cell """
-		return self.color
-
-	def setDeadOnce(self, value):
-		""" Method to set the 'deadOnce' attribute as True or False """
-		self.deadOnce = value
-
-class GameOfLifeBoard(QGridLayout):
-	""" Custom Grid that contains all the tiles representing the cells.
-
-		Attributes:
-			model       reference to the model
-			tileList    auxiliary list containing the references to the tiles, so that to speed up the color change of the tiles, passing from a state to the next
-			notBlack    matrix used to keep track of tiles that are not black. It is used to update the Board, when clear mode is requested
-			aliveCells  reference to the label that display the number of alive cells
-	""" 
-	def __init__(self, model, aliveCellsLabel):
+	def __init__(self, model, aliveCellsLabel, lock = None):
 		""" Init method """
 		super().__init__()
 
 		self.model = model
-		self.tileList = []
-		self.notBlack = np.zeros((50,86))
+		self.rows, self.columns = self.model.getShape()
 		self.aliveCells = aliveCellsLabel
-		self.setVerticalSpacing(0)
-		self.setHorizontalSpacing(0)
-		for i in range(0,50):#rows
-			for j in range(0,86):#columns
-				aButton = GameOfLifeTile(i,j,self.model,self.notBlack, self.aliveCells)
-				self.addWidget(aButton,i,j)
-				self.tileList.append(aButton)
-
-	def getTile(self, i, j):
-		""" Method to get the tile at position (i,j) """
-		return self.tileList[i+j]
+		self.lock = lock if lock is not None else threading.Lock()
+		self.editedGeneration = -1
+		self.profiler = self.model.getProfiler()
+		self.overlay = []
+		self.overlayRectangle = QRect()
+		self.scanner = None
+		self.objects = None
+
+		self.pixels = np.zeros((self.rows, self.columns), dtype = np.uint8)
+		self.viewport = Viewport(self.rows, self.columns, self.width(), self.height())
+		self.mipmap = DensityMipmap(self.rows, self.columns)
+		self.dragPosition = None
+
+		self.colorTable = [QColor(self.PALETTE[state & COLOR_MASK]).rgb() for state in range(2 * DEAD_ONCE)]
+		# the densities are drawn from dark gray (a few alive cells) to white (only alive cells)
+		self.densityTable = [QColor(0, 0, 0).rgb()] + [QColor(*(3 * [64 + density * 191 // 255])).rgb() for density in range(1, 256)]
+
+		self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+		self.setFocusPolicy(Qt.ClickFocus)
+
+	def sizeHint(self):
+		""" re-implementation of sizeHint, the preferred size of a cell is 10x10 pixels (for boards that fit into the screen) """
+		return QSize(min(self.columns*10, 1280), min(self.rows*10, 800))
+
+	def minimumSizeHint(self):
+		""" re-implementation of minimumSizeHint, a cell needs at least one pixel (unless the board is zoomed out) """
+		return QSize(min(self.columns, 200), min(self.rows, 200))
+
+	def resizeEvent(self, event):
+		""" re-implementation of resizeEvent to resize the viewport """
+		self.viewport.resize(self.width(), self.height())
+		super().resizeEvent(event)
 
-	def updateView(self, currentState, newState, mode):
-		""" Method used to update the board. For this method there are three different modes ('clear' if user wants to clear the board, 
-		'nextStep' to compute the next state of Game of Life, 'load' to load a known pattern). 
-		To speed up the update, this implementation take advantages from sparsity of the model. """
-		if mode == 'clear':
-			findNotBlack = self.notBlack == 1
-			indices = np.argwhere(findNotBlack == True)
-			for el in indices:
-				i,j = el
-				self.getTile(i*86, j).setColor('black')
-				self.getTile(i*86, j).setDeadOnce(False)
-				self.notBlack[i,j] = 0
-		elif mode == 'nextStep':
-			findDifferences = newState != currentState
-			indices = np.argwhere(findDifferences == True)
-			for el in indices:
-				i, j = el
-
-				#dying cells
-				if self.getTile(i*86, j).getColor() == 'white' or self.getTile(i*86, j).getColor() == 'lime' or self.getTile(i*86, j).getColor() == 'green':
-					self.getTile(i*86, j).setColor('silver')
-					self.getTile(i*86, j).setDeadOnce(True)
-					if self.notBlack[i,j] == 0:
-						self.notBlack[i,j] = 1
-				#borning cells
-				elif self.getTile(i*86, j).getColor() == 'silver' or self.getTile(i*86, j).getColor() == 'black':
-					self.getTile(i*86, j).setColor('lime')
-					if self.notBlack[i,j] == 0:
-						self.notBlack[i,j] = 1
-
-			#old cells
-			findEqualities = newState + currentState
-			indices = np.argwhere(findEqualities == 2)
-			for el in indices:
-				i,j = el
-				self.getTile(i*86, j).setColor('green')
-				if self.notBlack[i,j] == 0:
-						self.notBlack[i,j] = 1
-		elif mode == 'load':
-			findDifferences  = newState != currentState
-			indices = np.argwhere(findDifferences == True)
-			for el in indices:
-				i, j = el
-				self.getTile(i*86, j).setColor('white')
-				if self.notBlack[i,j] == 0:
-					self.notBlack[i,j] = 1
-
-
-		
+	def paintEvent(self, event):
+		""" re-implementation of paintEvent to draw the visible cells, or the visible blocks of the density mipmap when the board is zoomed out """
+		with self.profiler.phase('paint'):
+			# only the damaged region of the widget is painted
+			area = event.rect()
+			p = QPainter(self)
+			p.fillRect(area, QColor(self.BACKGROUND))
+
+			k = self.viewport.level(self.mipmap.getLevelCount())
+			if k == 0:
+				values, colorTable = self.pixels, self.colorTable
+			else:
+				values, colorTable = self.mipmap.getLevel(k, self.pixels), self.densityTable
+			top, bottom, left, right = self.viewport.visibleBlocks(k, *values.shape, area.x(), area.y(), area.width(), area.height())
+			if bottom > top and right > left:
+				# the lines of an indexed image must be 32-bit aligned
+				stride = (right - left + 3) // 4 * 4
+				buffer = np.zeros((bottom - top, stride), dtype = np.uint8)
+				buffer[:, :right - left] = values[top:bottom, left:right]
+				image = QImage(sip.voidptr(buffer.ctypes.data), right - left, bottom - top, stride, QImage.Format_Indexed8)
+				image.setColorTable(colorTable)
+				p.drawImage(QRectF(*self.viewport.blockRectangle(k, top, bottom, left, right)), image)
+
+			if self.objects:
+				self.drawObjects(p)
+			if self.overlay:
+				self.drawOverlay(p)
+
+	def drawObjects(self, p):
+		""" Method to frame the known patterns found on the board, with their names if the cells are large enough """
+		p.setPen(QColor(self.OBJECTS_COLOR))
+		named = self.viewport.getScale() >= self.MIN_NAMED_SCALE
+		for match in self.objects:
+			x, y, width, height = self.viewport.blockRectangle(0, match.top, match.bottom, match.left, match.right)
+			p.drawRect(QRectF(x - 1, y - 1, width + 1, height + 1))
+			if named:
+				p.drawText(QPointF(x, y - 3), match.getName())
+
+	def setObjectsVisible(self, visible):
+		""" Method to show or hide the known patterns found on the board. The index of the patterns is built the first time they are shown """
+		if visible:
+			self.findObjects()
+		else:
+			self.objects = None
+		self.update()
+
+	def findObjects(self, rectangles = None):
+		""" Method to find the known patterns on the displayed cells. Only the given rectangles of cells (top, bottom, left, right) are searched again,
+		the cells that changed since the previous search by default. The index is built again if the rule of the model has changed """
+		# imported here, building the index runs models
+		from GameOfLifeSearch import ObjectScanner, PatternIndex
+		# the rule is changed only by the GUI, while the game is paused
+		rule = self.model.getRule()
+		if self.scanner is None or self.scanner.index.rule.name != rule:
+			self.scanner = ObjectScanner(PatternIndex(rule))
+		if self.objects is None:
+			self.scanner.reset()
+		self.objects = self.scanner.scan(aliveMask(self.pixels), rectangles)
+
+	def drawOverlay(self, p):
+		""" Method to draw the lines of the overlay in the upper-left corner of the board, over a translucent background """
+		metrics = p.fontMetrics()
+		p.fillRect(self.overlayRectangle, QColor(0, 0, 0, 160))
+		p.setPen(QColor('yellow'))
+		for k, line in enumerate(self.overlay):
+			p.drawText(4, 4 + k * metrics.height() + metrics.ascent(), line)
+
+	def setOverlay(self, lines):
+		""" Method to set the lines of text drawn over the board (an empty list removes the overlay). Only the region of the overlay is repainted """
+		previous = self.overlayRectangle
+		self.overlay = list(lines)
+		if self.overlay:
+			metrics = self.fontMetrics()
+			self.overlayRectangle = QRect(0, 0, max(metrics.width(line) for line in self.overlay) + 8, metrics.height() * len(self.overlay) + 8)
+		else:
+			self.overlayRectangle = QRect()
+		self.update(QRegion(previous) | QRegion(self.overlayRectangle))
+
+	def cellAt(self, x, y):
+		""" Method to get the indices (i,j) of the cell displayed at the position (x,y) of the widget, None if there is no cell """
+		return self.viewport.cellAt(x, y)
+
+	def getViewport(self):
+		""" Method to get the viewport of the board """
+		return self.viewport
+
+	def fitView(self):
+		""" Method to fit the whole board into the widget """
+		self.viewport.fit()
+		self.update()
+
+	def wheelEvent(self, event):
+		""" re-implementation of wheelEvent to zoom in and out, around the cell under the mouse """
+		self.viewport.zoom(1.25 ** (event.angleDelta().y() / 120), event.pos().x(), event.pos().y())
+		self.update()
+
+	def keyPressEvent(self, event):
+		""" re-implementation of keyPressEvent: 'F' (or Home) fits the whole board into the widget, '+' and '-' zoom in and out """
+		if event.key() in (Qt.Key_F, Qt.Key_Home):
+			self.fitView()
+		elif event.key() in (Qt.Key_Plus, Qt.Key_Equal):
+			self.viewport.zoom(2)
+			self.update()
+		elif event.key() == Qt.Key_Minus:
+			self.viewport.zoom(0.5)
+			self.update()
+		else:
+			super().keyPressEvent(event)
 
+	def mouseMoveEvent(self, event):
+		""" re-implementation of mouseMoveEvent to pan the board while the right or the middle button is pressed """
+		if self.dragPosition is None:
+			return
+		self.viewport.pan(event.x() - self.dragPosition.x(), event.y() - self.dragPosition.y())
+		self.dragPosition = event.pos()
+		self.update()
 
+	def mouseReleaseEvent(self, event):
+		""" re-implementation of mouseReleaseEvent to stop panning the board """
+		if event.button() in (Qt.RightButton, Qt.MiddleButton):
+			self.dragPosition = None
+
+	def mousePressEvent(self, event):
+		""" Method to change the state of a cell. If a cell is pressed, by the reference to the model, the related cell in the model is set as active or inactive.
+		Pressing the right or the middle button starts panning the board """
+		if event.button() in (Qt.RightButton, Qt.MiddleButton):
+			self.dragPosition = event.pos()
+			return
+		cell = self.cellAt(event.x(), event.y())
+		if cell is None:
+			return
+		i, j = cell
+		with self.lock:
+			color = self.model.getCellStates()[i, j] & COLOR_MASK
+
+			if color == BLACK or color == SILVER:
+				self.model.setCellActive(i, j)
+			elif color == WHITE:
+				self.model.setCellInactive(i, j)
+			else:
+				self.message.emit('Cell is already occupied.')
+				return
+
+			# the generations computed before the edit must not be displayed anymore
+			self.editedGeneration = self.model.getGeneration()
+			aliveCells = self.model.getAliveCells()
+			self.pixels[i, j] = self.model.getCellStates()[i, j]
+
+		self.aliveCells.updateInfoLabel(aliveCells)
+		self.damage([(i, i + 1, j, j + 1)])
+
+	def getEditedGeneration(self):
+		""" Method to get the generation of the model when a cell was last edited by the user """
+		return self.editedGeneration
+
+	def getColors(self):
+		""" Method to get the names of the colors of all the cells """
+		return np.array(self.PALETTE)[self.pixels & COLOR_MASK]
+
+	def updateView(self, currentState, newState, mode):
+		""" Method used to update the board. For this method there are five different modes ('clear' if user wants to clear the board, 
+		'nextStep' to compute the next state of Game of Life, 'stepBack' to go back to the previous state, 'load' to load a known pattern, 'rule' when the rule changes). 
+		The states of the cells are copied from the model, then the widget is repainted once: the whole board is a single frame, e.g. a pattern 
+		loaded into a cleared board needs only a 'load' update. In 'nextStep' mode, only the tiles whose states were changed by the step 
+		are copied and repainted. """
+		if mode != 'nextStep':
+			self.editedGeneration = -1
+		states = self.model.getCellStates()
+		tiles = self.model.getUpdatedTiles() if mode == 'nextStep' else None
+		self.drawStates(states, None if tiles is None else coalesceTiles(*tiles, self.rows, self.columns))
+
+	def drawStates(self, states, rectangles = None):
+		""" Method to display the given states of the cells. If the rectangles of cells (top, bottom, left, right) are given, only those are 
+		copied and repainted, otherwise the whole board is copied and repainted as a single frame """
+		with self.profiler.phase('render'):
+			if rectangles is None:
+				self.pixels[:] = states
+			else:
+				for top, bottom, left, right in rectangles:
+					self.pixels[top:bottom, left:right] = states[top:bottom, left:right]
+		self.repainted(rectangles)
+
+	def drawPatches(self, rectangles, patches):
+		""" Method to display the states of the given rectangles of cells (top, bottom, left, right), copied into the patches 
+		(e.g. by the worker, see Frame) """
+		with self.profiler.phase('render'):
+			for (top, bottom, left, right), patch in zip(rectangles, patches):
+				self.pixels[top:bottom, left:right] = patch
+		self.repainted(rectangles)
+
+	def repainted(self, rectangles):
+		""" Method to count the cells repainted (the whole board if the rectangles are None) and to schedule their repaint """
+		if self.profiler.enabled:
+			self.profiler.count('repainted', self.rows * self.columns if rectangles is None else 
+				sum((bottom - top) * (right - left) for top, bottom, left, right in rectangles))
+
+		self.damage(rectangles)
+
+	def damage(self, rectangles = None):
+		""" Method to schedule the repaint of the given rectangles of cells (top, bottom, left, right), the whole board by default.
+		The widget is updated once, in the region covering all the rectangles (their bounding box if they are too many) """
+		if self.objects is not None:
+			self.findObjects(rectangles)
+			# the names of the patterns are drawn out of their cells
+			self.update()
+		if rectangles is None:
+			self.mipmap.invalidate()
+			self.update()
+			return
+		if not rectangles:
+			return
+		for top, bottom, left, right in rectangles:
+			self.mipmap.invalidate(top, bottom, left, right)
+		if len(rectangles) > self.MAX_DAMAGED_RECTANGLES:
+			tops, bottoms, lefts, rights = zip(*rectangles)
+			rectangles = [(min(tops), max(bottoms), min(lefts), max(rights))]
+
+		region = QRegion()
+		for top, bottom, left, right in rectangles:
+			x, y, width, height = self.viewport.blockRectangle(0, top, bottom, left, right)
+			# a margin of two pixels, for the blocks of the mipmap partially covered by the rectangle
+			region = region | QRegion(math.floor(x) - 2, math.floor(y) - 2, math.ceil(width) + 4, math.ceil(height) + 4)
+		self.update(region & QRegion(self.rect()))
@@ -0,0 +1,498 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import concurrent.futures
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from GameOfLifeEngines import createEngine
+from GameOfLifeEnsemble import GameOfLifeEnsemble
+from GameOfLifeModel import GameOfLifeModel
+from GameOfLifePatterns import crop, readPlaintext
+from GameOfLifeRules import parseRule
+
+## THE SOUPS
+
+def randomSoup(seed, index, rows = 16, columns = 16, density = 0.5):
+	""" Function to get the soup with the given index of a census: a board whose cells are alive with the given probability.
+	It depends only on the seed of the census and on the index, so that every process can generate any soup """
+	return np.random.default_rng((seed, index)).random((rows, columns)) < density
+
+def placeSoups(soups, rows, columns):
+	""" Function to place a stack of soups (soups, height, width) in the center of boards of the given size """
+	count, height, width = soups.shape
+	if height > rows or width > columns:
+		raise ValueError('The soups ' + str((height, width)) + ' do not fit the boards ' + str((rows, columns)))
+	boards = np.zeros((count, rows, columns), dtype = np.uint8)
+	top, left = (rows - height) // 2, (columns - width) // 2
+	boards[:, top:top+height, left:left+width] = soups
+	return boards
+
+## THE STABILIZATION
+
+def edgeMask(rows, columns):
+	""" Function to get the cells on the edge of a board (its first and last rows and columns) """
+	edge = np.ones((rows, columns), dtype = bool)
+	edge[1:-1, 1:-1] = False
+	return edge
+
+def removeEscaped(ensemble, edge, packedEdge, escaped):
+	""" Function to remove the objects that reached the edge of the boards of an ensemble (edge and packedEdge: the cells of the edge, dense
+	and packed). The removed objects, cropped to their bounding boxes, are appended to the lists escaped[id] of their boards """
+	touching = (ensemble.words & packedEdge).reshape(len(ensemble), -1).any(axis = 1)
+	for index in np.flatnonzero(touching):
+		cells = ensemble.getCurrentState(index)
+		labels, boxes = labelComponents(cells)
+		for label in np.unique(labels[edge]):
+			if label > 0:
+				escaped[ensemble.getIds()[index]].append(crop(labels[boxes[label - 1]] == label)[0])
+				cells[labels == label] = 0
+		ensemble.setCurrentState(index, cells)
+
+def stabilize(boards, rule = 'B3/S23', topology = 'open', maxGenerations = 10000, maxPeriod = 256):
+	""" Function to run a stack of boards (boards, rows, columns) until every board is periodic: its state is equal to one of its last
+	maxPeriod states (still lifes and oscillators, or an empty board). The boards are advanced together on an ensemble, and every board
+	is removed from it as soon as it is periodic (see GameOfLifeEnsemble.removeStable). On the 'open' topology the boards are windows on an unbounded plane: an object reaching
+	the edge of a board (e.g. an escaping glider) is removed from it, before the dead cells beyond the edge can change it.
+	It returns the final states of the boards, the generation at which every board was found periodic and its period (both -1 if the board
+	was not periodic after maxGenerations), and the list of the objects removed from every board """
+	ensemble = GameOfLifeEnsemble(boards, rule, 'dead' if topology == 'open' else topology, maxPeriod)
+	count = len(ensemble)
+	final = np.zeros((count, ensemble.rows, ensemble.columns), dtype = np.int8)
+	generations = np.full(count, -1, dtype = np.int64)
+	periods = np.full(count, -1, dtype = np.int64)
+	escaped = [[] for _ in range(count)]
+	if topology == 'open':
+		edge = edgeMask(ensemble.rows, ensemble.columns)
+		packedEdge = ensemble.engine.pack(edge)
+		removeEscaped(ensemble, edge, packedEdge, escaped)
+
+	for generation in range(1, maxGenerations + 1):
+		ensemble.nextState()
+		if topology == 'open':
+			removeEscaped(ensemble, edge, packedEdge, escaped)
+		periodic = ensemble.getPeriods() > 0
+		if periodic.any():
+			ids = ensemble.getIds()[periodic]
+			final[ids] = ensemble.engine.unpack(ensemble.words[periodic], ensemble.columns)
+			generations[ids] = generation
+			periods[ids] = ensemble.getPeriods()[periodic]
+			ensemble.removeStable()
+			if len(ensemble) == 0:
+				break
+	if len(ensemble) > 0:
+		final[ensemble.getIds()] = ensemble.getCurrentStates()
+	return final, generations, periods, escaped
+
+## THE OBJECTS
+
+# the objects most often found in the ash of the soups of the Game of Life, in plaintext ('O' alive, '.' dead, rows separated by '/')
+OBJECTS = {
+	'block': 'OO/OO',
+	'blinker': 'OOO',
+	'beehive': '.OO./O..O/.OO.',
+	'loaf': '.OO./O..O/.O.O/..O.',
+	'boat': 'OO./O.O/.O.',
+	'ship': 'OO./O.O/.OO',
+	'tub': '.O./O.O/.O.',
+	'pond': '.OO./O..O/O..O/.OO.',
+	'long boat': 'OO../O.O./.O.O/..O.',
+	'barge': '.O../O.O./.O.O/..O.',
+	'mango': '.OO./O..O/.O..O/..OO.',
+	'eater 1': 'OO../O.O./..O./..OO',
+	'aircraft carrier': 'OO../O..O/..OO',
+	'snake': 'OO.O/O.OO',
+	'toad': '.OOO/OOO.',
+	'beacon': 'OO../OO../..OO/..OO',
+	'traffic light': '..OOO../......./O.....O/O.....O/O.....O/......./..OOO..',
+	'pulsar': ('..OOO...OOO../............./O....O.O....O/O....O.O....O/O....O.O....O/..OOO...OOO../............./'
+	           '..OOO...OOO../O....O.O....O/O....O.O....O/O....O.O....O/............./..OOO...OOO..'),
+	'pentadecathlon': '..O....O../OO.OOOO.OO/..O....O..',
+	'glider': '.O./..O/OOO',
+	'lightweight spaceship': '.O..O/O..../O...O/OOOO.',
+}
+
+def orientations(cells):
+	""" Function to get the 8 orientations (rotations and reflections) of a pattern """
+	return [np.rot90(flipped, k) for flipped in (cells, cells[::-1]) for k in range(4)]
+
+def shapeKey(cells):
+	""" Function to get the key of a pattern which does not depend on its orientation: the smallest encoding ('ROWSxCOLUMNS:packed cells')
+	of its 8 orientations. The pattern must be cropped to its bounding box """
+	return min('%dx%d:%s' % (oriented.shape[0], oriented.shape[1], np.packbits(oriented).tobytes().hex()) for oriented in orientations(cells))
+
+def labelComponents(cells, phases = None, distance = 2):
+	""" Function to label the objects of the alive cells (see components). It returns the labels of the cells (0 for the dead cells,
+	k + 1 for the cells of the k-th object) and the bounding box of every object, as a pair of slices (None for the labels without cells) """
+	import scipy.ndimage as spndmg
+	alive = np.asarray(cells) != 0
+	joined = alive if phases is None else np.asarray(phases) != 0
+	# the cells grown into squares of side 'distance' touch each other if the cells are at most 'distance' apart
+	grown = spndmg.binary_dilation(joined, structure = np.ones((distance, distance), dtype = bool)) if distance > 1 else joined
+	labels, count = spndmg.label(grown, structure = np.ones((3, 3), dtype = bool))
+	labels[~alive] = 0
+	return labels, spndmg.find_objects(labels)
+
+def components(cells, phases = None, distance = 2):
+	""" Function to split the alive cells into objects: two alive cells belong to the same object if they are joined by a chain of alive cells
+	at most 'distance' cells apart. Two objects more than 2 cells apart cannot interact, but the cells of an oscillator can be farther apart
+	in some phases: if the alive cells of all the phases of the board are given (phases), the cells are joined on them.
+	It returns the list of the objects, every one cropped to its bounding box """
+	labels, boxes = labelComponents(cells, phases, distance)
+	return [crop(labels[box] == k + 1)[0] for k, box in enumerate(boxes) if box is not None]
+
+def allPhases(cells, period, engine):
+	""" Function to get the cells alive in at least one of the phases of a periodic board, computed by the given stepping engine """
+	phases = cells == 1
+	engine.reset()
+	for _ in range(period - 1):
+		cells = engine.step(cells)
+		phases |= cells == 1
+	return phases
+
+class CensusObject:
+	"""
+    An object found by a census.
+
+    Attributes:
+        key               the key of the object, which does not depend on its orientation nor on its phase (see ObjectClassifier).
+        name              the name of the object, from the table of the known objects, or a description of its period and population.
+        period            the period of the object (None if it is not periodic).
+        shift             the shift of the object after a period, in absolute value and the smaller first, so that it does not depend on the orientation
+                          ((0, 0) for still lifes and oscillators, None if it is not periodic).
+        population        the number of alive cells of the phase of the key.
+        count             the number of occurrences of the object.
+        soup              the first soup where the object has been found.
+    """
+
+	def __init__(self, key, name, period, shiftRows, shiftColumns, population, count = 0, soup = None):
+		""" Init method """
+		self.key = key
+		self.name = name
+		self.period = period
+		self.shift = None if period is None else (shiftRows, shiftColumns)
+		self.population = population
+		self.count = count
+		self.soup = soup
+
+	def getKind(self):
+		""" Method to get the kind of the object: 'Still lifes', 'Oscillators', 'Spaceships' or 'Unknown' """
+		if self.period is None:
+			return 'Unknown'
+		if self.shift != (0, 0):
+			return 'Spaceships'
+		return 'Still lifes' if self.period == 1 else 'Oscillators'
+
+class ObjectClassifier:
+	"""
+    Classifier of the objects of the ash. An object is run alone on a board with a margin around it until it repeats, which gives its period
+    and its shift, and its key is the smallest shape key (see shapeKey) of its phases, so that it depends neither on the orientation nor
+    on the phase of the object. The objects of the table of the known objects are named.
+    The key of every phase is cached, so that an object already met is classified without running it.
+
+    Attributes:
+        rule              the compiled rule.
+        maxPeriod         the maximum period detected: an object that does not repeat within maxPeriod generations is not periodic.
+        cache             dictionary {shape key of a phase: CensusObject}.
+        seen              dictionary {(shape, packed cells) of an object as it has been found: CensusObject}, checked before computing the shape key.
+        names             dictionary {key of an object: name}, the known objects.
+        phases            dictionary {key of an object: its phases, cropped to their bounding boxes (only the first one if it is not periodic)}.
+    """
+
+	def __init__(self, rule = 'B3/S23', maxPeriod = 256, objects = None):
+		""" Init method. It accepts the rule, the maximum period and the table of the known objects ({name: plaintext}, OBJECTS by default) """
+		self.rule = parseRule(rule)
+		self.maxPeriod = maxPeriod
+		self.cache = {}
+		self.seen = {}
+		self.names = {}
+		self.phases = {}
+		for name, text in (OBJECTS if objects is None else objects).items():
+			self.names[self.classify(readPlaintext(text.replace('/', '\n'))).key] = name
+		# the objects already classified take their names
+		for entry in self.cache.values():
+			entry.name = self.names.get(entry.key, entry.name)
+
+	def describe(self, key, period, shift, population):
+		""" Method to get the name of an object: its name in the table of the known objects, or a description of its period and population """
+		if key in self.names:
+			return self.names[key]
+		if period is None:
+			return 'unknown (%d cells)' % population
+		if shift != (0, 0):
+			return 'spaceship p%d, shift %s (%d cells)' % (period, shift, population)
+		return 'still life (%d cells)' % population if period == 1 else 'oscillator p%d (%d cells)' % (period, population)
+
+	def classify(self, cells):
+		""" Method to classify an object (cropped to its bounding box). It returns its CensusObject (with a count of 0) """
+		cells = np.asarray(cells) != 0
+		found = (cells.shape, np.packbits(cells).tobytes())
+		if found in self.seen:
+			return self.seen[found]
+		phaseKey = shapeKey(cells)
+		if phaseKey not in self.cache:
+			self.cache[phaseKey] = self.run(cells, phaseKey)
+		self.seen[found] = self.cache[phaseKey]
+		return self.seen[found]
+
+	def run(self, cells, phaseKey):
+		""" Method to classify a new object, running it alone. The keys of all its phases are cached """
+		margin = self.maxPeriod // 2 + 2
+		height, width = cells.shape
+		model = GameOfLifeModel(height + 2 * margin, width + 2 * margin, 'bitpacked' if self.rule.isLifeLike() else 'convolution',
+		                        historySize = self.maxPeriod + 1, rule = self.rule)
+		model.setCells(np.nonzero(cells) + np.array([[margin], [margin]]), 1)
+		phases = [(phaseKey, int(cells.sum()))]
+		shapes = [cells]
+		for _ in range(self.maxPeriod):
+			model.nextState()
+			if model.getCycle() is not None:
+				break
+			phase = crop(model.getCurrentState() == 1)[0]
+			phases.append((shapeKey(phase), int(phase.sum())))
+			shapes.append(phase)
+
+		cycle = model.getCycle()
+		if cycle is None or cycle[2] != 0:
+			# the object changes before repeating (e.g. it was kept still by the dead edge of the board): it is known by its first phase only
+			self.phases[phaseKey] = [cells]
+			return CensusObject(phaseKey, self.describe(phaseKey, None, None, phases[0][1]), None, None, None, phases[0][1])
+		period, shift, _ = cycle
+		shift = tuple(sorted((abs(shift[0]), abs(shift[1]))))
+		key, population = min(phases[:period])
+		entry = CensusObject(key, self.describe(key, period, shift, population), period, shift[0], shift[1], population)
+		self.phases[key] = shapes[:period]
+		for phase, _ in phases[:period]:
+			self.cache[phase] = entry
+		return entry
+
+## THE CENSUS
+
+DEFAULT_SETTINGS = {
+	'rule': 'B3/S23',
+	'topology': 'open',
+	'rows': 128,
+	'columns': 128,
+	'soupRows': 16,
+	'soupColumns': 16,
+	'density': 0.5,
+	'seed': 0,
+	'maxGenerations': 10000,
+	'maxPeriod': 256,
+	'batchSize': 256,
+}
+
+def censusSettings(settings = None):
+	""" Function to get the settings of a census: the given ones (a dictionary), and the default ones for the settings not given """
+	settings = dict(settings or {})
+	unknown = sorted(set(settings) - set(DEFAULT_SETTINGS))
+	if unknown:
+		raise ValueError('Unknown census settings: ' + ', '.join(unknown) + '. Available settings are ' + ', '.join(DEFAULT_SETTINGS))
+	settings = dict(DEFAULT_SETTINGS, **settings)
+	settings['rule'] = parseRule(settings['rule']).name
+	return settings
+
+# the classifier of the objects of this process, kept between the batches (see censusBatch)
+classifier = None
+# the classifier of the objects escaped from the boards, which are mostly debris of reactions cut by the edge: they are run for a few
+# generations only, enough to recognize the spaceships of the soups (the gliders and the spaceships of period 4 of the Game of Life)
+escapeClassifier = None
+ESCAPE_PERIOD = 16
+
+def censusBatch(settings, first, count):
+	""" Function to run the soups [first, first + count) of a census: they are stabilized, the objects of every periodic soup are classified.
+	It returns the outcome of every soup (soup, generations, period, population, objects) and the objects found,
+	as a dictionary {key: CensusObject}. The soups that are not periodic after maxGenerations have a period of -1, and their objects are not counted.
+	The objects touching the edge of a board are not counted (debris of the dead edge, or objects split by the edges of a torus),
+	and on the 'open' topology the spaceships that escaped from the board (with a period up to ESCAPE_PERIOD) are counted """
+	global classifier, escapeClassifier
+	if classifier is None or classifier.rule.name != settings['rule'] or classifier.maxPeriod != settings['maxPeriod']:
+		classifier = ObjectClassifier(settings['rule'], settings['maxPeriod'])
+		escapeClassifier = ObjectClassifier(settings['rule'], min(ESCAPE_PERIOD, settings['maxPeriod']))
+	topology = 'dead' if settings['topology'] == 'open' else settings['topology']
+	engine = createEngine('bitpacked', settings['rule'], topology)
+	edge = edgeMask(settings['rows'], settings['columns'])
+
+	soups = np.stack([randomSoup(settings['seed'], index, settings['soupRows'], settings['soupColumns'], settings['density'])
+	                  for index in range(first, first + count)])
+	final, generations, periods, escaped = stabilize(placeSoups(soups, settings['rows'], settings['columns']), settings['rule'],
+	                                                 settings['topology'], settings['maxGenerations'], settings['maxPeriod'])
+	outcomes = []
+	objects = {}
+
+	def record(entry, soup):
+		if entry.key not in objects:
+			objects[entry.key] = CensusObject(entry.key, entry.name, entry.period, *(entry.shift or (None, None)), entry.population, soup = soup)
+		objects[entry.key].count += 1
+
+	for k, cells in enumerate(final):
+		found = 0
+		if periods[k] > 0:
+			labels, boxes = labelComponents(cells, allPhases(cells, periods[k], engine))
+			border = set(np.unique(labels[edge]))
+			for label, box in enumerate(boxes, 1):
+				if box is not None and label not in border:
+					record(classifier.classify(crop(labels[box] == label)[0]), first + k)
+					found = found + 1
+			for component in escaped[k]:
+				entry = escapeClassifier.classify(component)
+				if entry.getKind() == 'Spaceships':
+					record(entry, first + k)
+					found = found + 1
+		outcomes.append((first + k, int(generations[k]), int(periods[k]), int(np.count_nonzero(cells)), found))
+	return outcomes, objects
+
+class CensusStore:
+	"""
+    Store of the results of a census, kept in a SQLite database: the settings of the census, the batches of soups completed,
+    the outcome of every soup (generations run, period, final population and number of objects) and the number of occurrences of every object.
+    Every batch is written in a single transaction, so that an interrupted census is resumed from the batches that were not completed.
+
+    Attributes:
+        path              the path of the database.
+        connection        the connection to the database.
+    """
+
+	def __init__(self, path):
+		""" Init method. It opens the database in the given path, creating it if it does not exist """
+		self.path = path
+		directory = os.path.dirname(path)
+		if directory and not os.path.exists(directory):
+			os.makedirs(directory)
+		self.connection = sqlite3.connect(path)
+		self.connection.executescript('''
+			CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT);
+			CREATE TABLE IF NOT EXISTS batches (first INTEGER PRIMARY KEY, count INTEGER, seconds REAL);
+			CREATE TABLE IF NOT EXISTS soups (soup INTEGER PRIMARY KEY, generations INTEGER, period INTEGER, population INTEGER, objects INTEGER);
+			CREATE TABLE IF NOT EXISTS objects (key TEXT PRIMARY KEY, name TEXT, period INTEGER, shiftRows INTEGER, shiftColumns INTEGER,
+				population INTEGER, count INTEGER, soup INTEGER);''')
+		self.connection.commit()
+
+	def close(self):
+		""" Method to close the database """
+		self.connection.close()
+
+	def getSettings(self):
+		""" Method to get the settings of the census (None if no census has been run in the store) """
+		rows = self.connection.execute('SELECT name, value FROM settings').fetchall()
+		return {name: json.loads(value) for name, value in rows} if rows else None
+
+	def setSettings(self, settings):
+		""" Method to set the settings of the census. It raises a ValueError if the store holds a census run with different settings """
+		stored = self.getSettings()
+		if stored is None:
+			self.connection.executemany('INSERT INTO settings VALUES (?, ?)', [(name, json.dumps(value)) for name, value in settings.items()])
+			self.connection.commit()
+		elif stored != settings:
+			different = sorted(name for name in set(stored) | set(settings) if stored.get(name) != settings.get(name))
+			raise ValueError('The census in ' + self.path + ' has been run with different settings: ' +
+			                 ', '.join('%s %s (not %s)' % (name, stored.get(name), settings.get(name)) for name in different))
+
+	def getCompletedBatches(self):
+		""" Method to get the batches completed, as a list of (first soup, number of soups) """
+		return self.connection.execute('SELECT first, count FROM batches ORDER BY first').fetchall()
+
+	def addBatch(self, first, count, seconds, outcomes, objects):
+		""" Method to record a batch of soups, with the outcomes of the soups and the objects found (see censusBatch) """
+		with self.connection:
+			self.connection.executemany('INSERT OR REPLACE INTO soups VALUES (?, ?, ?, ?, ?)', outcomes)
+			self.connection.executemany('''INSERT INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+				ON CONFLICT (key) DO UPDATE SET count = count + excluded.count, soup = min(soup, excluded.soup)''',
+				[(entry.key, entry.name, entry.period, *(entry.shift or (None, None)), entry.population, entry.count, entry.soup)
+				 for entry in objects.values()])
+			self.connection.execute('INSERT INTO batches VALUES (?, ?, ?)', (first, count, seconds))
+
+	def getSoupCount(self):
+		""" Method to get the number of soups recorded """
+		return self.connection.execute('SELECT COUNT(*) FROM soups').fetchone()[0]
+
+	def getSeconds(self):
+		""" Method to get the time spent computing the batches recorded (summed over the processes) """
+		return self.connection.execute('SELECT COALESCE(SUM(seconds), 0) FROM batches').fetchone()[0]
+
+	def getCensus(self, kind = None):
+		""" Method to get the objects found (CensusObject), the most common first, filtered by kind (see CensusObject.getKind) """
+		rows = self.connection.execute('''SELECT key, name, period, shiftRows, shiftColumns, population, count, soup FROM objects
+			ORDER BY count DESC, key''')
+		return [entry for entry in (CensusObject(*row) for row in rows) if kind is None or entry.getKind() == kind]
+
+	def getSoups(self, limit = 10):
+		""" Method to get the outcomes (soup, generations, period, population, objects) of the soups that ran longest before becoming periodic,
+		followed by the ones that never became periodic """
+		return self.connection.execute('''SELECT soup, generations, period, population, objects FROM soups
+			ORDER BY period < 0, generations DESC, soup LIMIT ?''', (limit,)).fetchall()
+
+def timedBatch(settings, first, count):
+	""" Function to run a batch of soups (see censusBatch). It returns the time spent and the result of the batch """
+	start = time.perf_counter()
+	result = censusBatch(settings, first, count)
+	return time.perf_counter() - start, result
+
+def runCensus(path, soups, settings = None, workers = None, progress = None):
+	""" Function to run a census of the soups [0, soups), recorded into the store in the given path (see CensusStore). The settings are a dictionary
+	(see DEFAULT_SETTINGS); a store can be resumed, or extended to more soups, only with the settings it has been run with: the batches already completed are skipped.
+	The batches are computed on a pool of 'workers' processes (by default, one per core; with a single worker, in this process).
+	If given, progress(soups recorded, soups computed by this run, seconds) is called after every batch. It returns the store """
+	settings = censusSettings(settings)
+	store = CensusStore(path)
+	store.setSettings(settings)
+	size = settings['batchSize']
+	# the soups of every batch already recorded (the last batch of a census can be completed by a longer one)
+	done = {}
+	for first, count in store.getCompletedBatches():
+		done[first // size * size] = done.get(first // size * size, 0) + count
+	pending = [(first + done.get(first, 0), min(size, soups - first) - done.get(first, 0)) for first in range(0, soups, size)
+	           if done.get(first, 0) < min(size, soups - first)]
+	workers = workers or os.cpu_count() or 1
+	start = time.perf_counter()
+	computed = [0]
+
+	def record(first, count, seconds, result):
+		store.addBatch(first, count, seconds, *result)
+		computed[0] = computed[0] + count
+		if progress is not None:
+			progress(store.getSoupCount(), computed[0], time.perf_counter() - start)
+
+	if workers == 1:
+		for first, count in pending:
+			record(first, count, *timedBatch(settings, first, count))
+		return store
+
+	with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as pool:
+		# two batches per process are queued, so that the completed batches are recorded while the others run
+		running = {}
+		pending.reverse()
+		while pending or running:
+			while pending and len(running) < 2 * workers:
+				first, count = pending.pop()
+				running[pool.submit(timedBatch, settings, first, count)] = (first, count)
+			done, _ = concurrent.futures.wait(running, return_when = concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				first, count = running.pop(future)
+				record(first, count, *future.result())
+	return store
@@ -0,0 +1,682 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import concurrent.futures
+import os
+
+import numpy as np
+
+from GameOfLifeRules import LIFE, lookup, matchCubes, parseRule
+
+## THE STEPPING ENGINES
+
+# number of alive cells in every byte value of a packed board
+POPULATION = np.array([bin(value).count('1') for value in range(256)], dtype = np.int64)
+
+# the 8 cells (0/1 bytes) of every byte value of a packed board, read as a single uint64, to unpack a board with a lookup
+UNPACKED = np.array([[value >> k & 1 for k in range(8)] for value in range(256)], dtype = np.uint8).view(np.uint64).ravel()
+
+# Every engine provides step(cells, out = None), which returns the next state of the cells (written into out, if it is given:
+# an array with the shape of the cells and the dtype of the rule, which must not be the cells), reset(), which drops any cached state,
+# setRule(rule), which selects the compiled rule (see GameOfLifeRules) or raises a ValueError if the engine does not support it,
+# and setTopology(topology), which selects what is beyond the edges of the board.
+# After a step, the attribute 'population' is the number of alive cells of the returned state.
+
+# the topologies of the board: the cells beyond the edges are dead ('dead'), the edges are glued to the opposite ones ('torus'),
+# the left and right edges are glued and the top and bottom ones are glued reversed ('klein', a Klein bottle), 
+# or the cells beyond an edge mirror the ones inside it ('reflect')
+TOPOLOGIES = ['dead', 'torus', 'klein', 'reflect']
+
+def checkTopology(topology):
+	""" Function to check the name of a topology """
+	if topology not in TOPOLOGIES:
+		raise ValueError('Unknown topology: ' + str(topology) + '. Available topologies are ' + ', '.join(TOPOLOGIES))
+
+def haloIndices(n, r, topology):
+	""" Function to get the index, on an axis of n cells, of every cell of the axis padded with a halo of width r (r may be larger than n):
+	the halo wraps around the axis, or it mirrors the axis and the mirrored cells are mirrored again ('reflect') """
+	indices = np.arange(-r, n + r)
+	if topology == 'reflect':
+		indices = indices % (2 * n)
+		return np.where(indices < n, indices, 2 * n - 1 - indices)
+	return indices % n
+
+def fillHalo(padded, r, rows, columns, topology):
+	""" Function to fill the halo of width r around a board stored in padded[r:r+rows, r:r+columns], according to the topology.
+	The halo of a dead border is left as it is (it is kept dead) """
+	if topology == 'dead':
+		return
+	board = padded[r:r+rows, r:r+columns]
+	if r > rows or r > columns:
+		# the halo is wider than the board: it is made of several copies of the board, read by index
+		rowIndices, columnIndices = haloIndices(rows, r, topology), haloIndices(columns, r, topology)
+		halo = board[np.ix_(rowIndices, columnIndices)]
+		if topology == 'klein':
+			# every time the rows wrap, the columns are reversed
+			flipped = (np.arange(-r, rows + r) // rows) % 2 == 1
+			halo[flipped] = board[np.ix_(rowIndices[flipped], columnIndices[::-1])]
+		padded[:2*r+rows, :2*r+columns] = halo
+		return
+	if topology == 'reflect':
+		padded[r:r+rows, :r] = board[:, :r][:, ::-1]
+		padded[r:r+rows, r+columns:2*r+columns] = board[:, columns-r:][:, ::-1]
+	else:
+		padded[r:r+rows, :r] = board[:, columns-r:]
+		padded[r:r+rows, r+columns:2*r+columns] = board[:, :r]
+	# the rows are copied with their halo, so that the corners are filled too
+	full = padded[r:r+rows, :2*r+columns]
+	if topology == 'torus':
+		padded[:r, :2*r+columns] = full[rows-r:]
+		padded[r+rows:2*r+rows, :2*r+columns] = full[:r]
+	elif topology == 'klein':
+		padded[:r, :2*r+columns] = full[rows-r:, ::-1]
+		padded[r+rows:2*r+rows, :2*r+columns] = full[:r, ::-1]
+	else:
+		padded[:r, :2*r+columns] = full[:r][::-1]
+		padded[r+rows:2*r+rows, :2*r+columns] = full[rows-r:][::-1]
+
+class ConvolutionEngine:
+	"""
+    Stepping engine based on the convolution of the alive cells with the neighbourhood of the rule, which gives the number
+    of alive neighbours of every cell; the next states are read from the lookup table of the rule.
+    It supports every rule: the square neighbourhoods of larger radius are summed with a summed-area table, so that
+    their cost does not depend on the radius.
+    The topology is the boundary mode of the convolution; on the Klein bottle, the rows along the top and bottom edges
+    are computed again on thin bands whose halo is reversed.
+
+    Attributes:
+        name              the name used to select the engine on the model.
+        rule              the compiled rule.
+        topology          the topology of the board.
+        population        the number of alive cells after the last step.
+        scratch           the buffers reused by the steps (alive cells, codes and comparisons), reallocated when the shape of the board changes.
+    """
+
+	# the boundary modes of the convolution implementing the topologies (the rows of the Klein bottle are fixed afterwards)
+	MODES = {'dead': 'constant', 'torus': 'wrap', 'klein': 'wrap', 'reflect': 'reflect'}
+
+	name = 'convolution'
+
+	def __init__(self):
+		""" Init method. Scipy is imported here, so that the other engines start without it """
+		import scipy.ndimage as spndmg
+		self.convolve = spndmg.convolve
+		self.rule = LIFE
+		self.topology = 'dead'
+		self.population = 0
+		self.scratch = None
+
+	def setRule(self, rule):
+		""" Method to select the rule. Every rule is supported """
+		self.rule = rule
+
+	def setTopology(self, topology):
+		""" Method to select the topology of the board. Every topology is supported """
+		checkTopology(topology)
+		self.topology = topology
+
+	def correlate(self, values, kernel, output = None):
+		""" Method to convolve the values with a (symmetric) kernel, the cells beyond the edges given by the topology.
+		The result is written into output, if it is given """
+		result = self.convolve(values, kernel, output = output, mode = self.MODES[self.topology], cval = 0)
+		if output is not None:
+			result = output
+		if self.topology == 'klein':
+			# the rows wrap with the columns reversed: the first and the last rows are computed on bands with the right halo
+			r = kernel.shape[0] // 2
+			if values.shape[0] < 2 * r:
+				# the bands would be higher than the board: the whole board is computed with its halo
+				rows, columns = values.shape
+				padded = np.zeros((rows + 2 * r, columns + 2 * r), dtype = values.dtype)
+				padded[r:r+rows, r:r+columns] = values
+				fillHalo(padded, r, rows, columns, 'klein')
+				result[...] = self.convolve(padded, kernel, mode = 'constant', cval = 0)[r:r+rows, r:r+columns]
+				return result
+			top = np.concatenate((values[-r:, ::-1], values[:2*r]))
+			result[:r] = self.convolve(top, kernel, mode = 'wrap')[r:2*r]
+			bottom = np.concatenate((values[-2*r:], values[:r, ::-1]))
+			result[-r:] = self.convolve(bottom, kernel, mode = 'wrap')[r:2*r]
+		return result
+
+	def neighbours(self, alive):
+		""" Method to count the alive neighbours of every cell """
+		rule = self.rule
+		if rule.neighbourhood == 'N' or rule.radius == 1:
+			return self.correlate(alive.astype(np.int32), rule.kernel)
+		# the sum of a square is read from the summed-area table in four lookups
+		r = rule.radius
+		rows, columns = alive.shape
+		table = np.zeros((rows + 2 * r + 1, columns + 2 * r + 1), dtype = np.int32)
+		table[r+1:-r, r+1:-r] = alive
+		fillHalo(table[1:, 1:], r, rows, columns, self.topology)
+		table = table.cumsum(axis = 0).cumsum(axis = 1)
+		d = 2 * r + 1
+		counts = table[d:, d:] - table[:-d, d:] - table[d:, :-d] + table[:-d, :-d]
+		return counts if rule.middle else counts - alive
+
+	def buffers(self, shape):
+		""" Method to get the scratch buffers (alive cells and codes as uint8, comparisons) for a board of the given shape """
+		if self.scratch is None or self.scratch[0].shape != shape:
+			self.scratch = (np.empty(shape, dtype = np.uint8), np.empty(shape, dtype = np.uint8), np.empty(shape, dtype = bool))
+		return self.scratch
+
+	def step(self, cells, out = None):
+		""" Method to compute the next state of the given cells """
+		rule = self.rule
+		alive, codes, mask = self.buffers(cells.shape)
+		if rule.states == 2 and (rule.neighbourhood == 'N' or rule.radius == 1):
+			# the center of the kernel is weighted 'stride', so that the convolution gives the codes of the cells
+			kernel = rule.kernel.copy()
+			kernel[rule.radius, rule.radius] += rule.stride
+			if 2 * rule.stride <= 256:
+				np.equal(cells, 1, out = alive.view(bool))
+				codes = self.correlate(alive, kernel.astype(np.uint8), codes)
+			else:
+				codes = self.correlate((cells == 1).astype(np.int32), kernel)
+		else:
+			codes = self.neighbours(cells == 1) + rule.stride * cells.astype(np.int32)
+		result = rule.nextStates(codes, out, mask)
+		self.population = np.count_nonzero(result) if rule.states == 2 else np.count_nonzero(np.equal(result, 1, out = mask))
+		return result
+
+	def reset(self):
+		""" Method to drop any cached state. The convolution engine keeps none """
+		pass
+
+
+class BitPackedEngine:
+	"""
+    Stepping engine that stores the board bit-packed, 64 cells per uint64 word (bit k of word w is the column 64*w + k).
+    The neighbours are obtained by shifting the packed rows, and they are summed with bitwise full-adder logic,
+    so that 64 cells are computed by every word operation.
+    The count is kept in 3 or 4 bit planes, and the births and the survivals are the bitwise expressions compiled by the rule.
+    It supports the rules on the 8 nearest neighbours, Generations rules included: the dying states of the cells are kept
+    as a binary counter on bit planes, which ages all the dying cells with a few word operations.
+    The packed board is kept between two steps, and it is rebuilt from the dense cells only after a reset
+    (i.e. when the model has been edited, cleared or loaded). It can also be stepped without unpacking it (stepWords), so that the model
+    unpacks the dense cells only when they are read (see unpackCells).
+    The topology is implemented by the shifts, which bring the bits beyond the first and the last column from the other
+    edge (or from the same one, when reflecting), and by a halo row added to the counts of the first and of the last row.
+
+    Attributes:
+        name              the name used to select the engine on the model.
+        rule              the compiled rule.
+        topology          the topology of the board.
+        words             the packed board of the alive cells, an array of shape (rows, ceil(columns/64)) of uint64.
+        dying             the bit planes of the dying cells (Generations rules only): bit k of the counter is (state - 1) of the cell.
+        columns           the number of columns of the dense board.
+        lastCells         the dense cells returned by the last step, used to know if the packed board is still valid
+                          (None if the packed board has been stepped without unpacking it).
+        population        the number of alive cells after the last step, counted on the packed board.
+        scratch           the buffer where the board is unpacked, whole words per row, reused by the steps.
+    """
+
+	name = 'bitpacked'
+	# the packed board can be the state of the model, unpacked on demand (see stepWords)
+	packed = True
+
+	def __init__(self):
+		""" Init method """
+		self.rule = LIFE
+		self.topology = 'dead'
+		self.words = None
+		self.dying = None
+		self.columns = 0
+		self.lastCells = None
+		self.population = 0
+		self.scratch = None
+
+	def setRule(self, rule):
+		""" Method to select the rule. Only the rules on the 8 nearest neighbours are supported """
+		if not rule.isLifeLike():
+			raise ValueError('The ' + self.name + ' engine supports only the rules on the 8 nearest neighbours, not ' + rule.name)
+		self.rule = rule
+		self.reset()
+
+	def setTopology(self, topology):
+		""" Method to select the topology of the board. Every topology is supported """
+		checkTopology(topology)
+		self.topology = topology
+
+	def reset(self):
+		""" Method to drop the packed board, so that it is rebuilt from the dense cells at the next step """
+		self.words = None
+		self.dying = None
+		self.lastCells = None
+
+	def load(self, cells):
+		""" Method to build the packed board (and the planes of the dying cells) from dense cells """
+		self.words = self.pack(cells == 1)
+		self.columns = cells.shape[-1]
+		if self.rule.states > 2:
+			age = np.where(cells >= 2, cells - 1, 0).astype(np.int64)
+			self.dying = [self.pack(age >> k & 1) for k in range((self.rule.states - 1).bit_length())]
+
+	def pack(self, cells):
+		""" Method to pack a dense board of 0/1 values into rows of uint64 words. Stacks of boards (..., rows, columns) are packed too """
+		columns = cells.shape[-1]
+		nWords = (columns + 63) // 64
+		padded = np.zeros(cells.shape[:-1] + (nWords * 64,), dtype = np.uint8)
+		padded[..., :columns] = cells != 0
+		packed = np.packbits(padded, axis = -1, bitorder = 'little')
+		return packed.view(np.dtype('<u8')).astype(np.uint64)
+
+	def count(self, words):
+		""" Method to count the alive cells of a packed board """
+		return int(POPULATION[words.view(np.uint8)].sum())
+
+	def unpack(self, words, columns):
+		""" Method to unpack rows of uint64 words into a dense int8 board with the given number of columns """
+		packed = words.astype(np.dtype('<u8')).view(np.uint8)
+		return np.unpackbits(packed, axis = -1, count = columns, bitorder = 'little').view(np.int8)
+
+	def unpackInto(self, words, out):
+		""" Method to unpack a packed board into the given dense board, one lookup per byte into the scratch buffer """
+		packed = np.asarray(words, dtype = np.dtype('<u8')).view(np.uint8)
+		if self.scratch is None or self.scratch.shape != packed.shape:
+			self.scratch = np.empty(packed.shape, dtype = np.uint64)
+		lookup(UNPACKED, packed, self.scratch)
+		np.copyto(out, self.scratch.view(np.int8)[..., :out.shape[-1]])
+		return out
+
+	def cells(self, out = None):
+		""" Method to get the dense cells of the packed board, with the states of the dying cells. They are written into out, if it is given """
+		if self.dying is None:
+			return self.unpack(self.words, self.columns) if out is None else self.unpackInto(self.words, out)
+		cells = self.unpack(self.words, self.columns)
+		age = sum(self.unpack(plane, self.columns).astype(np.int64) << k for k, plane in enumerate(self.dying))
+		cells = np.where(age > 0, age + 1, cells).astype(self.rule.dtype)
+		if out is None:
+			return cells
+		np.copyto(out, cells)
+		return out
+
+	def flip(self, words, columns):
+		""" Method to reverse the columns of a packed board """
+		return self.pack(self.unpack(words, columns)[..., ::-1])
+
+	def haloRows(self, words, columns):
+		""" Method to get the rows beyond the first and the last row of a packed board (above, below), according to the topology.
+		They are None if the cells beyond the edges are dead """
+		if self.topology == 'torus':
+			return words[..., -1:, :], words[..., :1, :]
+		if self.topology == 'klein':
+			return self.flip(words[..., -1:, :], columns), self.flip(words[..., :1, :], columns)
+		if self.topology == 'reflect':
+			return words[..., :1, :], words[..., -1:, :]
+		return None, None
+
+	def shifts(self, words, columns):
+		""" Method to get the planes of the west and of the east neighbours of a packed board (the carry crosses the boundary between two
+		adjacent words). The cells beyond the first and the last column are given by the topology """
+		one = np.uint64(1)
+		high = np.uint64(63)
+		west = words << one
+		west[..., 1:] |= words[..., :-1] >> high
+		east = words >> one
+		east[..., :-1] |= words[..., 1:] << high
+		if self.topology != 'dead':
+			last = np.uint64((columns - 1) % 64)
+			if self.topology == 'reflect':
+				west[..., 0] |= words[..., 0] & one
+				east[..., -1] |= words[..., -1] & (one << last)
+			else:
+				west[..., 0] |= (words[..., -1] >> last) & one
+				east[..., -1] |= (words[..., 0] & one) << last
+		return west, east
+
+	def nextWords(self, words, columns, dying = None, above = None, below = None):
+		""" Method to compute the next generation of a packed board, or of a stack of packed boards. The dying cells (if given) cannot be born.
+		The rows above the first row and below the last one (see haloRows) are dead if they are not given """
+		# horizontal neighbours
+		west, east = self.shifts(words, columns)
+
+		# full-adder over the 8 neighbour planes, the count is kept in the bit planes 'counts' (modulo 8 if they are 3)
+		counts = [np.zeros_like(words) for _ in range(self.rule.countBits)]
+		for plane in (west, east):
+			self.add(plane, counts, slice(None), slice(None))
+		for plane in (words, west, east):
+			# neighbours in the row above and in the row below
+			self.add(plane, counts, slice(1, None), slice(None, -1))
+			self.add(plane, counts, slice(None, -1), slice(1, None))
+		for halo, target in ((above, slice(None, 1)), (below, slice(-1, None))):
+			if halo is not None:
+				for plane in (halo,) + self.shifts(halo, columns):
+					self.add(plane, counts, target, slice(None))
+
+		born = matchCubes(self.rule.birthCubes, counts, words)
+		if dying is not None:
+			born &= ~dying
+		result = (born & ~words) | (matchCubes(self.rule.survivalCubes, counts, words) & words)
+
+		# clearing the padding bits of the last word
+		tail = columns % 64
+		if tail:
+			result[..., -1] &= np.uint64((1 << tail) - 1)
+		return result
+
+	def add(self, plane, counts, target, source):
+		""" Method to add the rows 'source' of a neighbour plane to the rows 'target' of the counter bits """
+		target = (Ellipsis, target, slice(None))
+		carry = plane[Ellipsis, source, :]
+		for bits in counts[:-1]:
+			nextCarry = bits[target] & carry
+			bits[target] ^= carry
+			carry = nextCarry
+		counts[-1][target] ^= carry
+
+	def nextDying(self, words, newWords):
+		""" Method to age the dying cells (the last dying state becomes dead), and to make the cells that died start dying """
+		dying = np.zeros_like(words)
+		for plane in self.dying:
+			dying |= plane
+		# binary increment of the counters of the dying cells
+		carry = dying
+		for k, plane in enumerate(self.dying):
+			self.dying[k], carry = plane ^ carry, plane & carry
+		last = dying.copy()
+		for k, plane in enumerate(self.dying):
+			last &= plane if (self.rule.states - 1) >> k & 1 else ~plane
+		start = words & ~newWords
+		for k, plane in enumerate(self.dying):
+			self.dying[k] = plane & ~last & ~start
+		self.dying[0] |= start
+
+	def advanceWords(self):
+		""" Method to compute the next generation of the packed board, and its population """
+		above, below = self.haloRows(self.words, self.columns)
+		if self.dying is None:
+			self.words = self.nextWords(self.words, self.columns, None, above, below)
+		else:
+			dying = np.zeros_like(self.words)
+			for plane in self.dying:
+				dying |= plane
+			newWords = self.nextWords(self.words, self.columns, dying, above, below)
+			self.nextDying(self.words, newWords)
+			self.words = newWords
+		self.population = self.count(self.words)
+
+	def step(self, cells, out = None):
+		""" Method to compute the next state of the given cells """
+		if self.words is None or self.lastCells is not cells:
+			self.load(cells)
+		self.advanceWords()
+		self.lastCells = self.cells(out)
+		return self.lastCells
+
+	def stepWords(self, cells):
+		""" Method to compute the next generation on the packed board only, without unpacking it. The packed board is built from the given
+		cells if it has been reset, or if it has been unpacked into other cells; otherwise it is ahead of them, and the cells are ignored """
+		if self.words is None or (self.lastCells is not None and self.lastCells is not cells):
+			self.load(cells)
+		self.advanceWords()
+		self.lastCells = None
+
+	def unpackCells(self, out):
+		""" Method to unpack the packed board into the given dense cells, which become the cells of the packed board """
+		self.lastCells = self.cells(out)
+		return self.lastCells
+
+
+class ParallelEngine(BitPackedEngine):
+	"""
+    Stepping engine that computes the bit-packed board on several threads. The board is split into horizontal strips,
+    and every strip is computed by a worker together with a one-row halo taken from the strips above and below it
+    (the halos are read from the shared packed board, which is written only once all the strips are done;
+    the first and the last strip take the halo rows of the topology).
+    The bitwise kernels of NumPy release the GIL, so that the strips are computed in parallel.
+    The results are identical to the ones of the bit-packed (and convolution) engine.
+
+    Attributes:
+        name              the name used to select the engine on the model.
+        workers           the number of threads.
+        minRows           the minimum number of rows of a strip: smaller boards are computed on a single thread.
+        pool              the pool of threads, created on the first parallel step and shut down by close.
+    """
+
+	name = 'parallel'
+
+	def __init__(self, workers = None, minRows = 64):
+		""" Init method. It accepts the number of threads (by default, the number of cores) and the minimum number of rows of a strip """
+		super().__init__()
+		self.workers = workers or os.cpu_count() or 1
+		self.minRows = minRows
+		self.pool = None
+
+	def close(self):
+		""" Method to shut down the threads of the engine. They are created again if the engine is used after it """
+		if self.pool is not None:
+			self.pool.shutdown()
+			self.pool = None
+
+	def __del__(self):
+		""" Destructor: the threads are shut down with the engine """
+		self.close()
+
+	def setRule(self, rule):
+		""" Method to select the rule. Only the rules with 2 states on the 8 nearest neighbours are supported """
+		if rule.states > 2:
+			raise ValueError('The ' + self.name + ' engine does not support Generations rules, such as ' + rule.name)
+		super().setRule(rule)
+
+	def strips(self, rows):
+		""" Method to get the (first row, last row + 1) of the strips of a board with the given number of rows """
+		count = max(1, min(self.workers, rows // self.minRows))
+		bounds = [rows * k // count for k in range(count + 1)]
+		return list(zip(bounds[:-1], bounds[1:]))
+
+	def stepStrip(self, words, result, first, last, above, below):
+		""" Method to compute the rows [first, last) of the next generation, using one row of halo above and below the strip
+		(the halo rows of the board for the first and the last strip) """
+		rows = words.shape[0]
+		top = max(first - 1, 0)
+		bottom = min(last + 1, rows)
+		strip = self.nextWords(words[top:bottom], self.columns, None, above if first == 0 else None, below if last == rows else None)
+		result[first:last] = strip[first - top:first - top + last - first]
+
+	def nextWordsParallel(self, words):
+		""" Method to compute the next generation of a packed board, one strip per thread """
+		result = np.empty_like(words)
+		strips = self.strips(words.shape[0])
+		above, below = self.haloRows(words, self.columns)
+		if len(strips) == 1:
+			return self.nextWords(words, self.columns, None, above, below)
+		if self.pool is None:
+			self.pool = concurrent.futures.ThreadPoolExecutor(max_workers = self.workers)
+		futures = [self.pool.submit(self.stepStrip, words, result, first, last, above, below) for first, last in strips]
+		for future in futures:
+			future.result()
+		return result
+
+	def advanceWords(self):
+		""" Method to compute the next generation of the packed board, one strip per thread, and its population """
+		self.words = self.nextWordsParallel(self.words)
+		self.population = self.count(self.words)
+
+
+class TiledEngine:
+	"""
+    Stepping engine that splits the board into square tiles and recomputes only the tiles that changed in the previous
+    generation and their neighbours, so that the cost of a step depends on the activity and not on the area
+    (still lifes and empty regions are skipped).
+    The board is kept in a buffer with a dead border of one cell, padded to a multiple of the tile size, and the tiles
+    (with their one-cell halo) are read and written through strided views of this buffer.
+    The next states are read from the lookup table of the rule: it supports the rules on the 8 nearest neighbours, Generations rules included.
+    With a topology other than the dead border, the border of the buffer is filled after every step with the cells of the
+    opposite (or of the same) edge, and a change in a tile along an edge activates the tiles along the glued edge.
+
+    Attributes:
+        name              the name used to select the engine on the model.
+        rule              the compiled rule.
+        topology          the topology of the board.
+        tileSize          the side of the tiles.
+        changed           boolean matrix of the tiles changed by the last step.
+        active            boolean matrix of the tiles recomputed by the last step.
+        buffer            the padded board.
+        lastCells         the dense cells returned by the last step, used to know if the buffer is still valid.
+        population        the number of alive cells after the last step, updated with the births and the deaths of the active tiles.
+    """
+
+	name = 'tiled'
+
+	def __init__(self, tileSize = 16):
+		""" Init method. It accepts the side of the tiles """
+		self.tileSize = tileSize
+		self.rule = LIFE
+		self.topology = 'dead'
+		self.changed = None
+		self.active = None
+		self.buffer = None
+		self.lastCells = None
+		self.population = 0
+
+	def setRule(self, rule):
+		""" Method to select the rule. Only the rules on the 8 nearest neighbours are supported """
+		if not rule.isLifeLike():
+			raise ValueError('The ' + self.name + ' engine supports only the rules on the 8 nearest neighbours, not ' + rule.name)
+		self.rule = rule
+		self.reset()
+
+	def setTopology(self, topology):
+		""" Method to select the topology of the board. Every topology is supported """
+		checkTopology(topology)
+		self.topology = topology
+		self.reset()
+
+	def reset(self):
+		""" Method to drop the buffer, so that it is rebuilt from the dense cells (and all the tiles are recomputed) at the next step """
+		self.buffer = None
+		self.lastCells = None
+
+	def load(self, cells):
+		""" Method to build the buffer and the views on the tiles from dense cells """
+		t = self.tileSize
+		rows, columns = cells.shape
+		tileRows = (rows + t - 1) // t
+		tileColumns = (columns + t - 1) // t
+		self.buffer = np.zeros((tileRows * t + 2, tileColumns * t + 2), dtype = self.rule.dtype)
+		self.buffer[1:rows+1, 1:columns+1] = cells
+		fillHalo(self.buffer, 1, rows, columns, self.topology)
+
+		# each tile with its halo, and each tile without it (writable)
+		self.halos = np.lib.stride_tricks.sliding_window_view(self.buffer, (t + 2, t + 2))[::t, ::t]
+		s0, s1 = self.buffer.strides
+		self.tiles = np.lib.stride_tricks.as_strided(self.buffer[1:, 1:], shape = (tileRows, tileColumns, t, t), strides = (t * s0, t * s1, s0, s1))
+
+		# the cells of the last tiles that are outside the board must stay dead
+		inside = np.zeros((tileRows * t, tileColumns * t), dtype = bool)
+		inside[:rows, :columns] = True
+		self.inside = inside.reshape(tileRows, t, tileColumns, t).transpose(0, 2, 1, 3)
+
+		self.changed = np.ones((tileRows, tileColumns), dtype = bool)
+		self.population = np.count_nonzero(self.buffer[1:rows+1, 1:columns+1] == 1)
+
+	def step(self, cells, out = None):
+		""" Method to compute the next state of the given cells """
+		if self.buffer is None or self.lastCells is not cells:
+			self.load(cells)
+
+		# a tile must be recomputed if it or one of its neighbours changed (the tiles along glued edges are neighbours)
+		padded = np.pad(self.changed, 1)
+		if self.topology in ('torus', 'klein'):
+			padded[:, 0] = padded[:, -2]
+			padded[:, -1] = padded[:, 1]
+			if self.topology == 'torus':
+				padded[0] = padded[-2]
+				padded[-1] = padded[1]
+			else:
+				# the columns are reversed, the whole edge is activated
+				padded[0] = padded[-2].any()
+				padded[-1] = padded[1].any()
+		self.active = np.zeros_like(self.changed)
+		for di in range(3):
+			for dj in range(3):
+				self.active |= padded[di:di + self.changed.shape[0], dj:dj + self.changed.shape[1]]
+		ti, tj = np.nonzero(self.active)
+
+		halos = self.halos[ti, tj]
+		center = halos[:, 1:-1, 1:-1]
+		alive = halos if self.rule.states == 2 else (halos == 1).view(np.int8)
+		neighbours = (alive[:, :-2, :-2] + alive[:, :-2, 1:-1] + alive[:, :-2, 2:] + alive[:, 1:-1, :-2] +
+		              alive[:, 1:-1, 2:] + alive[:, 2:, :-2] + alive[:, 2:, 1:-1] + alive[:, 2:, 2:])
+		codes = (center if self.rule.states == 2 else center.astype(np.int32)) * self.rule.stride + neighbours
+		new = self.rule.nextStates(codes)
+		new *= self.inside[ti, tj]
+		if self.topology != 'dead':
+			# the halo cells beyond the last row and the last column may lie in the tiles
+			center = center * self.inside[ti, tj]
+
+		tileChanged = (new != center).any(axis = (1, 2))
+		self.population = self.population + np.count_nonzero(new == 1) - np.count_nonzero(center == 1)
+		self.changed = np.zeros_like(self.changed)
+		self.changed[ti[tileChanged], tj[tileChanged]] = True
+		self.tiles[ti, tj] = new
+
+		rows, columns = cells.shape
+		fillHalo(self.buffer, 1, rows, columns, self.topology)
+		board = self.buffer[1:rows+1, 1:columns+1]
+		if out is None:
+			self.lastCells = board.copy()
+		else:
+			np.copyto(out, board)
+			self.lastCells = out
+		return self.lastCells
+
+
+from GameOfLifeHashLife import HashLifeEngine
+
+ENGINES = {
+	ConvolutionEngine.name: ConvolutionEngine,
+	BitPackedEngine.name: BitPackedEngine,
+	ParallelEngine.name: ParallelEngine,
+	TiledEngine.name: TiledEngine,
+	HashLifeEngine.name: HashLifeEngine,
+}
+
+def createEngine(name, rule = None, topology = None):
+	""" Function to create the stepping engine with the given name, using the given rule (a Rule or a rule string, the Game of Life by default)
+	and the given topology (the dead border by default) """
+	if name not in ENGINES:
+		raise ValueError('Unknown engine: ' + str(name) + '. Available engines are ' + ', '.join(sorted(ENGINES)))
+	engine = ENGINES[name]()
+	if rule is not None:
+		engine.setRule(parseRule(rule))
+	if topology is not None:
+		engine.setTopology(topology)
+	return engine
+
+# the number of cells from which the parallel engine is faster than the bit-packed one: splitting a step into strips costs about 0.4 ms
+# (the dispatch of the strips and their halos), which 4 threads recover only when a bit-packed step takes about as long, from 1024x1024 cells
+PARALLEL_MIN_AREA = 1024 * 1024
+
+def fastestEngine(rule, rows = None, columns = None):
+	""" Function to get the name of the fastest engine supporting the given rule on a board of the given size.
+	The parallel engine is selected only on several cores and for boards of at least PARALLEL_MIN_AREA cells """
+	rule = parseRule(rule)
+	if not rule.isLifeLike():
+		return ConvolutionEngine.name
+	large = rows is not None and columns is not None and rows * columns >= PARALLEL_MIN_AREA
+	if rule.states == 2 and large and (os.cpu_count() or 1) > 1:
+		return ParallelEngine.name
+	return BitPackedEngine.name
@@ -0,0 +1,187 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import numpy as np
+
+from GameOfLifeEngines import BitPackedEngine, POPULATION
+from GameOfLifeRules import parseRule
+
+## THE HASHES
+
+# the keys added to the words of a packed board before they are mixed, one for every position, so that the hash depends on the positions
+# (on larger boards, the keys are repeated, plus a multiple of the golden ratio for every repetition)
+HASH_KEYS = np.random.default_rng(0x5eed).integers(0, 1 << 63, size = 1 << 16, dtype = np.uint64)
+
+def boardHashes(words):
+	""" Function to get a 64-bit hash of every board of a stack of packed boards (boards, rows, words): every word is added to the key of
+	its position and mixed (the finalizer of splitmix64), and the mixed words are summed """
+	words = words.reshape(len(words), -1)
+	count = words.shape[1]
+	if count <= len(HASH_KEYS):
+		keys = HASH_KEYS[:count]
+	else:
+		positions = np.arange(count, dtype = np.uint64)
+		keys = HASH_KEYS[positions % np.uint64(len(HASH_KEYS))] + (positions >> np.uint64(16)) * np.uint64(0x9e3779b97f4a7c15)
+	z = words + keys
+	z = (z ^ (z >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+	z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+	z ^= z >> np.uint64(31)
+	return z.sum(axis = 1, dtype = np.uint64)
+
+## THE ENSEMBLE MODEL
+
+class GameOfLifeEnsemble:
+	"""
+    This class represents a stack of independent boards of the same size, which are advanced together.
+    The boards are stored bit-packed in a single array of shape (boards, rows, words), so that a generation of all the
+    boards is computed by one call of the bit-packed kernel, instead of one call of nextState for each board.
+    Boards can be removed (e.g. when they have died or stabilized): every board keeps its identifier, which is its index in the initial stack.
+    The hashes of the last maxPeriod states of every board are kept, so that the boards that became periodic (still lifes and oscillators) are detected.
+
+    Attributes:
+        words             the packed boards, an array of shape (boards, rows, ceil(columns/64)) of uint64.
+        rows, columns     the size of the boards.
+        ids               the identifiers of the boards.
+        generations       the generation of every board.
+        aliveCells        the number of alive cells of every board.
+        changed           boolean array, True for the boards changed by the last step.
+        maxPeriod         the maximum period detected.
+        recent            the hashes of the last maxPeriod states of the boards (see boardHashes), the state of generation g in the row g % maxPeriod.
+        periods           the period of every board, if its state is equal to one of its last maxPeriod states, 0 otherwise.
+        engine            the bit-packed engine providing the kernels.
+    """
+
+	def __init__(self, boards, rule = 'B3/S23', topology = 'dead', maxPeriod = 64):
+		""" Init method. It requires a 3-D array (boards, rows, columns) of 0/1 values, the rule (with 2 states, on the 8 nearest neighbours),
+		the topology of the boards and the maximum period detected """
+		boards = np.asarray(boards)
+		rule = parseRule(rule)
+		if rule.states > 2:
+			raise ValueError('The ensemble does not support Generations rules, such as ' + rule.name)
+		self.engine = BitPackedEngine()
+		self.engine.setRule(rule)
+		self.engine.setTopology(topology)
+		self.rows, self.columns = boards.shape[1:]
+		self.words = self.engine.pack(boards)
+		self.ids = np.arange(boards.shape[0])
+		self.generations = np.zeros(boards.shape[0], dtype = np.int64)
+		self.aliveCells = self.population(self.words)
+		self.changed = np.ones(boards.shape[0], dtype = bool)
+		self.maxPeriod = maxPeriod
+		self.recent = np.zeros((maxPeriod, boards.shape[0]), dtype = np.uint64)
+		self.recent[0] = boardHashes(self.words)
+		self.periods = np.zeros(boards.shape[0], dtype = np.int64)
+
+	def population(self, words):
+		""" Method to count the alive cells of every packed board """
+		count = POPULATION[words.view(np.uint8)]
+		return count.reshape(words.shape[0], -1).sum(axis = 1)
+
+	def __len__(self):
+		""" Method to get the number of boards """
+		return len(self.ids)
+
+	def getIds(self):
+		""" Method to get the identifiers of the boards """
+		return self.ids
+
+	def getAliveCells(self):
+		""" Method to get the number of alive cells of every board """
+		return self.aliveCells
+
+	def getGenerations(self):
+		""" Method to get the generation of every board """
+		return self.generations
+
+	def getChanged(self):
+		""" Method to get which boards have been changed by the last step """
+		return self.changed
+
+	def getPeriods(self):
+		""" Method to get the period of every board, if its state is equal to one of its last maxPeriod states (0 otherwise) """
+		return self.periods
+
+	def getCurrentState(self, index):
+		""" Method to get the current state of the board in position 'index' of the stack """
+		return self.engine.unpack(self.words[index], self.columns)
+
+	def setCurrentState(self, index, cells):
+		""" Method to set the cells of the board in position 'index' of the stack """
+		self.words[index] = self.engine.pack(np.asarray(cells))
+		self.aliveCells[index] = self.population(self.words[index:index+1])[0]
+		generation = self.generations[index]
+		self.recent[generation % self.maxPeriod, index] = boardHashes(self.words[index:index+1])[0]
+		self.periods[index] = 0
+
+	def getCurrentStates(self):
+		""" Method to get the current states of all the boards, an array (boards, rows, columns) """
+		return self.engine.unpack(self.words, self.columns)
+
+	def nextState(self):
+		""" Method to compute the next state of all the boards """
+		above, below = self.engine.haloRows(self.words, self.columns)
+		newWords = self.engine.nextWords(self.words, self.columns, None, above, below)
+		self.changed = (newWords != self.words).reshape(len(self.ids), -1).any(axis = 1)
+		self.words = newWords
+		self.aliveCells = self.population(self.words)
+		self.generations = self.generations + 1
+		if len(self.ids) > 0:
+			generation = self.generations[0]
+			hashes = boardHashes(self.words)
+			matches = self.recent[:min(generation, self.maxPeriod)] == hashes
+			# the row r holds the state of the last generation g - k such that (g - k) % maxPeriod == r: the period is the smallest k
+			rows = np.arange(len(matches))[:, None]
+			periods = np.where(matches, (generation - rows - 1) % self.maxPeriod + 1, self.maxPeriod + 1).min(axis = 0, initial = self.maxPeriod + 1)
+			self.periods = np.where(periods <= self.maxPeriod, periods, 0)
+			self.recent[generation % self.maxPeriod] = hashes
+
+	def advance(self, n):
+		""" Method to compute the state of all the boards n generations in the future """
+		if n < 0:
+			raise ValueError('Cannot advance by a negative number of generations')
+		for _ in range(n):
+			self.nextState()
+
+	def removeBoards(self, remove):
+		""" Method to remove boards, given a boolean array over the boards (or their positions in the stack). It returns the identifiers of the removed boards """
+		keep = np.ones(len(self.ids), dtype = bool)
+		keep[remove] = False
+		removed = self.ids[~keep]
+		self.words = self.words[keep]
+		self.ids = self.ids[keep]
+		self.generations = self.generations[keep]
+		self.aliveCells = self.aliveCells[keep]
+		self.changed = self.changed[keep]
+		self.recent = self.recent[:, keep]
+		self.periods = self.periods[keep]
+		return removed
+
+	def removeDead(self):
+		""" Method to remove the boards without alive cells. It returns the identifiers of the removed boards """
+		return self.removeBoards(self.aliveCells == 0)
+
+	def removeStable(self):
+		""" Method to remove the boards whose state is equal to one of their last maxPeriod states (still lifes, oscillators and dead boards).
+		It returns the identifiers of the removed boards """
+		return self.removeBoards(self.periods > 0)
@@ -0,0 +1,347 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import numpy as np
+
+from GameOfLifeRules import LIFE
+
+## THE HASHLIFE ENGINE
+
+class HashLifeNode:
+	"""
+    A canonical node of the quadtree. Nodes are never modified once created, and two nodes with the same
+    children are the same object (hash-consing), so that they can be compared and hashed by identity.
+
+    Attributes:
+        nw, ne, sw, se    the four quadrants (None for the leaves).
+        level             the node covers a square of 2**level cells.
+        population        the number of alive cells in the node.
+        results           memoized successors, a dictionary {j: node advanced by 2**j generations} (None if empty).
+    """
+
+	__slots__ = ('nw', 'ne', 'sw', 'se', 'level', 'population', 'results')
+
+	def __init__(self, nw, ne, sw, se, level, population):
+		""" Init method """
+		self.nw = nw
+		self.ne = ne
+		self.sw = sw
+		self.se = se
+		self.level = level
+		self.population = population
+		self.results = None
+
+
+class HashLifeEngine:
+	"""
+    Stepping engine based on HashLife: the board is stored as a quadtree of canonical nodes, kept in a
+    hash-consing table, and the future center of every node is memoized, so that regular patterns can be
+    advanced by millions of generations with a few thousands of node evaluations.
+    The board is a window (with the upper-left corner in (0,0)) on an unbounded plane: cells leaving the window
+    keep living in the universe, and they come back into the window if they return.
+    The table is bounded: when it grows beyond 'maxNodes', also in the middle of a step (see successor), the nodes
+    that are not reachable from the current universe or from the nodes being computed are evicted. The memoized results
+    of the nodes kept are kept too, with their nodes, as long as they fill at most half of the table; the other results are dropped.
+    The table can exceed 'maxNodes' only by the nodes that cannot be evicted: then the next eviction waits until it doubles.
+
+    Attributes:
+        name              the name used to select the engine on the model.
+        unbounded         True, the board is a window on an unbounded plane.
+        rule              the compiled rule, used to compute the nodes of level 2.
+        maxNodes          the maximum number of nodes kept in the hash-consing table.
+        collectAt         the number of nodes of the table beyond which the nodes are evicted (maxNodes, unless the nodes kept are more).
+        table             the hash-consing table, a dictionary {(nw, ne, sw, se): node}.
+        computing         the nodes whose successors are being computed, they are not evicted.
+        empty             the list of the empty nodes, indexed by level.
+        root              the node containing the universe (None if it must be rebuilt from the dense cells).
+        originRow         the row of the plane corresponding to the upper-left cell of the root.
+        originColumn      the column of the plane corresponding to the upper-left cell of the root.
+        lastCells         the dense cells returned by the last step, used to know if the universe is still valid.
+        population        the number of alive cells of the window after the last step.
+    """
+
+	name = 'hashlife'
+	unbounded = True
+
+	def __init__(self, maxNodes = 1000000):
+		""" Init method. It accepts the maximum number of nodes kept in the cache """
+		self.maxNodes = maxNodes
+		self.collectAt = maxNodes
+		self.rule = LIFE
+		self.off = HashLifeNode(None, None, None, None, 0, 0)
+		self.on = HashLifeNode(None, None, None, None, 0, 1)
+		self.table = {}
+		self.computing = []
+		self.empty = [self.off]
+		self.root = None
+		self.originRow = 0
+		self.originColumn = 0
+		self.lastCells = None
+		self.population = 0
+
+	def setRule(self, rule):
+		""" Method to select the rule. Only the rules with 2 states on the 8 nearest neighbours are supported, 
+		and a dead cell cannot be born without alive neighbours (B0), since the plane is infinite. The memoized results are dropped """
+		if not rule.isLifeLike() or rule.states > 2 or 0 in rule.birth:
+			raise ValueError('The ' + self.name + ' engine supports only the rules with 2 states on the 8 nearest neighbours without B0, not ' + rule.name)
+		self.rule = rule
+		self.table = {}
+		self.collectAt = self.maxNodes
+		self.empty = [self.off]
+		self.reset()
+
+	def setTopology(self, topology):
+		""" Method to select the topology of the board. The board is a window on an unbounded plane, it has no edges to glue or to reflect """
+		if topology != 'dead':
+			raise ValueError('The ' + self.name + ' engine works on an unbounded plane, it does not support the topology ' + str(topology))
+
+	def reset(self):
+		""" Method to drop the universe, so that it is rebuilt from the dense cells at the next step """
+		self.root = None
+		self.lastCells = None
+
+	def getCacheSize(self):
+		""" Method to get the number of nodes in the hash-consing table """
+		return len(self.table)
+
+	def getResultsCount(self):
+		""" Method to get the number of memoized successors """
+		return sum(len(node.results) for node in self.table.values() if node.results)
+
+	def setCacheLimit(self, maxNodes):
+		""" Method to set the maximum number of nodes kept in the hash-consing table """
+		self.maxNodes = maxNodes
+		self.collectAt = maxNodes
+		self.collect()
+
+	def clearCache(self):
+		""" Method to empty the cache, keeping only the nodes of the current universe (without memoized results) """
+		self.collect(force = True)
+
+	## quadtree construction
+
+	def join(self, nw, ne, sw, se):
+		""" Method to get the canonical node with the given quadrants """
+		key = (nw, ne, sw, se)
+		node = self.table.get(key)
+		if node is None:
+			node = HashLifeNode(nw, ne, sw, se, nw.level + 1, nw.population + ne.population + sw.population + se.population)
+			self.table[key] = node
+		return node
+
+	def emptyNode(self, level):
+		""" Method to get the canonical empty node of the given level """
+		while len(self.empty) <= level:
+			e = self.empty[-1]
+			self.empty.append(self.join(e, e, e, e))
+		return self.empty[level]
+
+	def expand(self, node):
+		""" Method to get the node of the next level having the given node in its center """
+		e = self.emptyNode(node.level - 1)
+		return self.join(self.join(e, e, e, node.nw), self.join(e, e, node.ne, e),
+		                 self.join(e, node.sw, e, e), self.join(node.se, e, e, e))
+
+	def innerPopulation(self, node):
+		""" Method to get the number of alive cells in the central square of side 2**(level-2) of a node """
+		return (node.nw.se.se.population + node.ne.sw.sw.population +
+		        node.sw.ne.ne.population + node.se.nw.nw.population)
+
+	def fromArray(self, cells, level):
+		""" Method to build the node of the given level from a square array of 0/1 values """
+		if level == 0:
+			return self.on if cells[0, 0] else self.off
+		if not cells.any():
+			return self.emptyNode(level)
+		half = 1 << (level - 1)
+		return self.join(self.fromArray(cells[:half, :half], level - 1), self.fromArray(cells[:half, half:], level - 1),
+		                 self.fromArray(cells[half:, :half], level - 1), self.fromArray(cells[half:, half:], level - 1))
+
+	def toArray(self, node, row, column, out):
+		""" Method to write the alive cells of a node, with the upper-left corner in (row, column), into the array 'out' """
+		if node.population == 0:
+			return
+		size = 1 << node.level
+		rows, columns = out.shape
+		if row >= rows or column >= columns or row + size <= 0 or column + size <= 0:
+			return
+		if node.level == 0:
+			out[row, column] = 1
+			return
+		half = size >> 1
+		self.toArray(node.nw, row, column, out)
+		self.toArray(node.ne, row, column + half, out)
+		self.toArray(node.sw, row + half, column, out)
+		self.toArray(node.se, row + half, column + half, out)
+
+	## evolution
+
+	def life4x4(self, node):
+		""" Method to compute the central 2x2 node of a 4x4 node, one generation in the future """
+		grid = [[0] * 4 for _ in range(4)]
+		for i, quadrant in enumerate((node.nw, node.ne, node.sw, node.se)):
+			r, c = (i // 2) * 2, (i % 2) * 2
+			grid[r][c] = quadrant.nw.population
+			grid[r][c + 1] = quadrant.ne.population
+			grid[r + 1][c] = quadrant.sw.population
+			grid[r + 1][c + 1] = quadrant.se.population
+		center = []
+		for r in (1, 2):
+			for c in (1, 2):
+				neighbours = (grid[r-1][c-1] + grid[r-1][c] + grid[r-1][c+1] + grid[r][c-1] +
+				              grid[r][c+1] + grid[r+1][c-1] + grid[r+1][c] + grid[r+1][c+1])
+				center.append(self.on if self.rule.table[grid[r][c], neighbours] == 1 else self.off)
+		return self.join(*center)
+
+	def successor(self, node, j):
+		""" Method to compute the central node (of level-1) of a node, 2**j generations in the future (j <= level-2) """
+		if node.population == 0:
+			return node.nw
+		if node.results is not None and j in node.results:
+			return node.results[j]
+		if len(self.table) > self.collectAt:
+			self.collect()
+
+		self.computing.append(node)
+		if node.level == 2:
+			result = self.life4x4(node)
+		else:
+			nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+			step = min(j, node.level - 3)
+			c1 = self.successor(nw, step)
+			c2 = self.successor(self.join(nw.ne, ne.nw, nw.se, ne.sw), step)
+			c3 = self.successor(ne, step)
+			c4 = self.successor(self.join(nw.sw, nw.se, sw.nw, sw.ne), step)
+			c5 = self.successor(self.join(nw.se, ne.sw, sw.ne, se.nw), step)
+			c6 = self.successor(self.join(ne.sw, ne.se, se.nw, se.ne), step)
+			c7 = self.successor(sw, step)
+			c8 = self.successor(self.join(sw.ne, se.nw, sw.se, se.sw), step)
+			c9 = self.successor(se, step)
+			if j < node.level - 2:
+				# the time has already been spent, only the centers are kept
+				result = self.join(self.join(c1.se, c2.sw, c4.ne, c5.nw),
+				                   self.join(c2.se, c3.sw, c5.ne, c6.nw),
+				                   self.join(c4.se, c5.sw, c7.ne, c8.nw),
+				                   self.join(c5.se, c6.sw, c8.ne, c9.nw))
+			else:
+				result = self.join(self.successor(self.join(c1, c2, c4, c5), step),
+				                   self.successor(self.join(c2, c3, c5, c6), step),
+				                   self.successor(self.join(c4, c5, c7, c8), step),
+				                   self.successor(self.join(c5, c6, c8, c9), step))
+
+		self.computing.pop()
+		if node.results is None:
+			node.results = {}
+		node.results[j] = result
+		return result
+
+	def advanceRoot(self, n):
+		""" Method to advance the universe by n generations, one power of two at a time """
+		j = 0
+		while n > 0:
+			if n & 1:
+				# the universe must be contained in the central quarter, and it must be big enough for 2**j generations
+				while self.root.level < j + 3 or self.innerPopulation(self.root) != self.root.population:
+					offset = 1 << (self.root.level - 1)
+					self.originRow -= offset
+					self.originColumn -= offset
+					self.root = self.expand(self.root)
+				offset = 1 << (self.root.level - 2)
+				self.originRow += offset
+				self.originColumn += offset
+				self.root = self.successor(self.root, j)
+				self.collect()
+			n >>= 1
+			j += 1
+
+	def collect(self, force = False):
+		""" Method to evict the nodes not reachable from the universe or from the nodes being computed, when the table grows beyond its limit.
+		The memoized results of the nodes kept are kept too (unless force is True), as long as their nodes fill at most half of the table """
+		if not force and len(self.table) <= self.collectAt:
+			return
+		live = {}
+		self.mark(self.computing + ([] if self.root is None else [self.root]), live)
+		if not force:
+			for node in list(live.values()):
+				if node.results and len(live) < self.maxNodes // 2:
+					self.mark(node.results.values(), live)
+		for node in live.values():
+			if node.results:
+				node.results = {j: result for j, result in node.results.items() if result.level == 0 or id(result) in live} if not force else None
+		self.table = {key: node for key, node in self.table.items() if id(node) in live}
+		# the empty nodes are canonical as long as all the smaller ones are in the table
+		levels = 1
+		while levels < len(self.empty) and id(self.empty[levels]) in live:
+			levels += 1
+		del self.empty[levels:]
+		self.collectAt = max(self.maxNodes, 2 * len(self.table))
+
+	def mark(self, nodes, live):
+		""" Method to add the given nodes and all their descendants to the dictionary of the live nodes {id: node} """
+		stack = list(nodes)
+		while stack:
+			node = stack.pop()
+			if node.level == 0 or id(node) in live:
+				continue
+			live[id(node)] = node
+			stack.extend((node.nw, node.ne, node.sw, node.se))
+
+	## dense interface
+
+	def load(self, cells):
+		""" Method to build the universe from dense cells """
+		rows, columns = cells.shape
+		level = max(3, int(max(rows, columns) - 1).bit_length())
+		size = 1 << level
+		square = np.zeros((size, size), dtype = bool)
+		square[:rows, :columns] = cells != 0
+		self.root = self.fromArray(square, level)
+		self.originRow = 0
+		self.originColumn = 0
+
+	def window(self, shape, out = None):
+		""" Method to get the dense cells of the window of the given shape. They are written into out, if it is given """
+		if out is None:
+			out = np.zeros(shape, dtype = np.int8)
+		else:
+			out.fill(0)
+		self.toArray(self.root, self.originRow, self.originColumn, out)
+		return out
+
+	def getPopulation(self):
+		""" Method to get the number of alive cells of the whole universe, including the cells outside the window """
+		return 0 if self.root is None else self.root.population
+
+	def advance(self, cells, n, out = None):
+		""" Method to compute the state of the given cells n generations in the future (written into out, if it is given) """
+		if self.root is None or self.lastCells is not cells:
+			self.load(cells)
+		self.advanceRoot(n)
+		self.lastCells = self.window(cells.shape, out)
+		self.population = np.count_nonzero(self.lastCells)
+		return self.lastCells
+
+	def step(self, cells, out = None):
+		""" Method to compute the next state of the given cells """
+		return self.advance(cells, 1, out)
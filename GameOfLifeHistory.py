@@ -0,0 +1,283 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+## THE HISTORY STORE
+
+HISTORY_MAGIC = b'GOLHIST2'
+INDEX_MAGIC = b'GOLHIDX1'
+HEADER = struct.Struct('<8sIIII')
+# the header of the first version of the store, which recorded only two states (a single bit plane)
+HISTORY_MAGIC_V1 = b'GOLHIST1'
+HEADER_V1 = struct.Struct('<8sIII')
+
+# the kinds of the frames: the whole bit-packed state, the XOR with the previous state, or only the bytes changed by the XOR (positions and values)
+KEYFRAME, XOR, DELTA = range(3)
+
+INDEX_DTYPE = np.dtype([('generation', '<i8'), ('offset', '<u8'), ('size', '<u4'), ('kind', 'u1'), ('population', '<u4')])
+
+class HistoryStore:
+	"""
+    Append-only store of the states of a simulation, written into a file that is memory-mapped to read them back.
+    Every state is bit-packed, one bit plane per bit of the states of the cells (a single plane for two states, e.g. 2 planes for Brian's Brain),
+    and it is stored as the XOR with the previous one (only the changed bytes, if they are few),
+    with a whole state (keyframe) every keyframeInterval frames. A state is rebuilt from the nearest keyframe or from the last state read,
+    XOR frames can be applied in both directions, so that stepping forward and backward costs a single frame.
+    The index of the frames (generation, offset, size, kind, population) is kept in a second memory-mapped file (path + '.idx'),
+    so that millions of generations can be recorded without holding them in memory, and a store can be reopened after a crash.
+
+    Attributes:
+        path               the path of the file of the frames.
+        rows, columns      the size of the recorded board.
+        planes             the number of bit planes of a state, enough for the number of states of the rule.
+        keyframeInterval   the maximum number of frames between two keyframes.
+        count              the number of frames recorded.
+        index              the memory-mapped index of the frames.
+        cursor             the frame whose bit-packed state is kept in 'words' (None if no frame has been read).
+    """
+
+	def __init__(self, path, rows, columns, keyframeInterval = 64, states = 2, discard = False):
+		""" Init method. It opens the store in the given path, or creates it if it does not exist, for cells with the given number of states.
+		The frames written only in part (e.g. by a crash) are discarded. If discard is True, all the frames are discarded, 
+		and the store is written again for the given board and states """
+		self.path = path
+		self.rows = rows
+		self.columns = columns
+		self.cursor = None
+		self.words = None
+		self.data = None
+		planes = max(1, (states - 1).bit_length())
+		exists = os.path.exists(path) and os.path.getsize(path) >= HEADER_V1.size
+		if exists:
+			self.file = open(path, 'r+b')
+			magic = self.file.read(8)
+			self.file.seek(0)
+			if magic == HISTORY_MAGIC_V1:
+				_, storedRows, storedColumns, self.keyframeInterval = HEADER_V1.unpack(self.file.read(HEADER_V1.size))
+				self.planes, self.start = 1, HEADER_V1.size
+			elif magic == HISTORY_MAGIC and os.path.getsize(path) >= HEADER.size:
+				_, storedRows, storedColumns, self.keyframeInterval, self.planes = HEADER.unpack(self.file.read(HEADER.size))
+				self.start = HEADER.size
+			else:
+				self.file.close()
+				raise ValueError('Not a history file: ' + path)
+			if not discard and (storedRows, storedColumns) != (rows, columns):
+				self.file.close()
+				raise ValueError('The history in ' + path + ' has been recorded on a board of size ' + str((storedRows, storedColumns)))
+			if not discard and self.planes < planes:
+				self.file.close()
+				raise ValueError('The history in ' + path + ' has been recorded with at most ' + str(2 ** self.planes) + ' states, not ' + str(states))
+		else:
+			self.file = open(path, 'w+b')
+		if not exists or discard:
+			self.keyframeInterval = keyframeInterval
+			self.planes, self.start = planes, HEADER.size
+			self.file.seek(0)
+			self.file.write(HEADER.pack(HISTORY_MAGIC, rows, columns, keyframeInterval, planes))
+			self.file.truncate(HEADER.size)
+			self.file.flush()
+		self.openIndex()
+		self.count = 0 if discard else int(self.header[1])
+		# discarding the frames beyond the end of the file of the frames
+		size = os.path.getsize(path)
+		while self.count > 0 and int(self.index[self.count - 1]['offset']) + int(self.index[self.count - 1]['size']) > size:
+			self.count = self.count - 1
+		self.truncate(self.count)
+
+	def openIndex(self):
+		""" Method to memory-map the index file, creating it if it does not exist """
+		path = self.path + '.idx'
+		if not os.path.exists(path) or os.path.getsize(path) < 16:
+			with open(path, 'wb') as f:
+				f.write(INDEX_MAGIC + np.zeros(1, dtype = '<u8').tobytes())
+				f.truncate(16 + 1024 * INDEX_DTYPE.itemsize)
+		with open(path, 'rb') as f:
+			if f.read(8) != INDEX_MAGIC:
+				raise ValueError('Not a history index: ' + path)
+		self.header = np.memmap(path, dtype = '<u8', mode = 'r+', shape = (2,))
+		capacity = (os.path.getsize(path) - 16) // INDEX_DTYPE.itemsize
+		self.index = np.memmap(path, dtype = INDEX_DTYPE, mode = 'r+', offset = 16, shape = (capacity,))
+
+	def growIndex(self):
+		""" Method to double the capacity of the index """
+		capacity = 2 * len(self.index)
+		self.index.flush()
+		del self.index
+		with open(self.path + '.idx', 'r+b') as f:
+			f.truncate(16 + capacity * INDEX_DTYPE.itemsize)
+		self.index = np.memmap(self.path + '.idx', dtype = INDEX_DTYPE, mode = 'r+', offset = 16, shape = (capacity,))
+
+	def __len__(self):
+		""" Method to get the number of frames recorded """
+		return self.count
+
+	def getGenerations(self):
+		""" Method to get the generations of the recorded frames """
+		return self.index['generation'][:self.count]
+
+	def getPopulations(self):
+		""" Method to get the number of alive cells of the recorded frames """
+		return self.index['population'][:self.count]
+
+	def getFirstGeneration(self):
+		""" Method to get the first generation recorded (None if the store is empty) """
+		return int(self.index[0]['generation']) if self.count > 0 else None
+
+	def getLastGeneration(self):
+		""" Method to get the last generation recorded (None if the store is empty) """
+		return int(self.index[self.count - 1]['generation']) if self.count > 0 else None
+
+	def find(self, generation):
+		""" Method to get the frame of the last generation recorded up to the given one """
+		frame = int(np.searchsorted(self.getGenerations(), generation, side = 'right')) - 1
+		if frame < 0:
+			raise ValueError('Generation ' + str(generation) + ' has not been recorded')
+		return frame
+
+	def getStates(self):
+		""" Method to get the largest number of states of the cells that the store can record """
+		return 2 ** self.planes
+
+	def pack(self, cells):
+		""" Method to bit-pack a state, one bit plane after the other (the lowest bit first) """
+		cells = np.asarray(cells)
+		if self.planes == 1:
+			return np.packbits(cells != 0, axis = None)
+		cells = cells.astype(np.uint8)
+		return np.concatenate([np.packbits(cells >> plane & 1, axis = None) for plane in range(self.planes)])
+
+	def unpack(self, words):
+		""" Method to rebuild the cells from a bit-packed state """
+		size = self.rows * self.columns
+		planeSize = (size + 7) // 8
+		cells = np.unpackbits(words[:planeSize], count = size)
+		for plane in range(1, self.planes):
+			cells |= np.unpackbits(words[plane*planeSize:(plane+1)*planeSize], count = size) << plane
+		return cells.reshape(self.rows, self.columns)
+
+	def append(self, generation, cells, population):
+		""" Method to record the state of a generation. The generations must increase: recording a generation already recorded
+		discards it and the following ones, unless the state is the same (e.g. when a scrubbed run is played again) """
+		words = self.pack(cells)
+		if self.count > 0 and generation <= self.getLastGeneration():
+			frame = int(np.searchsorted(self.getGenerations(), generation))
+			if int(self.index[frame]['generation']) == generation and np.array_equal(self.read(frame)[1], words):
+				return
+			self.truncate(frame)
+
+		interval = self.count - self.lastKeyframe() if self.count > 0 else self.keyframeInterval
+		if interval >= self.keyframeInterval:
+			kind, data = KEYFRAME, words
+		else:
+			difference = self.read(self.count - 1)[1] ^ words
+			changed = np.flatnonzero(difference)
+			if 5 * len(changed) < len(words):
+				kind, data = DELTA, changed.astype('<u4').tobytes() + difference[changed].tobytes()
+			else:
+				kind, data = XOR, difference
+
+		offset = self.end
+		self.file.seek(offset)
+		self.file.write(memoryview(data))
+		self.file.flush()
+		self.end = offset + len(data)
+
+		if self.count == len(self.index):
+			self.growIndex()
+		self.index[self.count] = (generation, offset, len(data), kind, population)
+		self.count = self.count + 1
+		self.header[1] = self.count
+		self.cursor, self.words = self.count - 1, words
+
+	def lastKeyframe(self, frame = None):
+		""" Method to get the last keyframe up to the given frame (by default, the last one) """
+		if frame is None:
+			frame = self.count - 1
+		start = max(frame - self.keyframeInterval, 0)
+		return start + int(np.flatnonzero(self.index['kind'][start:frame+1] == KEYFRAME)[-1])
+
+	def frameData(self, frame):
+		""" Method to get the bytes of a frame from the memory-mapped file """
+		offset, size = int(self.index[frame]['offset']), int(self.index[frame]['size'])
+		if self.data is None or len(self.data) < offset + size:
+			# the file has grown, it is mapped again (the old map is released with the last array that uses it)
+			self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+		return np.frombuffer(self.data, dtype = np.uint8, count = size, offset = offset)
+
+	def applyFrame(self, words, frame):
+		""" Method to apply the XOR of a frame to the bit-packed state (in place), moving from the previous frame to this one or back """
+		data = self.frameData(frame)
+		if self.index[frame]['kind'] == XOR:
+			words ^= data
+		else:
+			changed = len(data) // 5
+			words[data[:4*changed].view('<u4')] ^= data[4*changed:]
+
+	def read(self, frame):
+		""" Method to read a frame: it returns its generation, its bit-packed state and its population.
+		The state is rebuilt from the nearest among the last keyframe and the last frame read """
+		keyframe = self.lastKeyframe(frame)
+		if self.cursor is not None and self.cursor >= keyframe and self.lastKeyframe(self.cursor) == keyframe \
+		   and abs(self.cursor - frame) <= frame - keyframe:
+			start, words = self.cursor, self.words
+		else:
+			start, words = keyframe, self.frameData(keyframe).copy()
+		for f in range(start + 1, frame + 1):
+			self.applyFrame(words, f)
+		for f in range(start, frame, -1):
+			self.applyFrame(words, f)
+		self.cursor, self.words = frame, words
+		entry = self.index[frame]
+		return int(entry['generation']), words, int(entry['population'])
+
+	def readCells(self, frame):
+		""" Method to read a frame as a matrix of cells: it returns its generation, its cells and its population """
+		generation, words, population = self.read(frame)
+		return generation, self.unpack(words), population
+
+	def truncate(self, frame):
+		""" Method to discard the frames from the given one """
+		self.count = frame
+		self.header[1] = self.count
+		self.end = int(self.index[frame - 1]['offset']) + int(self.index[frame - 1]['size']) if frame > 0 else self.start
+		self.data = None
+		self.file.truncate(self.end)
+		if self.cursor is not None and self.cursor >= frame:
+			self.cursor, self.words = None, None
+
+	def flush(self):
+		""" Method to write the index to the disk """
+		self.index.flush()
+		self.header.flush()
+
+	def close(self):
+		""" Method to close the store """
+		self.flush()
+		self.data = None
+		self.file.close()
@@ -0,0 +1,185 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import os
+import sqlite3
+
+import numpy as np
+
+from GameOfLifeModel import GameOfLifeModel
+from GameOfLifePatterns import PATTERN_EXTENSIONS, loadPattern
+
+## THE PATTERN LIBRARY
+
+class PatternEntry:
+	"""
+    The metadata of a pattern of the library.
+
+    Attributes:
+        directory         the directory of the pattern file.
+        name              the name of the pattern file.
+        mtime             the last modification time of the file.
+        height, width     the size of the bounding box of the pattern.
+        population        the number of alive cells.
+        period            the period of the pattern (None if it has not been detected).
+        shift             the shift (rows, columns) of the pattern after a period (None if the period has not been detected).
+    """
+
+	def __init__(self, directory, name, mtime, height, width, population, period, shiftRows, shiftColumns):
+		""" Init method """
+		self.directory = directory
+		self.name = name
+		self.mtime = mtime
+		self.height = height
+		self.width = width
+		self.population = population
+		self.period = period
+		self.shift = None if period is None else (shiftRows, shiftColumns)
+
+	def getKind(self):
+		""" Method to get the kind of the pattern: 'Still lifes', 'Oscillators', 'Spaceships' or 'Unknown' """
+		if self.period is None:
+			return 'Unknown'
+		if self.shift != (0, 0):
+			return 'Spaceships'
+		return 'Still lifes' if self.period == 1 else 'Oscillators'
+
+	def getDescription(self):
+		""" Method to get a short description of the period of the pattern """
+		if self.period is None:
+			return 'period unknown'
+		if self.shift != (0, 0):
+			return 'spaceship of period %d, shift %s' % (self.period, self.shift)
+		return 'still life' if self.period == 1 else 'oscillator of period %d' % self.period
+
+class PatternLibrary:
+	"""
+    Index of the pattern files, kept in a small SQLite database. For every file it stores the modification time,
+    the bounding box, the population, the period detected and a thumbnail, so that the patterns can be listed,
+    searched and previewed without reading the files. The index is updated incrementally: only the new or modified files are read.
+
+    Attributes:
+        directories       the directories of the pattern files.
+        path              the path of the database.
+        connection        the connection to the database.
+        maxGenerations    the number of generations run to detect the period of a pattern.
+        thumbnailSize     the maximum side of the thumbnails.
+    """
+
+	def __init__(self, directories = ('knownPatterns/', 'myPatterns/'), path = 'patternLibrary.sqlite', maxGenerations = 64, thumbnailSize = 64):
+		""" Init method """
+		self.directories = list(directories)
+		self.path = path
+		self.maxGenerations = maxGenerations
+		self.thumbnailSize = thumbnailSize
+		self.connection = sqlite3.connect(self.path)
+		self.connection.execute('''CREATE TABLE IF NOT EXISTS patterns (
+			directory TEXT, name TEXT, mtime REAL, height INTEGER, width INTEGER, population INTEGER,
+			period INTEGER, shiftRows INTEGER, shiftColumns INTEGER,
+			thumbnailHeight INTEGER, thumbnailWidth INTEGER, thumbnail BLOB,
+			PRIMARY KEY (directory, name))''')
+		self.connection.commit()
+
+	def close(self):
+		""" Method to close the database """
+		self.connection.close()
+
+	def update(self):
+		""" Method to update the index with the pattern files that have been added, modified or removed. It returns the number of files (indexed, removed) """
+		indexed = {(directory, name): mtime for directory, name, mtime in self.connection.execute('SELECT directory, name, mtime FROM patterns')}
+		found = set()
+		count = 0
+		for directory in self.directories:
+			if not os.path.isdir(directory):
+				continue
+			for entry in os.scandir(directory):
+				if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in PATTERN_EXTENSIONS:
+					continue
+				key = (directory, entry.name)
+				found.add(key)
+				mtime = entry.stat().st_mtime
+				if indexed.get(key) != mtime:
+					self.index(directory, entry.name, mtime)
+					count = count + 1
+		removed = [key for key in indexed if key not in found]
+		self.connection.executemany('DELETE FROM patterns WHERE directory = ? AND name = ?', removed)
+		self.connection.commit()
+		return count, len(removed)
+
+	def index(self, directory, name, mtime):
+		""" Method to read a pattern file and to store its metadata """
+		try:
+			pattern, _ = loadPattern(directory + name)
+		except (ValueError, OSError, KeyError):
+			# files that cannot be parsed are indexed as empty patterns, so that they are not read again until they change
+			pattern = np.zeros((0, 0), dtype = bool)
+		height, width = pattern.shape
+		period, shift = self.detectPeriod(pattern)
+		thumbnail = self.thumbnail(pattern)
+		self.connection.execute('INSERT OR REPLACE INTO patterns VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+			(directory, name, mtime, height, width, int(pattern.sum()), period, shift[0], shift[1],
+			 thumbnail.shape[0], thumbnail.shape[1], np.packbits(thumbnail).tobytes()))
+
+	def detectPeriod(self, pattern):
+		""" Method to detect the period and the shift of a pattern, running it on a board with a margin around it """
+		margin = self.maxGenerations // 2 + 2
+		height, width = pattern.shape
+		model = GameOfLifeModel(height + 2 * margin, width + 2 * margin, 'bitpacked', historySize = self.maxGenerations + 1)
+		model.setCells(np.nonzero(pattern) + np.array([[margin], [margin]]), 1)
+		for _ in range(self.maxGenerations):
+			model.nextState()
+			if model.getCycle() is not None:
+				period, shift, _ = model.getCycle()
+				return period, shift
+		return None, (None, None)
+
+	def thumbnail(self, pattern):
+		""" Method to reduce a pattern to a thumbnail: every pixel is alive if one of the cells it covers is alive """
+		height, width = pattern.shape
+		factor = max(1, -(-max(height, width) // self.thumbnailSize))
+		padded = np.zeros((-(-height // factor) * factor, -(-width // factor) * factor), dtype = bool)
+		padded[:height, :width] = pattern
+		return padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor).any(axis = (1, 3))
+
+	def getThumbnail(self, directory, name):
+		""" Method to get the thumbnail of a pattern, as a boolean array (None if the pattern is not indexed) """
+		row = self.connection.execute('SELECT thumbnailHeight, thumbnailWidth, thumbnail FROM patterns WHERE directory = ? AND name = ?',
+		                              (directory, name)).fetchone()
+		if row is None:
+			return None
+		height, width, data = row
+		bits = np.unpackbits(np.frombuffer(data, dtype = np.uint8), count = height * width)
+		return bits.reshape(height, width).astype(bool)
+
+	def search(self, text = '', directory = None, minPopulation = None, maxPopulation = None, period = None):
+		""" Method to get the entries of the patterns whose name contains 'text', filtered by directory, population and period, sorted by name """
+		query = 'SELECT directory, name, mtime, height, width, population, period, shiftRows, shiftColumns FROM patterns WHERE name LIKE ?'
+		parameters = ['%' + text + '%']
+		for condition, value in (('directory = ?', directory), ('population >= ?', minPopulation),
+		                         ('population <= ?', maxPopulation), ('period = ?', period)):
+			if value is not None:
+				query = query + ' AND ' + condition
+				parameters.append(value)
+		query = query + ' ORDER BY name COLLATE NOCASE'
+		return [PatternEntry(*row) for row in self.connection.execute(query, parameters)]
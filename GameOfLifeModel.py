@@ -22,10 +22,60 @@
 ## SOFTWARE.
 ##
 
+import collections
+import hashlib
 import os
 
 import numpy as np
-import scipy.ndimage as spndmg
+
+from GameOfLifeEngines import createEngine, fastestEngine
+from GameOfLifeHistory import HistoryStore
+from GameOfLifePatterns import loadPattern, patternRule, savePattern
+from GameOfLifeProfiler import Profiler
+from GameOfLifeRules import lookup, parseRule
+
+## THE CELL STATES
+
+# the state of a cell is its color index (black: inactive, white: set by the user, lime: new born,
+# green: alive for more than a generation, silver: dead), plus the flag DEAD_ONCE if the cell has dead at least once
+BLACK, WHITE, LIME, GREEN, SILVER = range(5)
+DEAD_ONCE = 8
+COLOR_MASK = 7
+
+def stateTable():
+	""" Function to build the table of the next state of a cell, indexed by (was alive) << 5 | (is alive) << 4 | current state:
+	born cells become lime, surviving cells green, dying cells silver (and dead once), the other cells keep their state """
+	table = np.zeros(64, dtype = np.uint8)
+	for index in range(64):
+		wasAlive, isAlive, state = index >> 5 & 1, index >> 4 & 1, index & 15
+		if isAlive:
+			table[index] = (GREEN if wasAlive else LIME) | (state & DEAD_ONCE)
+		elif wasAlive:
+			table[index] = SILVER | DEAD_ONCE
+		else:
+			table[index] = state
+	return table
+
+STATE_TABLE = stateTable()
+
+def nextCellStates(states, currentCells, newCells, out = None):
+	""" Function to compute the states of the cells passing from currentCells to newCells (see stateTable). They are written into out, if it is given """
+	index = (currentCells == 1).view(np.uint8) << 5 | (newCells == 1).view(np.uint8) << 4 | states
+	return lookup(STATE_TABLE, index, out)
+
+def changedTiles(index, tileSize):
+	""" Function to get the boolean matrix of the tiles of tileSize x tileSize cells whose states are changed by the index of the state table
+	(see stateTable): only the cells alive before or after change their state """
+	rows, columns = index.shape
+	tiles = np.bitwise_or.reduceat(index, np.arange(0, rows, tileSize), axis = 0)
+	tiles = np.bitwise_or.reduceat(tiles, np.arange(0, columns, tileSize), axis = 1)
+	return (tiles & 48) != 0
+
+def readOnly(array):
+	""" Function to get a read-only view of an array """
+	view = array.view()
+	view.flags.writeable = False
+	return view
 
 ## THE MODEL
 
@@ -36,67 +86,806 @@ class GameOfLifeModel:
     It provides a method to compute the evolution of states, based on the rules of the game (nextState),
     methods to get and set the values of the class' attributes, and the methods to clear, load and save the state.
 
+    The cells are double buffered: the engines write the next generation into the back buffer, which is then swapped with the front one,
+    and the states of the cells are updated in place, so that a step allocates no board-sized array (with the engines that support it).
+    The arrays returned to the callers are read-only views of the buffers: they are valid until the next change of the Model, and they must be
+    copied to be kept (e.g. by the worker).
+    With the engines keeping a packed board (bitpacked, parallel) the packed board is the state of the Game: the steps are computed on it only,
+    and the dense cells and their states are unpacked and updated when they are read or edited (see packedSteps and syncCells).
+
     Attributes:
-        cells             the current state of the Game.
-        aliveCells        the number of alive cells.
+        cells             the current state of the Game, the front buffer (an array of the dtype of the rule).
+        buffers           the two buffers of the cells, the back buffer is the one that is not 'cells'.
+        views             the read-only views of the two buffers, returned by getCurrentState.
+        rows, columns     the size of the board.
+        states            the state (color index and DEAD_ONCE flag) of every cell, an array of uint8.
+        statesView        the read-only view of the states, returned by getCellStates.
+        wasAlive, isAlive scratch arrays of uint8, the cells alive before and after a step, used to update the states in place.
+        aliveCells        the number of alive cells, it is updated incrementally by the edits and by the engine during the steps.
+        packedAhead       boolean value which is True if the packed board of the engine is ahead of the dense cells (see packedSteps).
+        pending           the number of generations computed since the states of the cells were last updated (see syncCells).
+        pendingAliveCells the number of alive cells when the states of the cells were last updated.
+        updatedTiles      the tiles (see TILE_SIZE) whose states were changed by the last update of the states, None if they are unknown.
         generation        the current generation in which current State's cells live.
+        rule              the compiled rule of the game (see GameOfLifeRules), the Game of Life (B3/S23) by default.
+        topology          the topology of the board: 'dead' (the cells beyond the edges are dead), 'torus', 'klein' or 'reflect'.
+        engine            the stepping engine used to compute the next state ('convolution', 'bitpacked', 'parallel', 'tiled' or 'hashlife').
+        historySize       the number of recent states whose hash is kept to detect cycles (0 disables the detection).
+        history           dictionary {hash of a state: (generation, top row, left column)}, the state is cropped to its bounding box.
+        cycle             the cycle detected (period, (row shift, column shift), first generation of the cycle), or None.
+        replay            the states of a detected cycle without shift, replayed instead of being computed (None if there is no cycle).
+        recording         the store where the states are recorded to go back to them (None if the states are not recorded).
+        profiler          the profiler of the step/render loop (see GameOfLifeProfiler), disabled by default.
+        scanner           the scanner of the known patterns of the board (see findObjects), None until the first search.
     """
 
-	def __init__(self):
-		""" Init method """
-		self.cells = np.zeros((50,86))
-		self.aliveCells = np.sum(self.cells == 1)
+	# the size of the tiles of the states changed by an update (see getUpdatedTiles)
+	TILE_SIZE = 32
+
+	def __init__(self, rows = 50, columns = 86, engine = 'convolution', historySize = 256, rule = 'B3/S23', topology = 'dead'):
+		""" Init method. It accepts the size of the board, the name of the stepping engine to use, the rule, the topology 
+		and the number of states kept to detect cycles """
+		self.rows = rows
+		self.columns = columns
+		self.rule = parseRule(rule)
+		self.allocateBuffers()
+		self.states = np.zeros((self.rows, self.columns), dtype = np.uint8)
+		self.statesView = readOnly(self.states)
+		self.wasAlive = np.zeros((self.rows, self.columns), dtype = np.uint8)
+		self.isAlive = np.zeros((self.rows, self.columns), dtype = np.uint8)
+		self.aliveCells = 0
+		self.packedAhead = False
+		self.pending = 0
+		self.pendingAliveCells = 0
+		self.updatedTiles = None
 		self.generation = 0
+		self.topology = topology
+		self.engine = createEngine(engine, self.rule, self.topology)
+		self.historySize = historySize
+		self.resetHistory()
+		self.recording = None
+		self.profiler = Profiler()
+		self.scanner = None
+
+	def allocateBuffers(self, cells = None):
+		""" Method to allocate the two buffers of the cells, with the dtype of the rule, the front one holding the given cells (dead cells by default) """
+		self.buffers = [np.zeros((self.rows, self.columns), dtype = self.rule.dtype) for _ in range(2)]
+		self.views = [readOnly(buffer) for buffer in self.buffers]
+		self.cells = self.buffers[0]
+		if cells is not None:
+			np.copyto(self.cells, cells)
+
+	def backBuffer(self):
+		""" Method to get the back buffer of the cells, where the next generation is written """
+		return self.buffers[1] if self.cells is self.buffers[0] else self.buffers[0]
 
 	def setCellActive(self, i, j):
 		""" Method to set the (i,j)-th cell active """
+		self.syncCells()
+		if self.cells[i, j] != 1:
+			self.aliveCells = self.aliveCells + 1
 		self.cells[i, j] = 1
-		self.aliveCells = np.sum(self.cells == 1)
+		self.states[i, j] = WHITE | (self.states[i, j] & DEAD_ONCE)
+		self.engine.reset()
+		self.resetHistory()
+		self.recordSnapshot()
 
 	def setCellInactive(self, i, j):
-		""" Method to set the (i,j)-th inactive """
+		""" Method to set the (i,j)-th inactive. It becomes silver if it has dead once, black otherwise """
+		self.syncCells()
+		if self.cells[i, j] == 1:
+			self.aliveCells = self.aliveCells - 1
 		self.cells[i, j] = 0
-		self.aliveCells = np.sum(self.cells == 1)
+		self.states[i, j] = SILVER | DEAD_ONCE if self.states[i, j] & DEAD_ONCE else BLACK
+		self.engine.reset()
+		self.resetHistory()
+		self.recordSnapshot()
+
+	def setCells(self, coordinates, values):
+		""" Method to set many cells at once (e.g. to paint or paste a pattern). It requires the coordinates (rows, columns) of the cells
+		and their values (1 to set a cell active, 0 to set it inactive), or a single value for all the cells. 
+		If a cell appears more than once, the last value is used """
+		self.syncCells()
+		i, j = (np.asarray(c, dtype = np.intp).ravel() for c in coordinates)
+		values = np.broadcast_to(np.asarray(values).ravel() != 0, i.shape)
+		indices = np.ravel_multi_index((i, j), self.cells.shape)
+		# keeping the last occurrence of every cell
+		indices, last = np.unique(indices[::-1], return_index = True)
+		values = values[::-1][last]
+		i, j = np.unravel_index(indices, self.cells.shape)
+
+		self.aliveCells = self.aliveCells + np.count_nonzero(values) - np.count_nonzero(self.cells[i, j] == 1)
+		self.cells[i, j] = values
+		flags = self.states[i, j] & DEAD_ONCE
+		self.states[i, j] = np.where(values, WHITE | flags, np.where(flags, SILVER | DEAD_ONCE, BLACK))
+		self.engine.reset()
+		self.resetHistory()
+		self.recordSnapshot()
 
 	def getAliveCells(self):
 		""" Method to get the number of alive cells """
 		return self.aliveCells
 
 	def getCurrentState(self):
-		""" Method to get the current state of the Game """
+		""" Method to get the current state of the Game, a read-only view which is valid until the next change of the Model """
+		self.syncCells()
+		return self.views[0] if self.cells is self.buffers[0] else self.views[1]
+
+	def getCellStates(self):
+		""" Method to get the states of the cells (color index, plus the flag DEAD_ONCE), a read-only view updated in place by the Model """
+		self.syncCells()
+		return self.statesView
+
+	def getShape(self):
+		""" Method to get the size (rows, columns) of the board """
+		return (self.rows, self.columns)
+
+	def getProfiler(self):
+		""" Method to get the profiler of the step/render loop """
+		return self.profiler
+
+	def getGeneration(self):
+		""" Method to get the generation in which current State's cells live """
+		return self.generation
+
+	def getEngine(self):
+		""" Method to get the name of the stepping engine """
+		return self.engine.name
+
+	def setEngine(self, engine):
+		""" Method to select the stepping engine by name ('convolution', 'bitpacked', 'parallel', 'tiled' or 'hashlife').
+		The previous engine is closed, if it holds threads """
+		self.syncCells()
+		previous = getattr(self, 'engine', None)
+		self.engine = createEngine(engine, self.rule, self.topology)
+		if hasattr(previous, 'close'):
+			previous.close()
+
+	def getTopology(self):
+		""" Method to get the topology of the board """
+		return self.topology
+
+	def setTopology(self, topology):
+		""" Method to select the topology of the board ('dead', 'torus', 'klein' or 'reflect').
+		It raises a ValueError if the stepping engine does not support it """
+		self.syncCells()
+		self.engine.setTopology(topology)
+		self.topology = topology
+		self.engine.reset()
+		self.resetHistory()
+
+	def getRule(self):
+		""" Method to get the rule string of the game (e.g. 'B3/S23') """
+		return self.rule.name
+
+	def setRule(self, rule):
+		""" Method to select the rule of the game: a rule string or a name (see GameOfLifeRules). 
+		It raises a ValueError if the stepping engine does not support the rule. The cells in states that the rule does not have become dead """
+		rule = parseRule(rule)
+		self.syncCells()
+		self.engine.setRule(rule)
+		self.rule = rule
+		dead = self.cells >= rule.states
+		self.cells[dead] = 0
+		if self.cells.dtype != rule.dtype:
+			self.allocateBuffers(self.cells)
+		self.engine.reset()
+		self.resetHistory()
+		if self.recording is not None and self.recording.getStates() < rule.states:
+			# the store cannot record the states of the rule: the recording starts again
+			self.startRecording(self.recording.path, self.recording.keyframeInterval)
+		else:
+			self.recordSnapshot()
+
+	def getChangedTiles(self):
+		""" Method to get the tiles changed by the last step, as a pair (tile size, boolean matrix of the tiles).
+		It returns None if the engine does not split the board into tiles """
+		if self.isReplaying() or getattr(self.engine, 'changed', None) is None:
+			return None
+		return (self.engine.tileSize, self.engine.changed)
+
+	def getActiveTiles(self):
+		""" Method to get the tiles recomputed by the last step, as a pair (tile size, boolean matrix of the tiles).
+		Every cell that changed, or that was born in the previous step, is in one of these tiles. 
+		It returns None if the engine does not split the board into tiles """
+		if self.isReplaying() or getattr(self.engine, 'active', None) is None:
+			return None
+		return (self.engine.tileSize, self.engine.active)
+
+	def getUpdatedTiles(self):
+		""" Method to get the tiles whose states were changed by the last update of the states (the last generation, or the generations
+		computed since the states were last read), as a pair (tile size, boolean matrix of the tiles), for every engine.
+		It returns None if they are unknown (e.g. before the first generation) """
+		self.syncCells()
+		if self.updatedTiles is None:
+			return None
+		return (self.TILE_SIZE, self.updatedTiles)
+
+	def setPatternIndex(self, index):
+		""" Method to select the index of the known patterns found by findObjects (see PatternIndex of GameOfLifeSearch) """
+		# imported here, the search imports the census, which runs models
+		from GameOfLifeSearch import ObjectScanner
+		self.scanner = ObjectScanner(index)
+
+	def findObjects(self):
+		""" Method to find the known patterns on the board. The first search builds the index of the patterns (see GameOfLifeSearch): 
+		the table of the known objects and the pattern files of knownPatterns/ and myPatterns/, run with the rule of the game 
+		(it is built again if the rule changes). The following searches look up again only the objects in the regions that changed. 
+		It returns a list of ObjectMatch (the entry of the pattern and its bounding box), sorted by position """
+		from GameOfLifeSearch import ObjectScanner, PatternIndex
+		if self.scanner is None or self.scanner.index.rule.name != self.rule.name:
+			self.scanner = ObjectScanner(PatternIndex(self.rule))
+		return self.scanner.scan(self.getCurrentState() == 1)
+
+	def resetHistory(self):
+		""" Method to forget the recent states and the detected cycle (e.g. when the state is edited) """
+		self.history = {}
+		self.historyOrder = collections.deque()
+		self.cycle = None
+		self.replay = None
+
+	def recordState(self):
+		""" Method to record the hash of the current state, cropped to its bounding box, and to detect a cycle.
+		A state equal to a recent one, or to a recent one shifted, gives the period and the shift (for spaceships) of the cycle """
+		if self.historySize == 0 or self.replay is not None:
+			return
+
+		packed = self.packedSteps()
+		if packed:
+			top, left, bottom, right, cropped = self.croppedWords()
+		else:
+			alive = np.not_equal(self.cells, 0, out = self.isAlive.view(bool))
+			rows = np.flatnonzero(alive.any(axis = 1))
+			if len(rows) == 0:
+				top, left, bottom, right = 0, 0, 0, 0
+			else:
+				columns = np.flatnonzero(alive.any(axis = 0))
+				top, left, bottom, right = rows[0], columns[0], rows[-1] + 1, columns[-1] + 1
+			if self.rule.states == 2:
+				cropped = np.packbits(alive[top:bottom, left:right])
+			else:
+				# the dying cells are part of the state
+				cropped = self.cells[top:bottom, left:right].astype(np.uint8)
+		# the packed and the dense states are encoded differently: the encoding is part of the digest
+		digest = hashlib.blake2b(cropped.tobytes() + str((bottom - top, right - left, packed)).encode(), digest_size = 16).digest()
+
+		previous = self.history.get(digest)
+		if previous is None:
+			self.cycle = None
+		else:
+			generation, previousTop, previousLeft = previous
+			self.cycle = (self.generation - generation, (int(top - previousTop), int(left - previousLeft)), generation)
+			if self.cycle[1] == (0, 0) and not getattr(self.engine, 'unbounded', False):
+				# a cycle without shift repeats forever: its states are recorded from the next step, then replayed
+				# (not if the board is a window on an unbounded universe, where cells outside of it can come back)
+				self.replay = []
+				return
+			self.historyOrder.remove(digest)
+
+		self.history[digest] = (self.generation, top, left)
+		self.historyOrder.append(digest)
+		if len(self.historyOrder) > self.historySize:
+			del self.history[self.historyOrder.popleft()]
+
+	def croppedWords(self):
+		""" Method to get the bounding box (top, left, bottom, right) of the alive cells of the packed board of the engine,
+		and the packed rows of the bounding box, shifted so that its first column is the first bit """
+		engine = self.engine
+		if engine.words is None:
+			engine.load(self.cells)
+		words = engine.words
+		rows = np.flatnonzero(words.any(axis = 1))
+		if len(rows) == 0:
+			return 0, 0, 0, 0, words[:0]
+		top, bottom = rows[0], rows[-1] + 1
+		words = words[top:bottom]
+		# the columns are found on the union of the rows, a single packed row
+		columns = np.flatnonzero(engine.unpack(np.bitwise_or.reduce(words, axis = 0), self.columns))
+		left, right = columns[0], columns[-1] + 1
+		first, shift = divmod(int(left), 64)
+		words = words[:, first:]
+		if shift:
+			carry = np.zeros_like(words)
+			carry[:, :-1] = words[:, 1:] << np.uint64(64 - shift)
+			words = (words >> np.uint64(shift)) | carry
+		return top, left, bottom, right, words[:, :(right - left + 63) // 64]
+
+	def getCycle(self):
+		""" Method to get the cycle detected, as (period, (row shift, column shift), first generation of the cycle).
+		The shift is (0, 0) for still lifes and oscillators. It returns None if no cycle has been detected """
+		return self.cycle
+
+	def isPeriodic(self):
+		""" Method to know if the Game has reached a cycle without shift (still life, oscillator, or empty board) """
+		return self.cycle is not None and self.cycle[1] == (0, 0)
+
+	def isStillLife(self):
+		""" Method to know if the Game has reached a state that does not change anymore """
+		return self.isPeriodic() and self.cycle[0] == 1
+
+	def isReplaying(self):
+		""" Method to know if the states are replayed from a detected cycle instead of being computed """
+		return self.replay is not None and len(self.replay) == self.cycle[0]
+
+	def replayedState(self, generation):
+		""" Method to get the state of the given generation from the replayed cycle """
+		period, _, first = self.cycle
+		# the replayed states (cells, alive cells) are the ones of the generations first+period+1, ..., first+2*period
+		return self.replay[(generation - first - period - 1) % period]
+
+	def packedSteps(self):
+		""" Method to know if the steps are computed on the packed board of the engine only (see syncCells): with the engines keeping
+		a packed board, for the rules with 2 states, while the states are not recorded and no cycle is replayed (they need the dense cells) """
+		return getattr(self.engine, 'packed', False) and self.rule.states == 2 and self.recording is None and self.replay is None
+
+	def syncCells(self):
+		""" Method to bring the dense cells and their states up to date: the packed board of the engine, if it is ahead of the cells,
+		is unpacked into the back buffer, which becomes the front one, and the states of the cells are updated from the cells marked alive
+		when they were last updated (as if the Game moved to the current state in a single step) """
+		if self.packedAhead:
+			self.cells = self.engine.unpackCells(self.backBuffer())
+			self.packedAhead = False
+		if self.pending > 0:
+			n, self.pending = self.pending, 0
+			self.updateStates(self.pendingAliveCells, n)
+
+	def beginSteps(self):
+		""" Method to mark the cells alive before the steps, from which the states of the cells are updated (see syncCells) """
+		if self.pending == 0:
+			self.pendingAliveCells = self.aliveCells
+			self.markAlive()
+
+	def computeStep(self):
+		""" Method to compute the next generation, on the packed board only if possible (see packedSteps), without updating the states of the cells """
+		if self.packedSteps():
+			if not self.history:
+				self.recordState()
+			with self.profiler.phase('compute'):
+				self.engine.stepWords(self.cells)
+			self.packedAhead = True
+			self.aliveCells = self.engine.population
+			self.generation = self.generation + 1
+			with self.profiler.phase('record'):
+				self.recordState()
+		else:
+			if self.packedAhead:
+				self.cells = self.engine.unpackCells(self.backBuffer())
+				self.packedAhead = False
+			self.nextCells()
+		self.pending = self.pending + 1
+
+	def setNextCells(self, newCells, aliveCells, n):
+		""" Method to move to the state newCells, with the given number of alive cells, n generations in the future """
+		previousAliveCells = self.aliveCells
+		self.markAlive()
+		self.moveCells(newCells, aliveCells, n)
+		self.updateStates(previousAliveCells, n)
+
+	def markAlive(self):
+		""" Method to mark the cells alive in the current state, from which the states of the cells are updated (see updateStates) """
+		np.equal(self.cells, 1, out = self.wasAlive.view(bool))
+
+	def moveCells(self, newCells, aliveCells, n):
+		""" Method to move the cells to newCells, with the given number of alive cells, n generations in the future, without computing 
+		the states of the cells (see updateStates). The new cells are written into the back buffer (if the engine did not write them there),
+		which becomes the front one. The new state is recorded to detect the cycles, and into the history store """
+		back = self.backBuffer()
+		if newCells is not back:
+			# e.g. a replayed state: the engine does not know it
+			np.copyto(back, newCells)
+			self.engine.reset()
+		self.cells = back
+		self.aliveCells = aliveCells
+		self.generation = self.generation + n
+		with self.profiler.phase('record'):
+			if self.replay is not None and not self.isReplaying():
+				if n == 1:
+					self.replay.append((back.copy(), aliveCells))
+				else:
+					# the states of the cycle must be consecutive, the cycle will be detected again
+					self.resetHistory()
+			self.recordState()
+			self.recordSnapshot()
+
+	def updateStates(self, previousAliveCells, n):
+		""" Method to update in place the states of the cells passing from the cells marked alive n generations ago (see markAlive) to the current cells.
+		The index of the state table (see stateTable) is built in the scratch arrays """
+		with self.profiler.phase('diff'):
+			np.equal(self.cells, 1, out = self.isAlive.view(bool))
+			np.left_shift(self.isAlive, 4, out = self.isAlive)
+			np.left_shift(self.wasAlive, 5, out = self.wasAlive)
+			self.wasAlive |= self.isAlive
+			self.wasAlive |= self.states
+			lookup(STATE_TABLE, self.wasAlive, self.states)
+			self.updatedTiles = changedTiles(self.wasAlive, self.TILE_SIZE)
+		if self.profiler.enabled:
+			# the born cells are the lime ones, the dead cells follow from the number of alive cells
+			births = int(np.count_nonzero((self.states & COLOR_MASK) == LIME))
+			self.profiler.count('generations', n)
+			self.profiler.count('births', births)
+			self.profiler.count('deaths', births + int(previousAliveCells) - int(self.aliveCells))
+
+	def nextCells(self):
+		""" Method to compute the cells of the next generation, without the states of the cells (see updateStates). 
+		It is delegated to the selected stepping engine, unless a cycle is replayed """
+		if not self.history:
+			self.recordState()
+		if self.isReplaying():
+			self.moveCells(*self.replayedState(self.generation + 1), 1)
+		else:
+			with self.profiler.phase('compute'):
+				newCells = self.engine.step(self.cells, self.backBuffer())
+			self.moveCells(newCells, self.engine.population, 1)
+
+	def nextState(self):
+		""" Method to compute the next Game's state. It is delegated to the selected stepping engine, unless a cycle is replayed.
+		The new state is read with getCurrentState (with the engines keeping a packed board, it is unpacked only then) """
+		self.beginSteps()
+		self.computeStep()
+		if not self.packedAhead:
+			self.syncCells()
+
+	def advance(self, n, untilPeriodic = False):
+		""" Method to compute the Game's state n generations in the future. Engines that can skip generations (hashlife) do it in a single call,
+		the other engines compute (and record) every generation. The states of the cells are computed from the current and the final cells only.
+		If untilPeriodic is True, the generations are computed one at a time, and the Game stops at the first periodic state (see isPeriodic).
+		The new state is read with getCurrentState """
+		if n < 0:
+			raise ValueError('Cannot advance by a negative number of generations')
+		if n == 0:
+			return
+		if self.isReplaying():
+			self.syncCells()
+			self.setNextCells(*self.replayedState(self.generation + n), n)
+		elif hasattr(self.engine, 'advance') and not untilPeriodic:
+			self.syncCells()
+			if not self.history:
+				self.recordState()
+			with self.profiler.phase('compute'):
+				newCells = self.engine.advance(self.cells, n, self.backBuffer())
+			self.setNextCells(newCells, self.engine.population, n)
+		else:
+			self.beginSteps()
+			for _ in range(n):
+				self.computeStep()
+				if untilPeriodic and self.isPeriodic():
+					break
+			if not self.packedAhead:
+				self.syncCells()
+
+	def jumpTo(self, generation):
+		""" Method to compute the Game's state at the given generation. It can precede the current one only if the states are recorded """
+		if generation < self.generation and self.recording is not None:
+			return self.seek(generation)
+		if generation < self.generation:
+			raise ValueError('Cannot jump back from generation ' + str(self.generation) + ' to generation ' + str(generation))
+		self.advance(generation - self.generation)
+		return self.getCurrentState()
+
+	def startRecording(self, path, keyframeInterval = 64, resume = False):
+		""" Method to record the states into the history store in the given path (see GameOfLifeHistory), one frame per generation.
+		If resume is True and the store is not empty, the Game goes back to the last state recorded (e.g. to resume a run after a crash),
+		otherwise the states recorded in the store are discarded """
+		self.syncCells()
+		self.stopRecording()
+		self.recording = HistoryStore(path, self.rows, self.columns, keyframeInterval, self.rule.states, discard = not resume)
+		if resume and len(self.recording) > 0:
+			return self.seek(self.recording.getLastGeneration())
+		self.recordSnapshot()
+		return self.getCurrentState()
+
+	def stopRecording(self):
+		""" Method to stop recording the states and to close the history store """
+		if self.recording is not None:
+			self.recording.close()
+			self.recording = None
+
+	def getRecording(self):
+		""" Method to get the history store where the states are recorded (None if they are not recorded) """
+		return self.recording
+
+	def recordSnapshot(self):
+		""" Method to record the current state into the history store, if the states are recorded """
+		if self.recording is not None:
+			self.recording.append(self.generation, self.cells, self.aliveCells)
+
+	def seek(self, generation):
+		""" Method to go back (or forward) to a recorded state: the last one recorded up to the given generation.
+		The cells keep their colors, as if the Game moved from the current state to the recorded one in a single step """
+		if self.recording is None:
+			raise ValueError('The states are not recorded')
+		self.syncCells()
+		generation, cells, aliveCells = self.recording.readCells(self.recording.find(generation))
+		nextCellStates(self.states, self.cells, cells, out = self.states)
+		np.copyto(self.cells, cells, casting = 'unsafe')
+		self.aliveCells = aliveCells
+		self.generation = generation
+		self.engine.reset()
+		self.resetHistory()
+		return self.getCurrentState()
+
+	def stepBack(self):
+		""" Method to go back to the state recorded before the current one """
+		if self.recording is None:
+			raise ValueError('The states are not recorded')
+		if len(self.recording) == 0 or self.generation <= self.recording.getFirstGeneration():
+			raise ValueError('No state has been recorded before generation ' + str(self.generation))
+		return self.seek(self.generation - 1)
+
+	def clearModel(self):
+		""" Method to clear the Model. It reinitialize all the attributes to the initial state """
+		self.syncCells()
+		self.cells.fill(0)
+		self.states.fill(BLACK)
+		self.aliveCells = 0
+		self.generation = 0
+		self.engine.reset()
+		self.resetHistory()
+		self.recordSnapshot()
+		return self.getCurrentState()
+
+	def saveModel(self, title):
+		""" Method to save an own Pattern. It requires a string which is used as the title of the pattern.
+		The extension of the title chooses the format ('.rle', '.cells', '.lpk' save only the bounding box of the pattern, '.npy' is the default).
+		Only the alive cells are saved (not the dying states of the Generations rules), and the '.rle' format also keeps the rule """
+		path = 'myPatterns/'
+		directory = os.path.dirname(path)
+		if not os.path.exists(directory):
+			os.makedirs(directory)
+		path = path + title
+		return savePattern(path, self.getCurrentState(), self.rule.name)
+
+	def loadModel(self, path, pattern, row = None, column = None, applyRule = False):
+		""" Method to load a Pattern. It requires a string representing the path needed to get the pattern, and the title of the pattern.
+		Only the bounding box of the pattern is kept, and it is placed with its upper-left corner in (row, column): by default, in the position 
+		saved in the file ('.npy') if it fits the board, otherwise in the center of the board. The pattern is cropped if it is larger than the board.
+		If applyRule is True, the rule kept by the file ('.rle') is selected (with the fastest engine supporting it, if the engine does not),
+		unless it cannot be parsed """
+		if applyRule:
+			try:
+				rule = patternRule(path + pattern)
+				rule = None if rule is None else parseRule(rule)
+			except ValueError:
+				rule = None
+			if rule is not None and rule != self.rule:
+				try:
+					self.setRule(rule)
+				except ValueError:
+					self.setEngine(fastestEngine(rule, self.rows, self.columns))
+					self.setRule(rule)
+		pattern, position = loadPattern(path + pattern)
+		height, width = pattern.shape
+		if row is None or column is None:
+			if position is not None and position[0] + height <= self.rows and position[1] + width <= self.columns:
+				row, column = position
+			else:
+				row, column = max((self.rows - height) // 2, 0), max((self.columns - width) // 2, 0)
+		rows = max(min(self.rows - row, height), 0)
+		columns = max(min(self.columns - column, width), 0)
+		self.syncCells()
+		self.cells.fill(0)
+		self.cells[row:row+rows, column:column+columns] = pattern[:rows, :columns]
+		self.states[:] = np.where(self.cells == 1, WHITE, BLACK)
+		self.engine.reset()
+		self.resetHistory()
+		self.aliveCells = np.count_nonzero(self.cells == 1)
+		self.recordSnapshot()
+		return self.getCurrentState()
+
+
+class SparseGameOfLifeModel:
+	"""
+    This class represents a Model of the game on an infinite plane. Only the coordinates of the alive cells are stored,
+    so that the memory and the time needed to compute a state depend on the population, not on the area.
+    The alive cells are kept in a sorted array of keys (each key encodes the row and the column of a cell),
+    and the next state is computed counting how many times every key appears among the neighbours of the alive cells.
+    It provides the same methods of GameOfLifeModel: the dense state is a window of the plane, which can be moved with setWindow.
+
+    Attributes:
+        keys              the sorted array of the keys of the alive cells.
+        rows, columns     the size of the window.
+        windowRow         the row of the plane shown in the upper-left corner of the window.
+        windowColumn      the column of the plane shown in the upper-left corner of the window.
+        cells             the dense state of the window.
+        states            the state (color index and DEAD_ONCE flag) of every cell of the window.
+        generation        the current generation in which current State's cells live.
+        rule              the compiled rule of the game, with 2 states on the 8 nearest neighbours and without B0 (the plane is infinite).
+    """
+
+	# coordinates are stored as (row + OFFSET) * SPAN + (column + OFFSET), they must be in [-OFFSET, OFFSET)
+	OFFSET = 1 << 30
+	SPAN = 1 << 31
+	NEIGHBOURS = np.array([di * (1 << 31) + dj for di in (-1, 0, 1) for dj in (-1, 0, 1) if di != 0 or dj != 0], dtype = np.int64)
+
+	def __init__(self, rows = 50, columns = 86, rule = 'B3/S23'):
+		""" Init method. It accepts the size of the window and the rule """
+		self.keys = np.zeros(0, dtype = np.int64)
+		self.setRule(rule)
+		self.rows = rows
+		self.columns = columns
+		self.windowRow = 0
+		self.windowColumn = 0
+		self.generation = 0
+		self.cells = self.window()
+		self.states = np.where(self.cells == 1, WHITE, BLACK).astype(np.uint8)
+
+	def encode(self, i, j):
+		""" Method to get the keys of the cells with the given coordinates """
+		return (np.asarray(i, dtype = np.int64) + self.OFFSET) * self.SPAN + (np.asarray(j, dtype = np.int64) + self.OFFSET)
+
+	def decode(self, keys):
+		""" Method to get the coordinates (rows, columns) of the given keys """
+		return keys // self.SPAN - self.OFFSET, keys % self.SPAN - self.OFFSET
+
+	def window(self):
+		""" Method to compute the dense state of the window """
+		cells = np.zeros((self.rows, self.columns), dtype = np.int8)
+		i, j = self.decode(self.keys)
+		i = i - self.windowRow
+		j = j - self.windowColumn
+		inside = (i >= 0) & (i < self.rows) & (j >= 0) & (j < self.columns)
+		cells[i[inside], j[inside]] = 1
+		return cells
+
+	def setWindow(self, row, column):
+		""" Method to move the window, so that the cell (row, column) of the plane is in its upper-left corner """
+		self.windowRow = row
+		self.windowColumn = column
+		self.cells = self.window()
+		self.states = np.where(self.cells == 1, WHITE, BLACK).astype(np.uint8)
+		return self.cells
+
+	def setCellActive(self, i, j):
+		""" Method to set the (i,j)-th cell of the window active """
+		key = self.encode(i + self.windowRow, j + self.windowColumn)
+		index = np.searchsorted(self.keys, key)
+		if index == len(self.keys) or self.keys[index] != key:
+			self.keys = np.insert(self.keys, index, key)
+		self.cells[i, j] = 1
+		self.states[i, j] = WHITE | (self.states[i, j] & DEAD_ONCE)
+
+	def setCellInactive(self, i, j):
+		""" Method to set the (i,j)-th cell of the window inactive """
+		key = self.encode(i + self.windowRow, j + self.windowColumn)
+		index = np.searchsorted(self.keys, key)
+		if index < len(self.keys) and self.keys[index] == key:
+			self.keys = np.delete(self.keys, index)
+		self.cells[i, j] = 0
+		self.states[i, j] = SILVER | DEAD_ONCE if self.states[i, j] & DEAD_ONCE else BLACK
+
+	def setCells(self, coordinates, values):
+		""" Method to set many cells of the window at once. It requires the coordinates (rows, columns) of the cells
+		and their values (1 to set a cell active, 0 to set it inactive), or a single value for all the cells.
+		If a cell appears more than once, the last value is used """
+		i, j = (np.asarray(c, dtype = np.intp).ravel() for c in coordinates)
+		values = np.broadcast_to(np.asarray(values).ravel() != 0, i.shape)
+		indices = np.ravel_multi_index((i, j), self.cells.shape)
+		indices, last = np.unique(indices[::-1], return_index = True)
+		values = values[::-1][last]
+		i, j = np.unravel_index(indices, self.cells.shape)
+
+		keys = self.encode(i + self.windowRow, j + self.windowColumn)
+		self.keys = np.union1d(np.setdiff1d(self.keys, keys[~values], assume_unique = True), keys[values])
+
+		self.cells[i, j] = values
+		flags = self.states[i, j] & DEAD_ONCE
+		self.states[i, j] = np.where(values, WHITE | flags, np.where(flags, SILVER | DEAD_ONCE, BLACK))
+
+	def getAliveCells(self):
+		""" Method to get the number of alive cells of the whole plane """
+		return len(self.keys)
+
+	def getCurrentState(self):
+		""" Method to get the current state of the window """
 		return self.cells
 
+	def getCellStates(self):
+		""" Method to get the states of the cells of the window (color index, plus the flag DEAD_ONCE) """
+		return self.states
+
+	def getCoordinates(self):
+		""" Method to get the coordinates (rows, columns) of the alive cells of the whole plane """
+		return self.decode(self.keys)
+
+	def getBoundingBox(self):
+		""" Method to get the bounding box (top, left, bottom, right) of the alive cells, bounds included (None if there are no alive cells) """
+		if len(self.keys) == 0:
+			return None
+		i, j = self.decode(self.keys)
+		return (int(i.min()), int(j.min()), int(i.max()), int(j.max()))
+
+	def getShape(self):
+		""" Method to get the size (rows, columns) of the window """
+		return (self.rows, self.columns)
+
 	def getGeneration(self):
 		""" Method to get the generation in which current State's cells live """
 		return self.generation
 
+	def getRule(self):
+		""" Method to get the rule string of the game """
+		return self.rule.name
+
+	def setRule(self, rule):
+		""" Method to select the rule of the game. It must have 2 states, count the 8 nearest neighbours, and it cannot give birth without neighbours (B0) """
+		rule = parseRule(rule)
+		if not rule.isLifeLike() or rule.states > 2 or 0 in rule.birth:
+			raise ValueError('The sparse model supports only the rules with 2 states on the 8 nearest neighbours without B0, not ' + rule.name)
+		self.rule = rule
+
 	def nextState(self):
-		""" Method to compute the next Game's state. It is based on convolution """
-		kernel = np.array([[1,1,1], [1,50,1], [1,1,1]])
-		convolution = spndmg.filters.convolve(self.cells, kernel, mode = 'constant', cval = 0)
-		self.cells = np.int8((convolution == 3) | (convolution == 53) | (convolution == 52))
-		self.aliveCells = np.sum(self.cells == 1)
+		""" Method to compute the next Game's state. It counts the neighbours of the alive cells only """
+		neighbours = (self.keys[:, None] + self.NEIGHBOURS[None, :]).ravel()
+		candidates, counts = np.unique(neighbours, return_counts = True)
+		alive = np.isin(candidates, self.keys, assume_unique = True)
+		born = candidates[self.rule.nextStates(alive * self.rule.stride + counts) == 1]
+		if 0 in self.rule.survival:
+			# the alive cells without alive neighbours are not among the candidates
+			born = np.union1d(born, np.setdiff1d(self.keys, candidates, assume_unique = True))
+		self.keys = born
 		self.generation = self.generation + 1
+		newCells = self.window()
+		self.states = nextCellStates(self.states, self.cells, newCells)
+		self.cells = newCells
+		return self.cells
+
+	def advance(self, n):
+		""" Method to compute the Game's state n generations in the future """
+		if n < 0:
+			raise ValueError('Cannot advance by a negative number of generations')
+		for _ in range(n):
+			self.nextState()
 		return self.cells
 
+	def jumpTo(self, generation):
+		""" Method to compute the Game's state at the given generation, which cannot precede the current one """
+		if generation < self.generation:
+			raise ValueError('Cannot jump back from generation ' + str(self.generation) + ' to generation ' + str(generation))
+		return self.advance(generation - self.generation)
+
 	def clearModel(self):
 		""" Method to clear the Model. It reinitialize all the attributes to the initial state """
-		self.cells = np.zeros((50,86))
-		self.aliveCells = np.sum(self.cells == 1)
+		self.keys = np.zeros(0, dtype = np.int64)
 		self.generation = 0
+		self.cells = self.window()
+		self.states = np.zeros((self.rows, self.columns), dtype = np.uint8)
 		return self.cells
 
+	def getPattern(self):
+		""" Method to get the alive cells of the whole plane, cropped to their bounding box """
+		box = self.getBoundingBox()
+		if box is None:
+			return np.zeros((0, 0), dtype = np.int8)
+		top, left, bottom, right = box
+		pattern = np.zeros((bottom - top + 1, right - left + 1), dtype = np.int8)
+		i, j = self.decode(self.keys)
+		pattern[i - top, j - left] = 1
+		return pattern
+
 	def saveModel(self, title):
-		""" Method to save an own Pattern. It requires a string which is used as the title of the pattern """
+		""" Method to save an own Pattern. It requires a string which is used as the title of the pattern.
+		The extension of the title chooses the format: '.rle', '.cells' and '.lpk' save the whole plane, '.npy' (the default) only the window """
 		path = 'myPatterns/'
 		directory = os.path.dirname(path)
 		if not os.path.exists(directory):
 			os.makedirs(directory)
 		path = path + title
-		np.save(path, self.cells)
+		extension = os.path.splitext(path)[1].lower()
+		return savePattern(path, self.getPattern() if extension in ('.rle', '.cells', '.lpk') else self.cells, self.rule.name)
 
-	def loadModel(self, path, pattern):
-		""" Method to load a Pattern. It requires a string representing the path needed to get the pattern, and the title of the pattern """
-		self.cells = np.load(path + pattern)
-		self.aliveCells = np.sum(self.cells == 1)
-		return self.cells
\ No newline at end of file
+	def loadModel(self, path, pattern, row = None, column = None):
+		""" Method to load a Pattern. It requires a string representing the path needed to get the pattern, and the title of the pattern.
+		The pattern is placed with its upper-left corner in the cell (row, column) of the window: by default, in the position saved
+		in the file ('.npy'), otherwise in the center of the window """
+		pattern, position = loadPattern(path + pattern)
+		if row is None or column is None:
+			if position is not None:
+				row, column = position
+			else:
+				row, column = (self.rows - pattern.shape[0]) // 2, (self.columns - pattern.shape[1]) // 2
+		i, j = np.nonzero(pattern)
+		i, j = i + row, j + column
+		self.keys = np.unique(self.encode(i + self.windowRow, j + self.windowColumn))
+		self.cells = self.window()
+		self.states = np.where(self.cells == 1, WHITE, BLACK).astype(np.uint8)
+		return self.cells
@@ -0,0 +1,243 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import os
+import re
+
+import numpy as np
+
+## THE PATTERN FILES
+
+# Supported formats:
+#   .npy     dense NumPy array of the whole board (the position of the pattern on the board is kept)
+#   .rle     run length encoded pattern (the standard format of Golly and of the LifeWiki)
+#   .cells   plaintext pattern ('.' for dead cells, 'O' for alive cells, '!' for comments)
+#   .lpk     packed pattern: a header (magic, rows, columns) and the bounding box of the pattern, 8 cells per byte
+# All the formats keep only the alive cells (state 1): the dying states of the Generations rules are saved as dead cells.
+# The RLE header keeps the rule of the pattern (see patternRule).
+PATTERN_EXTENSIONS = ['.npy', '.rle', '.cells', '.lpk']
+PACKED_MAGIC = b'GOLPACK1'
+
+def boundingBox(cells):
+	""" Function to get the bounding box (top, left, bottom, right) of the alive cells, bounds excluded (None if there are no alive cells) """
+	alive = np.asarray(cells) != 0
+	rows = np.flatnonzero(alive.any(axis = 1))
+	if len(rows) == 0:
+		return None
+	columns = np.flatnonzero(alive.any(axis = 0))
+	return (rows[0], columns[0], rows[-1] + 1, columns[-1] + 1)
+
+def crop(cells):
+	""" Function to get the alive cells cropped to their bounding box, as a boolean array, and the position (top, left) of the box """
+	box = boundingBox(cells)
+	if box is None:
+		return np.zeros((0, 0), dtype = bool), (0, 0)
+	top, left, bottom, right = box
+	return np.asarray(cells[top:bottom, left:right]) != 0, (top, left)
+
+def parseSize(size):
+	""" Function to get the (rows, columns) of a size written as 'ROWSxCOLUMNS' (e.g. '50x86', '16384x16384'), used by the scripts """
+	try:
+		rows, columns = (int(value) for value in size.lower().split('x'))
+	except ValueError:
+		raise ValueError('Invalid size: ' + size + ' (expected ROWSxCOLUMNS)')
+	if rows <= 0 or columns <= 0:
+		raise ValueError('Invalid size: ' + size)
+	return rows, columns
+
+## RLE
+
+# the tags of the runs: dead and alive cells ('b' and 'o', or '.' and 'A' in the multi-state patterns), the states from 2 of the 
+# multi-state patterns ('B' to 'X', then 'pA' to 'yO'), which are dying states (dead) in a Generations rule, and the end of a row
+RLE_TAG = re.compile(r'[bo.$A-X]|[p-y][A-X]')
+
+def readRLE(text):
+	""" Function to parse a run length encoded pattern. It returns the pattern as a boolean array, only the alive cells ('o' or 'A') 
+	are set. It raises a ValueError if a tag is unknown """
+	width = height = None
+	body = []
+	for line in text.splitlines():
+		line = line.strip()
+		if not line or line.startswith('#'):
+			continue
+		if width is None and line.startswith('x'):
+			# the fields without '=' are the ranges of a Larger than Life rule
+			header = dict(item.split('=', 1) for item in line.replace(' ', '').split(',') if '=' in item)
+			width, height = int(header['x']), int(header['y'])
+			continue
+		body.append(line)
+	body = re.sub(r'\s', '', ''.join(body).split('!')[0])
+
+	tokens = re.findall(r'(\d*)(' + RLE_TAG.pattern + '|.)', body)
+	for _, tag in tokens:
+		if not RLE_TAG.fullmatch(tag):
+			raise ValueError('Invalid tag in the run length encoded pattern: ' + repr(tag))
+	counts = np.array([int(count) if count else 1 for count, _ in tokens], dtype = np.int64)
+	kinds = np.array([tag for _, tag in tokens], dtype = 'U2')
+	newline = kinds == '$'
+	alive = (kinds == 'o') | (kinds == 'A')
+
+	# row and first column of every run: the columns restart from 0 after every '$'
+	rows = np.cumsum(np.where(newline, counts, 0)) - np.where(newline, counts, 0)
+	ends = np.cumsum(np.where(newline, 0, counts))
+	lineStarts = np.maximum.accumulate(np.where(newline, ends, 0))
+	starts = ends - np.where(newline, 0, counts) - lineStarts
+
+	counts, rows, starts = counts[alive], rows[alive], starts[alive]
+	total = int(counts.sum())
+	offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+	i = np.repeat(rows, counts)
+	j = np.repeat(starts, counts) + offsets
+
+	if width is None:
+		height = int(i.max()) + 1 if total else 0
+		width = int(j.max()) + 1 if total else 0
+	pattern = np.zeros((height, width), dtype = bool)
+	pattern[i, j] = True
+	return pattern
+
+def readRLERule(text):
+	""" Function to get the rule written in the header of a run length encoded pattern (None if there is none) """
+	for line in text.splitlines():
+		line = line.strip()
+		if line.startswith('x'):
+			header = dict(item.split('=', 1) for item in line.replace(' ', '').split(',') if '=' in item)
+			if 'rule' not in header:
+				return None
+			# the rule takes the rest of the line, since the Larger than Life rules contain commas; a bounded grid (':T100,100') is ignored
+			return line.split('rule', 1)[1].split('=', 1)[1].strip().split(':')[0]
+	return None
+
+def writeRLE(cells, name = None, rule = 'B3/S23'):
+	""" Function to encode the alive cells (cropped to their bounding box) as a run length encoded pattern of the given rule """
+	pattern, _ = crop(cells)
+	height, width = pattern.shape
+	runs = []
+	emptyRows = 0
+	for row in pattern:
+		if not row.any():
+			emptyRows = emptyRows + 1
+			continue
+		if runs:
+			runs.append((emptyRows + 1, '$'))
+		emptyRows = 0
+		# the boundaries of the runs of equal cells, the trailing dead cells are omitted
+		row = row[:np.flatnonzero(row)[-1] + 1]
+		bounds = np.concatenate(([0], np.flatnonzero(row[1:] != row[:-1]) + 1, [len(row)]))
+		for start, end in zip(bounds[:-1], bounds[1:]):
+			runs.append((end - start, 'o' if row[start] else 'b'))
+	runs.append((1, '!'))
+
+	lines = []
+	if name:
+		lines.append('#N ' + name)
+	lines.append('x = ' + str(width) + ', y = ' + str(height) + ', rule = ' + rule)
+	line = ''
+	for count, tag in runs:
+		token = (str(count) if count > 1 else '') + tag
+		if len(line) + len(token) > 70:
+			lines.append(line)
+			line = ''
+		line = line + token
+	lines.append(line)
+	return '\n'.join(lines) + '\n'
+
+## PLAINTEXT
+
+def readPlaintext(text):
+	""" Function to parse a plaintext pattern. It returns the pattern as a boolean array """
+	lines = [line.rstrip() for line in text.splitlines() if not line.startswith('!')]
+	width = max((len(line) for line in lines), default = 0)
+	pattern = np.zeros((len(lines), width), dtype = bool)
+	for i, line in enumerate(lines):
+		pattern[i, :len(line)] = [c in 'O*' for c in line]
+	return pattern
+
+def writePlaintext(cells, name = None):
+	""" Function to encode the alive cells (cropped to their bounding box) as a plaintext pattern """
+	pattern, _ = crop(cells)
+	lines = ['!Name: ' + name] if name else []
+	lines.extend(''.join('O' if cell else '.' for cell in row) for row in pattern)
+	return '\n'.join(lines) + '\n'
+
+## PACKED
+
+def readPacked(data):
+	""" Function to parse a packed pattern. It returns the pattern as a boolean array """
+	if data[:len(PACKED_MAGIC)] != PACKED_MAGIC:
+		raise ValueError('Not a packed pattern')
+	height, width = np.frombuffer(data, dtype = '<u4', count = 2, offset = len(PACKED_MAGIC))
+	bits = np.frombuffer(data, dtype = np.uint8, offset = len(PACKED_MAGIC) + 8)
+	return np.unpackbits(bits, count = int(height) * int(width)).reshape(int(height), int(width)).astype(bool)
+
+def writePacked(cells):
+	""" Function to encode the alive cells (cropped to their bounding box) as a packed pattern """
+	pattern, _ = crop(cells)
+	header = np.array(pattern.shape, dtype = '<u4').tobytes()
+	return PACKED_MAGIC + header + np.packbits(pattern).tobytes()
+
+## FILES
+
+def loadPattern(path):
+	""" Function to load a pattern file. It returns the pattern cropped to its bounding box, as a boolean array,
+	and its position (top, left) on the board for the formats that keep it (None otherwise) """
+	extension = os.path.splitext(path)[1].lower()
+	if extension == '.npy':
+		return crop(np.load(path, mmap_mode = 'r'))
+	if extension == '.lpk':
+		with open(path, 'rb') as f:
+			return crop(readPacked(f.read()))[0], None
+	with open(path, 'r') as f:
+		text = f.read()
+	if extension == '.rle':
+		return crop(readRLE(text))[0], None
+	if extension == '.cells':
+		return crop(readPlaintext(text))[0], None
+	raise ValueError('Unknown pattern format: ' + path)
+
+def patternRule(path):
+	""" Function to get the rule of a pattern file, kept only by the RLE format (None if the file does not keep it) """
+	if os.path.splitext(path)[1].lower() != '.rle':
+		return None
+	with open(path, 'r') as f:
+		return readRLERule(f.read())
+
+def savePattern(path, cells, rule = 'B3/S23'):
+	""" Function to save the alive cells (state 1) into a pattern file. The format is chosen by the extension of the path ('.npy' if there is none),
+	the RLE format keeps the given rule """
+	extension = os.path.splitext(path)[1].lower()
+	name = os.path.splitext(os.path.basename(path))[0]
+	if extension not in PATTERN_EXTENSIONS:
+		extension = '.npy'
+		path = path + extension
+	alive = np.asarray(cells) == 1
+	if extension == '.npy':
+		np.save(path, alive.astype(np.asarray(cells).dtype))
+	elif extension == '.lpk':
+		with open(path, 'wb') as f:
+			f.write(writePacked(alive))
+	else:
+		with open(path, 'w') as f:
+			f.write(writeRLE(alive, name, rule) if extension == '.rle' else writePlaintext(alive, name))
+	return path
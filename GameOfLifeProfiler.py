@@ -0,0 +1,191 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import collections
+import json
+import time
+
+## THE PROFILER
+
+class PhaseTimer:
+	"""
+    Context manager that measures the time spent in a phase and adds it to the profiler.
+    A timer is created once per phase and reused, so that a phase must not be nested into itself.
+
+    Attributes:
+        profiler          the profiler to which the time is added.
+        name              the name of the phase.
+        start             the time when the phase was entered.
+    """
+
+	def __init__(self, profiler, name):
+		""" Init method """
+		self.profiler = profiler
+		self.name = name
+		self.start = 0
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exception):
+		self.profiler.addTime(self.name, time.perf_counter() - self.start)
+		return False
+
+
+class DisabledTimer:
+	""" Context manager that does nothing, returned by a disabled profiler """
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception):
+		return False
+
+DISABLED_TIMER = DisabledTimer()
+
+
+class Profiler:
+	"""
+    This class collects the time spent in the phases of the step/render loop (e.g. 'compute', 'diff', 'render', 'paint', 'labels'),
+    some counters (e.g. 'births', 'deaths', 'repainted' cells), and the timings of the recent frames.
+    It is disabled by default: then 'phase' returns a timer that does nothing and 'count' returns immediately, so that the 
+    instrumented code costs a method call per phase. The phases are measured with 'with profiler.phase(name):'.
+    The phases of a frame can be measured in different threads (e.g. 'compute' in the worker, 'render' in the GUI thread),
+    but every phase must be measured by one thread at a time.
+
+    Attributes:
+        enabled           boolean value which is set to True to collect the timings.
+        phases            dictionary {phase: [count, total seconds, maximum seconds]}.
+        counters          dictionary {counter: total value}.
+        frames            ring buffer of the recent frames, every frame is a dictionary with the generation, the seconds since 
+                          the previous frame, and the seconds of every phase and the counters since the previous frame.
+        pending           the seconds of every phase since the last frame.
+        pendingCounters   the counters since the last frame.
+    """
+
+	def __init__(self, frames = 256):
+		""" Init method. It accepts the number of recent frames kept """
+		self.enabled = False
+		self.timers = {}
+		self.frames = collections.deque(maxlen = frames)
+		self.reset()
+
+	def reset(self):
+		""" Method to forget all the timings and the counters """
+		self.phases = {}
+		self.counters = {}
+		self.frames.clear()
+		self.pending = {}
+		self.pendingCounters = {}
+		self.lastFrame = None
+
+	def isEnabled(self):
+		""" Method to know if the profiler collects the timings """
+		return self.enabled
+
+	def setEnabled(self, enabled):
+		""" Method to enable or disable the profiler. Enabling it forgets the previous timings """
+		if enabled and not self.enabled:
+			self.reset()
+		self.enabled = enabled
+
+	def phase(self, name):
+		""" Method to get the context manager that measures the given phase """
+		if not self.enabled:
+			return DISABLED_TIMER
+		timer = self.timers.get(name)
+		if timer is None:
+			timer = self.timers[name] = PhaseTimer(self, name)
+		return timer
+
+	def addTime(self, name, seconds):
+		""" Method to add the time spent in a phase """
+		phase = self.phases.get(name)
+		if phase is None:
+			phase = self.phases[name] = [0, 0.0, 0.0]
+		phase[0] = phase[0] + 1
+		phase[1] = phase[1] + seconds
+		phase[2] = max(phase[2], seconds)
+		self.pending[name] = self.pending.get(name, 0.0) + seconds
+
+	def count(self, name, value = 1):
+		""" Method to increase a counter """
+		if not self.enabled:
+			return
+		self.counters[name] = self.counters.get(name, 0) + value
+		self.pendingCounters[name] = self.pendingCounters.get(name, 0) + value
+
+	def endFrame(self, generation):
+		""" Method to close a frame (a generation displayed): the phases and the counters since the previous frame are added to the ring buffer """
+		if not self.enabled:
+			return
+		now = time.perf_counter()
+		pending, self.pending = self.pending, {}
+		pendingCounters, self.pendingCounters = self.pendingCounters, {}
+		self.frames.append({
+			'generation': int(generation),
+			'seconds': None if self.lastFrame is None else now - self.lastFrame,
+			'phases': pending,
+			'counters': pendingCounters,
+		})
+		self.lastFrame = now
+
+	def getFrames(self):
+		""" Method to get the recent frames, the oldest first """
+		return list(self.frames)
+
+	def getFrameRate(self):
+		""" Method to get the number of frames per second over the recent frames (None if there are not enough frames) """
+		seconds = [frame['seconds'] for frame in self.frames if frame['seconds'] is not None]
+		if not seconds or sum(seconds) == 0:
+			return None
+		return len(seconds) / sum(seconds)
+
+	def summary(self, frames = 32):
+		""" Method to get the milliseconds of every phase per frame, averaged over the given number of recent frames """
+		recent = list(self.frames)[-frames:]
+		if not recent:
+			return {}
+		total = {}
+		for frame in recent:
+			for name, seconds in frame['phases'].items():
+				total[name] = total.get(name, 0.0) + seconds
+		return {name: 1000 * seconds / len(recent) for name, seconds in total.items()}
+
+	def dump(self):
+		""" Method to get all the timings as a dictionary that can be written as JSON """
+		return {
+			'enabled': self.enabled,
+			'phases': {name: {'count': count, 'totalSeconds': total, 'meanMs': 1000 * total / count, 'maxMs': 1000 * maximum} 
+				for name, (count, total, maximum) in self.phases.items()},
+			'counters': dict(self.counters),
+			'frameRate': self.getFrameRate(),
+			'frames': self.getFrames(),
+		}
+
+	def save(self, path):
+		""" Method to write the timings (see dump) into a JSON file """
+		with open(path, 'w') as f:
+			json.dump(self.dump(), f, indent = 2)
@@ -0,0 +1,266 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import re
+
+import numpy as np
+
+## THE RULES
+
+# the number of indices converted at once by lookup
+LOOKUP_CHUNK = 1 << 16
+
+def lookup(table, indices, out = None):
+	""" Function to read a table at the given indices (as np.take), writing into out if it is given. np.take converts the indices to intp:
+	they are converted a chunk of rows at a time, so that a large board of small indices is not converted all at once.
+	The indices must be inside the table (they are clipped instead of checked) """
+	if out is None:
+		out = np.empty(indices.shape, dtype = table.dtype)
+	rows = max(1, LOOKUP_CHUNK * len(indices) // max(1, indices.size))
+	for k in range(0, len(indices), rows):
+		np.take(table, indices[k:k+rows], out = out[k:k+rows], mode = 'clip')
+	return out
+
+# rules known by name, the names are case insensitive
+RULES = {
+	'life': 'B3/S23',
+	'highlife': 'B36/S23',
+	'day & night': 'B3678/S34678',
+	'seeds': 'B2/S',
+	'life without death': 'B3/S012345678',
+	'2x2': 'B36/S125',
+	'diamoeba': 'B35678/S5678',
+	'morley': 'B368/S245',
+	"brian's brain": 'B2/S/C3',
+	'star wars': 'B2/S345/C4',
+	'bosco': 'R5,C2,M1,S34..58,B34..45,NM',
+	'majority': 'R4,C2,M1,S41..81,B41..81,NM',
+}
+
+class Rule:
+	"""
+    This class represents a rule of a cellular automaton of the family of the Game of Life: a dead cell is born,
+    and an alive cell survives, if the number of its alive neighbours is in the given sets.
+    Generations rules have more than 2 states: an alive cell that does not survive becomes a dying cell (states 2, 3, ...),
+    which ages by one state per generation until it is dead again, and it cannot be born while it is dying.
+    Larger than Life rules count the neighbours in a square (Moore) or a diamond (von Neumann) of larger radius.
+    The rule is compiled once into a lookup table, indexed by [state, alive neighbours], and, for the rules on the
+    8 nearest neighbours, into a bitwise expression on the bits of the count, used by the bit-packed engines.
+
+    Attributes:
+        name              the canonical rule string (e.g. 'B3/S23', 'B2/S/C3', 'R5,C2,M1,S34..58,B34..45,NM').
+        birth             the numbers of alive neighbours which give birth to a dead cell.
+        survival          the numbers of alive neighbours which keep an alive cell alive.
+        states            the number of states of a cell (2 for Life-like rules).
+        radius            the radius of the neighbourhood.
+        neighbourhood     'M' for the Moore (square) neighbourhood, 'N' for the von Neumann (diamond) one.
+        middle            True if a cell counts itself among its neighbours.
+        kernel            the neighbourhood, a (2*radius+1)x(2*radius+1) matrix of 0/1 weights.
+        dtype             the type of the cells returned by the engines (int8, or uint8 for more than 127 states).
+        stride            the number of possible counts of alive neighbours: the code of a cell is state * stride + alive neighbours.
+        table             the lookup table of the next state, indexed by [state, alive neighbours].
+        flatTable         the lookup table indexed by the code of the cells.
+        aliveCodes        the codes of the cells which are alive in the next generation (rules with 2 states only),
+                          compared one by one instead of reading the table, if they are few.
+        countBits         the number of bits of the count used by the bitwise expression (None if the rule has none).
+        birthCubes        the bitwise expression of the births, a list of (mask, value) on the bits of the count:
+                          a count matches a cube if count & mask == value.
+        survivalCubes     the bitwise expression of the survivals.
+    """
+
+	def __init__(self, birth, survival, states = 2, radius = 1, neighbourhood = 'M', middle = False):
+		""" Init method. It compiles the rule """
+		self.birth = tuple(sorted(set(birth)))
+		self.survival = tuple(sorted(set(survival)))
+		self.states = states
+		self.radius = radius
+		self.neighbourhood = neighbourhood
+		self.middle = middle
+
+		if states < 2 or states > 256:
+			raise ValueError('The number of states must be between 2 and 256')
+		if radius < 1 or neighbourhood not in ('M', 'N'):
+			raise ValueError('Invalid neighbourhood')
+
+		i, j = np.mgrid[-radius:radius+1, -radius:radius+1]
+		inside = (np.abs(i) + np.abs(j) <= radius) if neighbourhood == 'N' else np.ones_like(i, dtype = bool)
+		inside[radius, radius] = middle
+		self.kernel = inside.astype(np.int32)
+		self.dtype = np.int8 if states <= 127 else np.uint8
+		size = int(self.kernel.sum())
+		if any(n < 0 or n > size for n in self.birth + self.survival):
+			raise ValueError('The numbers of neighbours must be between 0 and ' + str(size))
+
+		self.name = self.canonicalName()
+		self.compile()
+
+	def canonicalName(self):
+		""" Method to get the canonical rule string """
+		if self.isLifeLike():
+			name = 'B' + ''.join(map(str, self.birth)) + '/S' + ''.join(map(str, self.survival))
+			return name + ('/C' + str(self.states) if self.states > 2 else '')
+		return ('R' + str(self.radius) + ',C' + str(self.states if self.states > 2 else 0) + ',M' + str(int(self.middle)) +
+		        ',S' + ','.join(ranges(self.survival)) + ',B' + ','.join(ranges(self.birth)) + ',N' + self.neighbourhood)
+
+	def isLifeLike(self):
+		""" Method to know if the rule counts the 8 nearest neighbours (as the Game of Life) """
+		return self.radius == 1 and self.neighbourhood == 'M' and not self.middle
+
+	def compile(self):
+		""" Method to build the lookup table and the bitwise expression of the rule """
+		size = int(self.kernel.sum())
+		self.stride = size + 1
+		self.table = np.zeros((self.states, self.stride), dtype = self.dtype)
+		dying = 2 if self.states > 2 else 0
+		self.table[0, list(self.birth)] = 1
+		self.table[1] = dying
+		self.table[1, list(self.survival)] = 1
+		for state in range(2, self.states):
+			self.table[state] = (state + 1) % self.states
+		self.flatTable = self.table.ravel()
+		self.aliveCodes = [int(code) for code in np.flatnonzero(self.flatTable == 1)] if self.states == 2 else None
+
+		self.countBits = None
+		self.birthCubes = None
+		self.survivalCubes = None
+		if self.isLifeLike():
+			# the count can be kept modulo 8 if 0 and 8 neighbours have the same outcome
+			same = all((0 in counts) == (8 in counts) for counts in (self.birth, self.survival))
+			self.countBits = 3 if same else 4
+			self.birthCubes = cubes({n % (1 << self.countBits) for n in self.birth}, self.countBits)
+			self.survivalCubes = cubes({n % (1 << self.countBits) for n in self.survival}, self.countBits)
+
+	def nextStates(self, codes, out = None, scratch = None):
+		""" Method to get the next states of the cells, given their codes (state * stride + alive neighbours).
+		If out (an array of the dtype of the rule) and scratch (a boolean array) are given, the states are written into out without allocating """
+		if self.aliveCodes is not None and len(self.aliveCodes) <= 4:
+			result = np.zeros(codes.shape, dtype = bool) if out is None else out.view(bool)
+			if out is not None:
+				result.fill(False)
+			for code in self.aliveCodes:
+				result |= codes == code if scratch is None else np.equal(codes, code, out = scratch)
+			return result.view(self.dtype)
+		return lookup(self.flatTable, codes, out)
+
+	def __eq__(self, other):
+		""" Two rules are equal if they have the same canonical rule string """
+		return isinstance(other, Rule) and self.name == other.name
+
+	def __hash__(self):
+		""" Method to hash a rule by its canonical rule string """
+		return hash(self.name)
+
+	def __str__(self):
+		""" Method to get the canonical rule string """
+		return self.name
+
+def ranges(numbers):
+	""" Function to write a sorted sequence of numbers as a list of ranges ('a..b', or 'a' for a single number) """
+	result = []
+	for n in numbers:
+		if result and result[-1][1] == n - 1:
+			result[-1][1] = n
+		else:
+			result.append([n, n])
+	return [str(a) if a == b else str(a) + '..' + str(b) for a, b in result]
+
+def cubes(values, bits):
+	""" Function to compile a set of values of 'bits' bits into a short list of cubes (mask, value) whose union is the set.
+	Two cubes differing in a single bit are merged, until no more cubes can be merged (the prime implicants of the set) """
+	full = (1 << bits) - 1
+	current = {(full, v) for v in values}
+	primes = set()
+	while current:
+		merged = set()
+		used = set()
+		for mask, value in current:
+			for bit in range(bits):
+				b = 1 << bit
+				other = (mask, value ^ b)
+				if mask & b and other in current:
+					merged.add((mask & ~b, value & ~b))
+					used.add((mask, value))
+		primes |= current - used
+		current = merged
+	return sorted(primes)
+
+def matchCubes(cubeList, planes, words):
+	""" Function to evaluate a list of cubes on bit-sliced counts: planes[k] holds the bit k of the counts of the cells.
+	It returns the words whose bits are set where the count matches one of the cubes """
+	result = np.zeros_like(words)
+	for mask, value in cubeList:
+		term = ~np.zeros_like(words)
+		for k, plane in enumerate(planes):
+			if mask >> k & 1:
+				term &= plane if value >> k & 1 else ~plane
+		result |= term
+	return result
+
+def parseNumbers(ranges):
+	""" Function to parse the numbers of neighbours of a Larger than Life rule, a list of numbers or ranges ('a..b') """
+	numbers = []
+	for part in ranges:
+		if '..' in part:
+			a, b = part.split('..')
+			numbers.extend(range(int(a), int(b) + 1))
+		else:
+			numbers.append(int(part))
+	return numbers
+
+def parseRule(rule):
+	""" Function to get the compiled Rule of a rule string or name. It accepts the B/S notation ('B36/S23', 'S23/B36', '23/36'),
+	the Generations rules ('B2/S/C3', or '/2/3'), the Larger than Life rules ('R5,C2,M1,S34..58,B34..45,NM') and the names in RULES """
+	if isinstance(rule, Rule):
+		return rule
+	text = RULES.get(rule.strip().lower(), rule.strip())
+
+	# Larger than Life
+	if re.match(r'^R\d+,', text, re.IGNORECASE):
+		fields = {}
+		for token in text.upper().split(','):
+			if token[:1] in ('R', 'C', 'M', 'S', 'B', 'N'):
+				field = token[0]
+				fields[field] = [token[1:]] if token[1:] else []
+			else:
+				# another range of the previous field
+				fields[field].append(token)
+		try:
+			states = int(fields['C'][0]) if 'C' in fields else 0
+			return Rule(parseNumbers(fields.get('B', [])), parseNumbers(fields.get('S', [])), max(states, 2), int(fields['R'][0]),
+			            fields['N'][0] if 'N' in fields else 'M', fields.get('M') == ['1'])
+		except (KeyError, IndexError, ValueError) as error:
+			raise ValueError('Invalid rule: ' + rule + ' (' + str(error) + ')')
+
+	match = (re.match(r'^B(\d*)/?S(\d*)(?:/[CG]?(\d+))?$', text, re.IGNORECASE) or
+	         re.match(r'^S(?P<s>\d*)/?B(?P<b>\d*)(?:/[CG]?(?P<c>\d+))?$', text, re.IGNORECASE) or
+	         re.match(r'^(?P<s>\d*)/(?P<b>\d*)(?:/(?P<c>\d+))?$', text))
+	if match is None:
+		raise ValueError('Invalid rule: ' + rule)
+	if match.re.groupindex:
+		birth, survival, states = match.group('b'), match.group('s'), match.group('c')
+	else:
+		birth, survival, states = match.groups()
+	return Rule([int(d) for d in birth], [int(d) for d in survival], int(states) if states else 2)
+
+LIFE = parseRule('B3/S23')
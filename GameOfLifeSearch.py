@@ -0,0 +1,281 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import os
+
+import numpy as np
+
+from GameOfLifeCensus import OBJECTS, ObjectClassifier, labelComponents, orientations
+from GameOfLifePatterns import PATTERN_EXTENSIONS, crop, loadPattern, readPlaintext
+
+## THE INDEX
+
+def rawKey(cells):
+	""" Function to get the key of a pattern as it is, cropped to its bounding box: its shape and its cells packed into bytes """
+	return (cells.shape, np.packbits(cells).tobytes())
+
+class IndexEntry:
+	"""
+    A pattern of the index.
+
+    Attributes:
+        name              the name of the pattern.
+        source            the path of the pattern file (None for the patterns of the table of the known objects).
+        period            the period of the pattern, run alone (None if it is not periodic).
+        shift             the shift of the pattern after a period, in absolute value and the smaller first (None if it is not periodic).
+        population        the number of alive cells of the pattern, as it has been indexed.
+    """
+
+	def __init__(self, name, source, period, shift, population):
+		""" Init method """
+		self.name = name
+		self.source = source
+		self.period = period
+		self.shift = shift
+		self.population = population
+
+	def getKind(self):
+		""" Method to get the kind of the pattern: 'Still lifes', 'Oscillators', 'Spaceships' or 'Unknown' """
+		if self.period is None:
+			return 'Unknown'
+		if self.shift != (0, 0):
+			return 'Spaceships'
+		return 'Still lifes' if self.period == 1 else 'Oscillators'
+
+class PatternIndex:
+	"""
+    Index of the known patterns by shape, to find them on a board without correlating every pattern with the board.
+    Every pattern is run alone (see ObjectClassifier of GameOfLifeCensus), and the key (shape, packed cells) of the 8 orientations 
+    of all its phases is indexed, so that an object of the board is recognized by a single lookup of its key, whatever its orientation and phase.
+    A phase made of several objects (e.g. a glider gun) is indexed as a constellation, by the key of its largest object: 
+    when that object is found, the rest of the constellation is compared with the board around it.
+    The patterns that are not periodic alone (e.g. methuselahs, guns) are indexed by the phase given only.
+
+    Attributes:
+        rule              the compiled rule.
+        classifier        the ObjectClassifier that runs the patterns, to get their periods and their phases.
+        entries           the list of the IndexEntry of the patterns indexed.
+        objects           dictionary {key of an oriented phase made of a single object: IndexEntry}.
+        constellations    dictionary {key of the largest object of an oriented phase: list of (IndexEntry, (top, left) of the object in the phase, phase)}.
+    """
+
+	def __init__(self, rule = 'B3/S23', directories = ('knownPatterns/', 'myPatterns/'), objects = None, maxPeriod = 64):
+		""" Init method. It indexes the table of the known objects ({name: plaintext}, OBJECTS of GameOfLifeCensus by default),
+		then the pattern files of the directories. The phases already indexed keep their names """
+		self.classifier = ObjectClassifier(rule, maxPeriod, objects = {})
+		self.rule = self.classifier.rule
+		self.entries = []
+		self.objects = {}
+		self.constellations = {}
+		for name, text in (OBJECTS if objects is None else objects).items():
+			self.add(name, readPlaintext(text.replace('/', '\n')))
+		for directory in directories:
+			self.addDirectory(directory)
+
+	def __len__(self):
+		""" Method to get the number of patterns indexed """
+		return len(self.entries)
+
+	def add(self, name, cells, source = None):
+		""" Method to index a pattern under the given name. It returns its IndexEntry (None if the pattern is empty) """
+		cells = crop(cells)[0]
+		if cells.size == 0:
+			return None
+		found = self.classifier.classify(cells)
+		entry = IndexEntry(name, source, found.period, found.shift, int(cells.sum()))
+		self.entries.append(entry)
+		for phase in self.classifier.phases[found.key]:
+			for oriented in orientations(phase):
+				labels, boxes = labelComponents(oriented)
+				if len(boxes) == 1:
+					self.objects.setdefault(rawKey(oriented), entry)
+					continue
+				k = int(np.argmax(np.bincount(labels.ravel())[1:]))
+				largest = labels[boxes[k]] == k + 1
+				candidates = self.constellations.setdefault(rawKey(largest), [])
+				position = (boxes[k][0].start, boxes[k][1].start)
+				if not any(position == other and np.array_equal(oriented, cells) for _, other, cells in candidates):
+					candidates.append((entry, position, oriented))
+		return entry
+
+	def addDirectory(self, directory):
+		""" Method to index the pattern files of a directory, named after the files (without extension). 
+		The files that cannot be parsed are skipped. It returns the number of patterns indexed """
+		if not os.path.isdir(directory):
+			return 0
+		count = 0
+		for name in sorted(os.listdir(directory)):
+			title, extension = os.path.splitext(name)
+			if extension.lower() not in PATTERN_EXTENSIONS:
+				continue
+			try:
+				pattern, _ = loadPattern(directory + name)
+			except (ValueError, OSError, KeyError):
+				continue
+			if self.add(title, pattern, directory + name) is not None:
+				count = count + 1
+		return count
+
+	def lookup(self, cells):
+		""" Method to get the IndexEntry of an object (cropped to its bounding box), None if it is not known """
+		return self.objects.get(rawKey(np.asarray(cells) != 0))
+
+## THE SEARCH
+
+class ObjectMatch:
+	"""
+    A known pattern found on a board.
+
+    Attributes:
+        entry             the IndexEntry of the pattern.
+        top, left         the upper-left corner of the bounding box of the pattern on the board.
+        bottom, right     the lower-right corner of the bounding box of the pattern on the board (excluded).
+    """
+
+	def __init__(self, entry, top, left, bottom, right):
+		""" Init method """
+		self.entry = entry
+		self.top = top
+		self.left = left
+		self.bottom = bottom
+		self.right = right
+
+	def getName(self):
+		""" Method to get the name of the pattern """
+		return self.entry.name
+
+	def getBox(self):
+		""" Method to get the bounding box (top, left, bottom, right) of the pattern on the board, bounds excluded """
+		return (self.top, self.left, self.bottom, self.right)
+
+class ObjectScanner:
+	"""
+    Scanner of the known patterns of a board, that keeps the objects found by the previous scan: only the objects in the regions 
+    of the board that changed since then are looked up again. The objects are split as by the census (see components of GameOfLifeCensus): 
+    the alive cells at most 2 cells apart belong to the same object, so a known pattern touching other cells is not found.
+
+    Attributes:
+        index             the PatternIndex of the known patterns.
+        alive             the alive cells of the previous scan (None before the first scan).
+        found             dictionary {bounding box (top, bottom, left, right) of an object of the previous scan: (ObjectMatch or None,
+                          constellations anchored by the object, the box covering the object and its constellations, constellations found)}.
+        matches           the list of the ObjectMatch of the previous scan.
+    """
+
+	# the side of the blocks of cells in which the changes are looked for (see changedBoxes)
+	BLOCK_SIZE = 8
+
+	def __init__(self, index = None):
+		""" Init method. It accepts the index of the known patterns (the default PatternIndex of the Game of Life if it is not given) """
+		self.index = PatternIndex() if index is None else index
+		self.reset()
+
+	def reset(self):
+		""" Method to forget the previous scan, so that the next one looks up all the objects again """
+		self.alive = None
+		self.found = {}
+		self.matches = []
+
+	def getMatches(self):
+		""" Method to get the patterns found by the previous scan, a list of ObjectMatch """
+		return self.matches
+
+	def changedBoxes(self, changed, boxes):
+		""" Method to find the boxes (top, bottom, left, right) that may contain a changed cell: the changed cells are reduced to blocks 
+		of BLOCK_SIZE x BLOCK_SIZE cells, and the changed blocks covered by every box are counted with their summed-area table """
+		if not boxes:
+			return np.zeros(0, dtype = bool)
+		size = self.BLOCK_SIZE
+		blocks = np.logical_or.reduceat(np.logical_or.reduceat(changed, np.arange(0, changed.shape[0], size), axis = 0), 
+		                                np.arange(0, changed.shape[1], size), axis = 1)
+		table = np.zeros((blocks.shape[0] + 1, blocks.shape[1] + 1), dtype = np.int32)
+		np.cumsum(np.cumsum(blocks, axis = 0, dtype = np.int32), axis = 1, out = table[1:, 1:])
+		top, bottom, left, right = np.array(boxes).T
+		top, left, bottom, right = top // size, left // size, -(-bottom // size), -(-right // size)
+		return table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left] > 0
+
+	def lookup(self, alive, component, box):
+		""" Method to look up an object (the boolean matrix of its bounding box) and the constellations anchored by it.
+		It returns the value kept in found (see the attributes) """
+		key = rawKey(component)
+		entry = self.index.objects.get(key)
+		top, bottom, left, right = box
+		match = None if entry is None else ObjectMatch(entry, top, left, bottom, right)
+		if key not in self.index.constellations:
+			return (match, [], box, [])
+		candidates = []
+		for pattern, (dy, dx), phase in self.index.constellations[key]:
+			y, x = top - dy, left - dx
+			if y >= 0 and x >= 0 and y + phase.shape[0] <= alive.shape[0] and x + phase.shape[1] <= alive.shape[1]:
+				candidates.append((pattern, y, x, phase))
+		extent = (min([top] + [y for _, y, _, _ in candidates]), max([bottom] + [y + phase.shape[0] for _, y, _, phase in candidates]),
+		          min([left] + [x for _, _, x, _ in candidates]), max([right] + [x + phase.shape[1] for _, _, x, phase in candidates]))
+		return (match, candidates, extent, self.constellations(alive, candidates))
+
+	def constellations(self, alive, candidates):
+		""" Method to get the constellations (entry, top, left, phase) that are on the board, as a list of ObjectMatch """
+		return [ObjectMatch(entry, y, x, y + phase.shape[0], x + phase.shape[1]) for entry, y, x, phase in candidates
+		        if alive[y:y+phase.shape[0], x:x+phase.shape[1]].tobytes() == phase.tobytes()]
+
+	def scan(self, cells, changed = None):
+		""" Method to find the known patterns among the alive (nonzero) cells. The regions that changed since the previous scan can be given, 
+		as a boolean matrix or as a list of rectangles (top, bottom, left, right); by default the cells are compared with the previous ones.
+		It returns the list of ObjectMatch, sorted by position """
+		alive = np.asarray(cells) != 0
+		if self.alive is None or self.alive.shape != alive.shape:
+			self.found = {}
+		elif changed is None:
+			changed = alive != self.alive
+		elif not isinstance(changed, np.ndarray):
+			rectangles = changed
+			changed = np.zeros(alive.shape, dtype = bool)
+			for top, bottom, left, right in rectangles:
+				changed[top:bottom, left:right] = True
+
+		labels, slices = labelComponents(alive)
+		objects = [(k, (box[0].start, box[0].stop, box[1].start, box[1].stop)) for k, box in enumerate(slices) if box is not None]
+		previous = [self.found.get(box) for _, box in objects]
+		# an object found by the previous scan is kept if nothing changed around it and its constellations
+		dirty = self.changedBoxes(changed, [box if kept is None else kept[2] for (_, box), kept in zip(objects, previous)]) if self.found else None
+
+		found = {}
+		matches = []
+		constellations = []
+		for n, (k, box) in enumerate(objects):
+			kept = previous[n]
+			if kept is None or dirty[n]:
+				kept = self.lookup(alive, labels[slices[k]] == k + 1, box)
+			found[box] = kept
+			if kept[0] is not None:
+				matches.append(kept[0])
+			constellations.extend(kept[3])
+
+		if constellations:
+			# the objects of a constellation are not reported alone
+			matches = [match for match in matches if not any(other.top <= match.top and match.bottom <= other.bottom and 
+			           other.left <= match.left and match.right <= other.right for other in constellations)]
+		self.alive = alive
+		self.found = found
+		self.matches = sorted(matches + constellations, key = ObjectMatch.getBox)
+		return self.matches
@@ -0,0 +1,243 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import math
+
+import numpy as np
+
+from GameOfLifeModel import COLOR_MASK
+
+## THE DENSITY MIPMAP
+
+# the density of a block of 2x2 cells, by number of alive cells (rounded up, so that a single alive cell is always visible)
+BLOCK_DENSITY = np.array([0, 64, 128, 192, 255], dtype = np.uint8)
+
+def aliveMask(states):
+	""" Function to get the alive cells (white, lime or green) from their states (see GameOfLifeModel.getCellStates), as an array of uint8 """
+	# the black cells wrap around to 255
+	return (((states & COLOR_MASK) - np.uint8(1)) < 3).view(np.uint8)
+
+def halve(values, level):
+	""" Function to reduce the blocks of 2x2 values of a level of the mipmap to one value of the next level. The values of level 0 are 
+	the alive cells (0 or 1), and they become densities (0-255); the densities of the other levels are averaged, rounded up """
+	rows, columns = values.shape
+	if rows % 2 or columns % 2:
+		values = np.pad(values, ((0, rows % 2), (0, columns % 2)))
+	if level == 0:
+		# at most 4 alive cells, the sums fit into uint8
+		sums = values[0::2, 0::2] + values[1::2, 0::2]
+		sums += values[0::2, 1::2]
+		sums += values[1::2, 1::2]
+		return BLOCK_DENSITY[sums]
+	sums = values[0::2, 0::2].astype(np.uint16) + values[1::2, 0::2]
+	sums += values[0::2, 1::2]
+	sums += values[1::2, 1::2] + np.uint16(3)
+	return (sums >> 2).astype(np.uint8)
+
+class DensityMipmap:
+	"""
+    This class keeps a pyramid of the density of the alive cells of the board, used to draw the board when a cell is smaller than a pixel.
+    The level k of the pyramid has a value (0-255) for every block of 2^k x 2^k cells, the average density of the block, rounded up so that 
+    a block with a single alive cell is never empty. The pyramid is updated lazily: the regions of the board that changed are collected, 
+    and they are recomputed (only them, in every level) the first time that a level is requested.
+
+    Attributes:
+        rows, columns     the size of the board.
+        levels            the levels of the pyramid, levels[k-1] is the level k (the level 0 are the states of the cells).
+        dirty             the rectangles (top, bottom, left, right) of the cells changed since the last update, an empty list if nothing changed.
+    """
+
+	# the largest number of changed rectangles kept separately, more rectangles are merged into their bounding box
+	MAX_DIRTY_RECTANGLES = 64
+
+	def __init__(self, rows, columns):
+		""" Init method """
+		self.rows = rows
+		self.columns = columns
+		self.levels = []
+		height, width = rows, columns
+		while height > 1 or width > 1:
+			height, width = (height + 1) // 2, (width + 1) // 2
+			self.levels.append(np.zeros((height, width), dtype = np.uint8))
+		self.dirty = []
+
+	def getLevelCount(self):
+		""" Method to get the number of levels of the pyramid, the states of the cells excluded """
+		return len(self.levels)
+
+	def invalidate(self, top = 0, bottom = None, left = 0, right = None):
+		""" Method to mark a region of the board as changed (the whole board by default) """
+		bottom = self.rows if bottom is None else bottom
+		right = self.columns if right is None else right
+		self.dirty.append((top, bottom, left, right))
+		if len(self.dirty) > self.MAX_DIRTY_RECTANGLES:
+			tops, bottoms, lefts, rights = zip(*self.dirty)
+			self.dirty = [(min(tops), max(bottoms), min(lefts), max(rights))]
+
+	def update(self, states):
+		""" Method to recompute the changed regions in every level, from the states of the cells """
+		dirty, self.dirty = self.dirty, []
+		for top, bottom, left, right in dirty:
+			height, width = self.rows, self.columns
+			for k, level in enumerate(self.levels):
+				# the region is extended to whole blocks of the previous level
+				top, left = top - top % 2, left - left % 2
+				bottom, right = min(bottom + bottom % 2, height), min(right + right % 2, width)
+				values = aliveMask(states[top:bottom, left:right]) if k == 0 else self.levels[k - 1][top:bottom, left:right]
+				top, bottom, left, right = top // 2, (bottom + 1) // 2, left // 2, (right + 1) // 2
+				level[top:bottom, left:right] = halve(values, k)
+				height, width = level.shape
+
+	def getLevel(self, k, states):
+		""" Method to get the level k of the pyramid (k >= 1), updated from the states of the cells """
+		self.update(states)
+		return self.levels[k - 1]
+
+## THE DAMAGED REGIONS
+
+def coalesceTiles(tileSize, active, rows, columns):
+	""" Function to merge the active tiles (a boolean matrix of the tiles of tileSize x tileSize cells) into a few rectangles of cells 
+	(top, bottom, left, right): every run of adjacent tiles in a row of tiles is merged with the identical runs of the following rows.
+	The rectangles are clipped to the board of the given size """
+	rectangles = []
+	runs = {}
+	for ti in np.flatnonzero(active.any(axis = 1)):
+		padded = np.concatenate(([False], active[ti], [False]))
+		edges = np.flatnonzero(padded[1:] != padded[:-1])
+		current = {}
+		for first, last in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+			top, bottom = runs.pop((first, last), (ti, ti))
+			if bottom != ti:
+				# the run is not in the previous row of tiles
+				rectangles.append((top, bottom, first, last))
+				top = ti
+			current[(first, last)] = (top, ti + 1)
+		rectangles.extend((top, bottom, first, last) for (first, last), (top, bottom) in runs.items())
+		runs = current
+	rectangles.extend((top, bottom, first, last) for (first, last), (top, bottom) in runs.items())
+	return [(int(top) * tileSize, min(int(bottom) * tileSize, rows), first * tileSize, min(last * tileSize, columns)) 
+		for top, bottom, first, last in rectangles]
+
+## THE VIEWPORT
+
+class Viewport:
+	"""
+    This class maps the cells of the board to the pixels of a widget: a cell is a square of 'scale' pixels (less than a pixel when zoomed out),
+    and the widget shows the cells from (top, left). It chooses the level of the density mipmap to draw, and the blocks of that level 
+    that are visible, so that the cost of drawing the board depends on the size of the widget and not on the size of the board.
+
+    Attributes:
+        rows, columns     the size of the board.
+        width, height     the size of the widget, in pixels.
+        scale             the size of a cell, in pixels.
+        top, left         the coordinates (floats) of the point of the board in the upper-left corner of the widget.
+        fitted            boolean value which is set to True while the whole board is fitted into the widget (it is fitted again when the widget is resized).
+    """
+
+	# the largest size of a cell, in pixels
+	MAX_SCALE = 64
+
+	def __init__(self, rows, columns, width = 1, height = 1):
+		""" Init method """
+		self.rows = rows
+		self.columns = columns
+		self.width = max(width, 1)
+		self.height = max(height, 1)
+		self.fit()
+
+	def fitScale(self):
+		""" Method to get the scale that fits the whole board into the widget """
+		return min(self.width / self.columns, self.height / self.rows)
+
+	def fit(self):
+		""" Method to fit the whole board into the widget, centered """
+		self.scale = self.fitScale()
+		self.top = (self.rows - self.height / self.scale) / 2
+		self.left = (self.columns - self.width / self.scale) / 2
+		self.fitted = True
+
+	def resize(self, width, height):
+		""" Method to change the size of the widget. The center of the view does not move """
+		row, column = self.top + self.height / self.scale / 2, self.left + self.width / self.scale / 2
+		self.width, self.height = max(width, 1), max(height, 1)
+		if self.fitted:
+			self.fit()
+		else:
+			self.top, self.left = row - self.height / self.scale / 2, column - self.width / self.scale / 2
+
+	def isFitted(self):
+		""" Method to know if the whole board is fitted into the widget """
+		return self.fitted
+
+	def getScale(self):
+		""" Method to get the size of a cell, in pixels """
+		return self.scale
+
+	def zoom(self, factor, x = None, y = None):
+		""" Method to multiply the size of the cells by factor, keeping the point (x, y) of the widget (the center by default) still.
+		The board can be zoomed out down to a quarter of the size that fits it into the widget """
+		x = self.width / 2 if x is None else x
+		y = self.height / 2 if y is None else y
+		scale = min(max(self.scale * factor, min(self.fitScale(), 1) / 4), self.MAX_SCALE)
+		self.top = self.top + y / self.scale - y / scale
+		self.left = self.left + x / self.scale - x / scale
+		self.scale = scale
+		self.fitted = False
+
+	def pan(self, dx, dy):
+		""" Method to move the board by (dx, dy) pixels """
+		self.top = self.top - dy / self.scale
+		self.left = self.left - dx / self.scale
+		self.fitted = False
+
+	def cellAt(self, x, y):
+		""" Method to get the indices (i, j) of the cell at the point (x, y) of the widget, None if there is no cell """
+		i = math.floor(self.top + y / self.scale)
+		j = math.floor(self.left + x / self.scale)
+		if 0 <= i < self.rows and 0 <= j < self.columns:
+			return i, j
+		return None
+
+	def level(self, levels):
+		""" Method to get the level of the mipmap to draw (0: the cells), given the number of levels: a block of the level is 1-2 pixels wide """
+		if self.scale >= 1:
+			return 0
+		return min(int(math.floor(math.log2(1 / self.scale))), levels)
+
+	def visibleBlocks(self, k, height, width, x = 0, y = 0, w = None, h = None):
+		""" Method to get the blocks (top, bottom, left, right) of the level k of the mipmap, of the given size, that are visible 
+		in the rectangle (x, y, w, h) of the widget (the whole widget by default) """
+		w = self.width - x if w is None else w
+		h = self.height - y if h is None else h
+		block = 2**k
+		top = min(max(math.floor((self.top + y / self.scale) / block), 0), height)
+		bottom = min(max(math.ceil((self.top + (y + h) / self.scale) / block), top), height)
+		left = min(max(math.floor((self.left + x / self.scale) / block), 0), width)
+		right = min(max(math.ceil((self.left + (x + w) / self.scale) / block), left), width)
+		return top, bottom, left, right
+
+	def blockRectangle(self, k, top, bottom, left, right):
+		""" Method to get the rectangle (x, y, width, height) of the widget, in pixels, where the given blocks of the level k are drawn """
+		size = 2**k * self.scale
+		return ((left * 2**k - self.left) * self.scale, (top * 2**k - self.top) * self.scale, (right - left) * size, (bottom - top) * size)
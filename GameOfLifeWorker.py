@@ -0,0 +1,232 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import collections
+import threading
+import time
+
+from PyQt5.QtCore import QThread
+
+from GameOfLifeViewport import coalesceTiles
+
+class Frame:
+    """ A generation computed by the worker, ready to be displayed 
+
+        Attributes:
+            generation  the generation of the frame
+            aliveCells  the number of alive cells
+            rectangles  the rectangles of cells (top, bottom, left, right) changed since the last frame taken by the GUI, 
+                        None if they are unknown (the whole board must be drawn)
+            states      the copies of the states of the cells (see GameOfLifeModel.getCellStates) in the rectangles, 
+                        or a copy of the states of the whole board if the rectangles are None
+            stillLife   boolean value which is set to True if the state does not change anymore
+            finished    boolean value which is set to True if it is the last frame of the worker (still life, or end of the job)
+    """
+
+    def __init__(self, generation, aliveCells, rectangles, states, stillLife = False, finished = None):
+        """ Init Method """
+        self.generation = generation
+        self.aliveCells = aliveCells
+        self.rectangles = rectangles
+        self.states = states
+        self.stillLife = stillLife
+        self.finished = stillLife if finished is None else finished
+
+class SimulationWorker(QThread):
+    """ Thread that computes the generations of the model ahead of the GUI, and puts them into a bounded queue of frames.
+        The thread stops by itself when the model reaches a still life (oscillators are replayed by the model without being computed).
+        The GUI thread takes only the newest frame when it renders: the older frames are discarded, and when the queue is full
+        the oldest frame is dropped, so that a slow rendering never slows down the simulation. A frame holds only the states of the tiles
+        changed since the last frame taken by the GUI (see GameOfLifeModel.getUpdatedTiles), so that the newest frame is enough to draw the board.
+        The model must be modified only while holding 'lock' (or while the worker is stopped).
+        In turbo mode, every frame advances the model by several generations (generationsPerFrame) without the minimum interval, 
+        and only the last one is put into the queue: the number of generations is tuned after every frame, so that computing a frame 
+        takes the time of a frame at the target frame rate. The worker can also run a job: it stops by itself when the model reaches 
+        the target generation, or when the state becomes periodic (still life or oscillator).
+
+        Attributes:
+            model                reference to the model
+            frames               the queue of the computed frames, the newest is the last one
+            lock                 the lock protecting the model and the queue
+            interval             the minimum time (in seconds) between two generations
+            running              boolean value which is set to False to stop the thread
+            droppedFrames        the number of frames computed but never displayed
+            turbo                boolean value which is set to True to compute several generations per frame
+            targetFrameRate      the number of frames per second that the turbo mode tries to reach
+            generationsPerFrame  the number of generations computed per frame in turbo mode
+            targetGeneration     the generation where the job stops (None if there is no target)
+            untilStable          boolean value which is set to True if the job stops when the state becomes periodic
+            damagedTiles         the tiles changed since the last frame taken by the GUI, as (tile size, boolean matrix of the tiles), 
+                                 None if no tile changed, or if the whole board changed (see damagedAll)
+            damagedAll           boolean value which is set to True if the whole board must be drawn by the next frame taken by the GUI
+    """
+
+    # the maximum number of generations computed per frame in turbo mode
+    MAX_GENERATIONS_PER_FRAME = 1 << 20
+
+    def __init__(self, model, maxFrames = 4):
+        """ Init Method """
+        super().__init__()
+
+        self.model = model
+        self.frames = collections.deque(maxlen = maxFrames)
+        self.lock = threading.Lock()
+        self.interval = 0
+        self.running = False
+        self.droppedFrames = 0
+        self.wakeUp = threading.Event()
+        self.turbo = False
+        self.targetFrameRate = 30
+        self.generationsPerFrame = 1
+        self.targetGeneration = None
+        self.untilStable = False
+        self.resetDamage()
+
+    def setInterval(self, interval):
+        """ Method to set the minimum time (in milliseconds) between two generations """
+        self.interval = interval / 1000
+
+    def setTurbo(self, turbo, targetFrameRate = None):
+        """ Method to enable or disable the turbo mode, and to set its target frame rate """
+        self.turbo = turbo
+        if targetFrameRate is not None:
+            self.targetFrameRate = targetFrameRate
+        self.generationsPerFrame = 1
+
+    def getGenerationsPerFrame(self):
+        """ Method to get the number of generations computed per frame (always 1 if the turbo mode is disabled) """
+        return self.generationsPerFrame if self.turbo else 1
+
+    def setJob(self, targetGeneration = None, untilStable = False):
+        """ Method to set the job of the worker: it stops when the model reaches targetGeneration (if it is not None), 
+        or when the state becomes periodic (if untilStable is True). Without a target it only stops at a still life """
+        self.targetGeneration = targetGeneration
+        self.untilStable = untilStable
+
+    def hasJob(self):
+        """ Method to know if the worker runs a job """
+        return self.targetGeneration is not None or self.untilStable
+
+    def resetDamage(self):
+        """ Method to forget the tiles changed, once the GUI displays the newest frame """
+        self.damagedTiles = None
+        self.damagedAll = False
+
+    def addDamage(self, tiles):
+        """ Method to add the tiles changed by the last generations (None if they are unknown) to the tiles changed since the last frame taken """
+        if tiles is None:
+            self.damagedAll = True
+        elif self.damagedTiles is None:
+            self.damagedTiles = (tiles[0], tiles[1].copy())
+        else:
+            self.damagedTiles[1][...] |= tiles[1]
+
+    def copyDamage(self, states):
+        """ Method to copy the states of the tiles changed since the last frame taken (merged into a few rectangles), 
+        as (rectangles, copies of the rectangles), or the states of the whole board as (None, copy) if the tiles are unknown """
+        if self.damagedAll:
+            return None, states.copy()
+        if self.damagedTiles is None:
+            return [], []
+        rectangles = coalesceTiles(*self.damagedTiles, *states.shape)
+        return rectangles, [states[top:bottom, left:right].copy() for top, bottom, left, right in rectangles]
+
+    def tune(self, generations, seconds):
+        """ Method to choose the number of generations of the next frame in turbo mode, from the time spent on the last frame. 
+        It changes by a factor of 2 at most per frame, so that a single slow frame does not disrupt it """
+        if generations < self.generationsPerFrame:
+            # the frame was shortened by the target generation, it does not tell anything
+            return
+        factor = 2 if seconds <= 0 else min(max(1 / (self.targetFrameRate * seconds), 0.5), 2)
+        self.generationsPerFrame = max(1, min(int(self.generationsPerFrame * factor), self.MAX_GENERATIONS_PER_FRAME))
+
+    def run(self):
+        """ Method executed by the thread: it computes the generations until it is stopped """
+        while self.running:
+            start = time.perf_counter()
+            with self.lock:
+                generations = self.getGenerationsPerFrame()
+                if self.targetGeneration is not None:
+                    generations = min(generations, self.targetGeneration - self.model.getGeneration())
+                if generations == 1:
+                    self.model.nextState()
+                elif generations > 1:
+                    self.model.advance(generations, self.untilStable)
+                states = self.model.getCellStates()
+                if generations > 0:
+                    # the tiles of the model are the ones changed by all the generations computed
+                    self.addDamage(self.model.getUpdatedTiles())
+                if len(self.frames) == self.frames.maxlen:
+                    self.droppedFrames = self.droppedFrames + 1
+                stillLife = self.model.isStillLife()
+                finished = (stillLife or (self.untilStable and self.model.isPeriodic()) or 
+                            (self.targetGeneration is not None and self.model.getGeneration() >= self.targetGeneration))
+                self.frames.append(Frame(self.model.getGeneration(), self.model.getAliveCells(), *self.copyDamage(states), stillLife, finished))
+            if finished:
+                self.running = False
+                break
+            elapsed = time.perf_counter() - start
+            if self.turbo:
+                self.tune(generations, elapsed)
+                continue
+            wait = self.interval - elapsed
+            if wait > 0:
+                self.wakeUp.wait(wait)
+
+    def startSimulation(self):
+        """ Method to start computing the generations """
+        if not self.isRunning():
+            self.running = True
+            self.wakeUp.clear()
+            self.resetDamage()
+            self.start()
+
+    def stopSimulation(self):
+        """ Method to stop computing the generations. It returns when the thread has finished """
+        self.running = False
+        self.wakeUp.set()
+        self.wait()
+        self.flush()
+
+    def takeFrame(self, after = -1):
+        """ Method to get the newest frame (None if there are no frames). The older frames are discarded. 
+        The frames up to the generation 'after' (e.g. computed before an edit) are discarded too, and then the tiles they changed 
+        are kept for the next frame """
+        with self.lock:
+            if not self.frames:
+                return None
+            frame = self.frames.pop()
+            self.droppedFrames = self.droppedFrames + len(self.frames)
+            self.frames.clear()
+            if frame.generation <= after:
+                self.droppedFrames = self.droppedFrames + 1
+                return None
+            self.resetDamage()
+            return frame
+
+    def flush(self):
+        """ Method to discard all the frames in the queue """
+        with self.lock:
+            self.frames.clear()
+            self.resetDamage()
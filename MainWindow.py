@@ -22,9 +22,17 @@
 ## SOFTWARE.
 ##
 
+import os
+import tempfile
+
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtWidgets import (QSlider, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QCheckBox, QGroupBox)
+from PyQt5.QtWidgets import (QSlider, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QCheckBox, QGroupBox, QComboBox, 
+                             QSpinBox, QProgressBar, QStatusBar, QMessageBox)
 from GameOfLifeBoard import GameOfLifeBoard
+from GameOfLifeEngines import TOPOLOGIES, fastestEngine
+from GameOfLifeRules import RULES, parseRule
+from GameOfLifeLibrary import PatternLibrary
+from GameOfLifeWorker import SimulationWorker
 from MyWidgets import PlayPauseStepButton, infoLabel, loadWindow, saveWindow
 
 ### THE GUI
@@ -33,13 +41,23 @@ class MainWindow(QWidget):
     """ Class that implements the main window (view/Controller)
         
         Attributes:
-            model     reference to the model
+            model        reference to the model
+            worker       the thread that computes the generations while the game is playing
+            profilePath  the path where the timings of the profiler are written when it is disabled
+            statusBar    the bar where the messages for the user are shown (see showMessage and showError)
     """
+
+    # the time (in milliseconds) a message is shown in the status bar
+    MESSAGE_TIMEOUT = 5000
+
     def __init__(self, model):
         """ Init Method """
         super().__init__()
 
         self.model = model
+        self.worker = SimulationWorker(self.model)
+        self.library = PatternLibrary()
+        self.profilePath = os.path.join(tempfile.gettempdir(), 'gameOfLifeProfile.json')
         self.init_ui()
 
     def init_ui(self):
@@ -54,10 +72,18 @@ class MainWindow(QWidget):
         self.clearButton = QPushButton()
         self.clearButton.setText("Clear")
         self.playPauseStepButton = PlayPauseStepButton()
+        self.stepBackButton = QPushButton()
+        self.stepBackButton.setText("Step Back")
+        self.stepBackButton.setFixedWidth(100)
+        self.stepBackButton.setEnabled(False)
         self.saveButton = QPushButton()
         self.saveButton.setText("Save")
         self.loadButton = QPushButton()
         self.loadButton.setText("Load")
+        self.runUntilButton = QPushButton()
+        self.runUntilButton.setText("Run")
+        self.runUntilStableButton = QPushButton()
+        self.runUntilStableButton.setText("Run until Stable")
 
         #Frame-Rate Slider
         self.frameRateSlider = QSlider(Qt.Horizontal)
@@ -68,22 +94,46 @@ class MainWindow(QWidget):
         self.frameRateSlider.setTickInterval(10)
         self.frameRateSlider.setTickPosition(QSlider.TicksBelow)
 
+        #Fast Forward (turbo mode, and jobs running until a generation or until the state is stable)
+        self.turboMod = QCheckBox("Turbo")
+        self.targetGenerationBox = QSpinBox()
+        self.targetGenerationBox.setRange(0, 2**31 - 1)
+        self.targetGenerationBox.setSingleStep(1000)
+        self.targetGenerationBox.setValue(100000)
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, 1)
+        self.progressBar.setValue(0)
+        self.progressBar.setFormat('%v')
+
         #Labels
         self.generationLabel = infoLabel('Current Generation: ')
         self.aliveCellsLabel = infoLabel('Alive Cells: ')
 
+        #Rule (a name or a rule string typed by the user)
+        self.ruleSelector = QComboBox()
+        self.ruleSelector.setEditable(True)
+        self.ruleSelector.addItems([name.title() for name in RULES])
+        self.ruleSelector.setEditText(self.model.getRule())
+
+        #Topology of the board
+        self.topologySelector = QComboBox()
+        self.topologySelector.addItems(TOPOLOGIES)
+        self.topologySelector.setCurrentText(self.model.getTopology())
+
         #Modality 
         self.stepByStepMod = QCheckBox("Step by Step")
+        self.profilerMod = QCheckBox("Profiler")
+        self.objectsMod = QCheckBox("Objects")
 
         #Display
-        self.display = GameOfLifeBoard(self.model, self.aliveCellsLabel)
-        displayWidget = QWidget()
-        displayWidget.setLayout(self.display)
+        self.display = GameOfLifeBoard(self.model, self.aliveCellsLabel, self.worker.lock)
+
+        #Status Bar (the messages for the user, the errors are also shown in a message box)
+        self.statusBar = QStatusBar()
 
-        #Timer
+        #Timer (it renders the newest frame computed by the worker)
         self.timer = QTimer()
-        self.timer.setSingleShot(True)
-        self.timer.setInterval(1000 - self.frameRateSlider.value()*2)
+        self.setSpeed()
 
         #CREATING LAYOUT...
 
@@ -91,6 +141,11 @@ class MainWindow(QWidget):
         informationBoxLayout = QHBoxLayout()
         informationBoxLayout.addWidget(self.generationLabel)
         informationBoxLayout.addStretch()
+        informationBoxLayout.addWidget(QLabel('Rule: '))
+        informationBoxLayout.addWidget(self.ruleSelector)
+        informationBoxLayout.addWidget(QLabel('Topology: '))
+        informationBoxLayout.addWidget(self.topologySelector)
+        informationBoxLayout.addStretch()
         informationBoxLayout.addWidget(self.aliveCellsLabel)
 
         informationBox = QGroupBox('Information')
@@ -103,7 +158,10 @@ class MainWindow(QWidget):
         commandBoxLayout.addStretch(1)
         playPauseLayout = QVBoxLayout()
         playPauseLayout.addWidget(self.playPauseStepButton)
+        playPauseLayout.addWidget(self.stepBackButton)
         playPauseLayout.addWidget(self.stepByStepMod)
+        playPauseLayout.addWidget(self.profilerMod)
+        playPauseLayout.addWidget(self.objectsMod)
         commandBoxLayout.addLayout(playPauseLayout)
         commandBoxLayout.addStretch(2)
         commandBoxLayout.addWidget(self.clearButton)
@@ -114,23 +172,46 @@ class MainWindow(QWidget):
         commandBox = QGroupBox('Commands')
         commandBox.setLayout(commandBoxLayout)
 
+        #Fast Forward Box
+        fastForwardBoxLayout = QHBoxLayout()
+        fastForwardBoxLayout.addWidget(self.turboMod)
+        fastForwardBoxLayout.addWidget(QLabel('Generation: '))
+        fastForwardBoxLayout.addWidget(self.targetGenerationBox)
+        fastForwardBoxLayout.addWidget(self.runUntilButton)
+        fastForwardBoxLayout.addWidget(self.runUntilStableButton)
+        fastForwardBoxLayout.addWidget(self.progressBar)
+
+        fastForwardBox = QGroupBox('Fast Forward')
+        fastForwardBox.setLayout(fastForwardBoxLayout)
+
         #Main Layout
         mainLayout = QVBoxLayout()
         mainLayout.addWidget(informationBox)
-        mainLayout.addWidget(displayWidget)
+        mainLayout.addWidget(self.display)
         mainLayout.addWidget(commandBox)
+        mainLayout.addWidget(fastForwardBox)
+        mainLayout.addWidget(self.statusBar)
 
         self.setLayout(mainLayout)
         self.setMinimumSize(750, 600)
-        self.setMaximumSize(750, 600) 
+        self.resize(750, 600)
 
         #Connecting widgets
         self.clearButton.clicked.connect(self.clear)
+        self.display.message.connect(self.showMessage)
 
         self.stepByStepMod.stateChanged.connect(self.toggleStepByStep)
+        self.profilerMod.stateChanged.connect(self.toggleProfiler)
+        self.objectsMod.stateChanged.connect(self.toggleObjects)
+        self.turboMod.stateChanged.connect(self.toggleTurbo)
+        self.runUntilButton.clicked.connect(self.runUntilGeneration)
+        self.runUntilStableButton.clicked.connect(self.runUntilStable)
         self.playPauseStepButton.clicked.connect(self.nextStep)
-        self.timer.timeout.connect(self.nextStep)
+        self.stepBackButton.clicked.connect(self.previousStep)
+        self.timer.timeout.connect(self.renderFrame)
         self.frameRateSlider.valueChanged.connect(self.setSpeed)
+        self.ruleSelector.activated[str].connect(self.setRule)
+        self.topologySelector.activated[str].connect(self.setTopology)
         self.loadButton.clicked.connect(self.loadPattern)
         self.saveButton.clicked.connect(self.savePattern)
 
@@ -138,8 +219,7 @@ class MainWindow(QWidget):
 
     def clear(self):
         """ Method which manages the routine that clear the board """
-        if self.playPauseStepButton.getStatus() == "Play":
-            self.playPauseStepButton.updatePPSButton()
+        self.pause()
 
         currentState = self.model.getCurrentState()
         newState = self.model.clearModel()
@@ -153,6 +233,8 @@ class MainWindow(QWidget):
 
     def toggleStepByStep(self, activate):
         """ Method to enable and disable the step by step mode """
+        self.stopSimulation()
+        self.stepBackButton.setEnabled(activate == Qt.Checked and self.model.getRecording() is not None)
         if activate == Qt.Checked:
             self.playPauseStepButton.setStatus("Step by Step")
             self.playPauseStepButton.updatePPSButton()
@@ -164,39 +246,237 @@ class MainWindow(QWidget):
         """ Method to menages the loop of the game """
         if self.playPauseStepButton.getStatus() == "Step by Step":
             currentState = self.model.getCurrentState()
-            newState =  self.model.nextState()
+            self.model.nextState()
+            newState = self.model.getCurrentState()
             self.display.updateView(currentState, newState, 'nextStep')
 
-            aliveCells = self.model.getAliveCells()
-            self.aliveCellsLabel.updateInfoLabel(aliveCells)
-
-            generation = self.model.getGeneration()
-            self.generationLabel.updateInfoLabel(generation)
-
-        else: 
-            if self.playPauseStepButton.getStatus() == "Play":
-                currentState = self.model.getCurrentState()
-                newState =  self.model.nextState()
-                self.display.updateView(currentState, newState, 'nextStep')
-
+            with self.model.getProfiler().phase('labels'):
                 aliveCells = self.model.getAliveCells()
                 self.aliveCellsLabel.updateInfoLabel(aliveCells)
 
                 generation = self.model.getGeneration()
                 self.generationLabel.updateInfoLabel(generation)
+            self.endFrame(generation)
 
+        else: 
+            if self.playPauseStepButton.getStatus() == "Play":
+                self.worker.startSimulation()
                 self.timer.start()
+            else:
+                self.stopSimulation()
+
+    def previousStep(self):
+        """ Method to go back to the previous generation, in step by step mode (the states must be recorded) """
+        try:
+            currentState = self.model.getCurrentState()
+            newState = self.model.stepBack()
+        except ValueError:
+            return
+        self.display.updateView(currentState, newState, 'stepBack')
+
+        aliveCells = self.model.getAliveCells()
+        self.aliveCellsLabel.updateInfoLabel(aliveCells)
+
+        generation = self.model.getGeneration()
+        self.generationLabel.updateInfoLabel(generation)
+
+    def renderFrame(self):
+        """ Method to display the newest generation computed by the worker. Older generations are dropped """
+        # the generations computed before an edit are not displayed, the next frame draws the tiles they changed
+        frame = self.worker.takeFrame(self.display.getEditedGeneration())
+        if frame is None:
+            return
+
+        if frame.rectangles is None:
+            self.display.drawStates(frame.states)
+        else:
+            self.display.drawPatches(frame.rectangles, frame.states)
+        with self.model.getProfiler().phase('labels'):
+            self.aliveCellsLabel.updateInfoLabel(frame.aliveCells)
+            self.generationLabel.updateInfoLabel(frame.generation)
+            if self.worker.hasJob():
+                self.progressBar.setValue(min(frame.generation, self.progressBar.maximum()) if self.progressBar.maximum() > 0 else 0)
+                self.progressBar.setFormat(str(frame.generation))
+        self.endFrame(frame.generation)
+
+        # nothing changes anymore, or the job is finished: the game is paused
+        if frame.finished:
+            self.pause()
+
+    def endFrame(self, generation):
+        """ Method to close a frame of the profiler (a generation displayed) and to update its overlay, if the profiler is enabled """
+        profiler = self.model.getProfiler()
+        if not profiler.isEnabled():
+            return
+        profiler.endFrame(generation)
+
+        frameRate = profiler.getFrameRate()
+        lines = ['%.1f frames/s' % frameRate if frameRate is not None else '- frames/s']
+        lines.append('  '.join(name + ' %.2f ms' % milliseconds for name, milliseconds in sorted(profiler.summary().items())))
+        counters = profiler.getFrames()[-1]['counters']
+        lines.append('  '.join(name + ' ' + str(counters.get(name, 0)) for name in ['generations', 'births', 'deaths', 'repainted']))
+        lines.append('dropped frames ' + str(self.worker.droppedFrames))
+        self.display.setOverlay(lines)
+
+    def toggleProfiler(self, activate):
+        """ Method to enable and disable the profiler and its overlay. When it is disabled, its timings are written into profilePath """
+        profiler = self.model.getProfiler()
+        if activate == Qt.Checked:
+            profiler.setEnabled(True)
+            self.display.setOverlay(['profiling...'])
+        else:
+            profiler.setEnabled(False)
+            self.display.setOverlay([])
+            self.dumpProfile()
+
+    def toggleObjects(self, activate):
+        """ Method to show and hide the known patterns found on the board (see GameOfLifeSearch) """
+        self.display.setObjectsVisible(activate == Qt.Checked)
+
+    def dumpProfile(self, path = None):
+        """ Method to write the timings of the profiler as JSON (into profilePath by default) """
+        path = self.profilePath if path is None else path
+        try:
+            self.model.getProfiler().save(path)
+        except OSError as error:
+            self.showError('Cannot write the profile: ' + str(error))
+            return
+        self.showMessage('Profile written to ' + path)
+
+    def showMessage(self, message):
+        """ Method to show a message in the status bar, for a few seconds """
+        self.statusBar.showMessage(message, self.MESSAGE_TIMEOUT)
+
+    def showError(self, message):
+        """ Method to report an error in a message box, and in the status bar """
+        self.showMessage(message)
+        QMessageBox.warning(self, 'The Game of Life', message)
+
+    def toggleTurbo(self, activate):
+        """ Method to enable and disable the turbo mode: several generations are computed per frame, and only the last one is displayed """
+        self.worker.setTurbo(activate == Qt.Checked)
+        self.setSpeed()
+
+    def runUntilGeneration(self):
+        """ Method to run the game in the background until the chosen generation. If it precedes the current one, the game goes back to it
+        (the states must be recorded) """
+        target = self.targetGenerationBox.value()
+        self.pause()
+        if target <= self.model.getGeneration():
+            try:
+                newState = self.model.jumpTo(target)
+            except ValueError as error:
+                self.showError(str(error))
+                return
+            self.display.updateView(newState, newState, 'stepBack')
+            self.aliveCellsLabel.updateInfoLabel(self.model.getAliveCells())
+            self.generationLabel.updateInfoLabel(self.model.getGeneration())
+            return
+        self.progressBar.setRange(self.model.getGeneration(), target)
+        self.startJob(target, False)
+
+    def runUntilStable(self):
+        """ Method to run the game in the background until the state becomes periodic (still life or oscillator) """
+        self.pause()
+        # the end of the job is unknown: the progress bar is busy
+        self.progressBar.setRange(0, 0)
+        self.startJob(None, True)
+
+    def startJob(self, targetGeneration, untilStable):
+        """ Method to start a job of the worker, as if the game was played """
+        self.stepByStepMod.setChecked(False)
+        self.worker.setJob(targetGeneration, untilStable)
+        self.progressBar.setFormat(str(self.model.getGeneration()))
+        if self.playPauseStepButton.getStatus() == "Pause":
+            self.playPauseStepButton.updatePPSButton()
+        self.worker.startSimulation()
+        self.timer.start()
+
+    def stopSimulation(self):
+        """ Method to stop the worker and the timer, and to display the last generation computed """
+        if not self.worker.isRunning():
+            self.timer.stop()
+            self.endJob()
+            return
+        self.timer.stop()
+        self.worker.stopSimulation()
+        self.endJob()
+
+        self.display.drawStates(self.model.getCellStates())
+        self.aliveCellsLabel.updateInfoLabel(self.model.getAliveCells())
+        self.generationLabel.updateInfoLabel(self.model.getGeneration())
+
+    def endJob(self):
+        """ Method to forget the job of the worker, once it is stopped """
+        if not self.worker.hasJob():
+            return
+        self.worker.setJob(None, False)
+        self.progressBar.setRange(0, 1)
+        self.progressBar.setValue(0)
+        self.progressBar.setFormat(str(self.model.getGeneration()))
+
+    def pause(self):
+        """ Method to pause the game, if it is playing """
+        if self.playPauseStepButton.getStatus() == "Play":
+            self.playPauseStepButton.updatePPSButton()
+        self.stopSimulation()
 
     def setSpeed(self):
-        """ Method to change the speed of the loop game """
-        self.timer.setInterval(1000 - self.frameRateSlider.value()*2)
+        """ Method to change the speed of the loop game. The frames are rendered at most 60 times per second, 
+        and at the target frame rate of the worker in turbo mode """
+        interval = 1000 - self.frameRateSlider.value()*2
+        self.worker.setInterval(interval)
+        if self.worker.turbo:
+            self.timer.setInterval(1000 // self.worker.targetFrameRate)
+        else:
+            self.timer.setInterval(max(interval, 16))
+
+    def setRule(self, rule):
+        """ Method to change the rule of the game. If the stepping engine does not support it, the fastest engine supporting it is selected """
+        self.pause()
+        try:
+            rule = parseRule(rule)
+        except ValueError as error:
+            self.showError(str(error))
+            self.ruleSelector.setEditText(self.model.getRule())
+            return
+
+        try:
+            self.model.setRule(rule)
+        except ValueError:
+            self.model.setEngine(fastestEngine(rule, *self.model.getShape()))
+            self.model.setRule(rule)
+        self.ruleSelector.setEditText(self.model.getRule())
+
+        self.display.updateView(self.model.getCurrentState(), self.model.getCurrentState(), 'rule')
+        self.aliveCellsLabel.updateInfoLabel(self.model.getAliveCells())
+
+    def setTopology(self, topology):
+        """ Method to change the topology of the board. If the stepping engine does not support it, the fastest engine supporting the rule is selected """
+        self.pause()
+        try:
+            self.model.setTopology(topology)
+        except ValueError:
+            self.model.setEngine(fastestEngine(self.model.getRule(), *self.model.getShape()))
+            self.model.setTopology(topology)
 
     def loadPattern(self):
         """ Method to load a pattern """
-        self.load = loadWindow(self.model, self.display, self.aliveCellsLabel, self.generationLabel, self)
+        self.pause()
+        self.load = loadWindow(self.model, self.display, self.aliveCellsLabel, self.generationLabel, self, self.library)
         self.load.show()
 
     def savePattern(self):
         """ Method to save a pattern """
+        self.pause()
         self.save = saveWindow(self.model, self)
         self.save.show()
+
+    def closeEvent(self, event):
+        """ re-implementation of closeEvent to stop the worker before closing """
+        self.stopSimulation()
+        if self.model.getProfiler().isEnabled():
+            self.dumpProfile()
+        self.model.stopRecording()
+        self.library.close()
+        super().closeEvent(event)
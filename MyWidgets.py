@@ -22,11 +22,12 @@
 ## SOFTWARE.
 ##
 
-import os
-
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QIcon, QImage, QPixmap
 from PyQt5.QtWidgets import (QPushButton, QLabel, QWidget, QVBoxLayout, QHBoxLayout, 
-                            QGroupBox, QListWidget, QTextEdit, QListWidgetItem, QDialog)
+                            QGroupBox, QListWidget, QTextEdit, QListWidgetItem, QDialog, QComboBox, QLineEdit)
+
+from GameOfLifePatterns import PATTERN_EXTENSIONS
 
 ### MY WIDGETS
 
@@ -98,8 +99,9 @@ class loadWindow(QDialog):
             aliveCells  reference to the Label that shows the number of alive cells
             generation  reference to the label that shows the current generation
             mainWindow  reference to the main Window 
+            library     reference to the index of the patterns, used to list, search and preview them without reading the files
         """
-    def __init__(self, model, board, cells, generation, mainWindow):
+    def __init__(self, model, board, cells, generation, mainWindow, library):
         """ Init Mehod """
         super().__init__()
         
@@ -108,32 +110,34 @@ class loadWindow(QDialog):
         self.aliveCells = cells
         self.generation = generation
         self.mainWindow = mainWindow
+        self.library = library
 
         self.setModal(True)
 
         self.setMinimumSize(500, 500)
         self.setMaximumSize(500, 500) 
 
-        # the path needed to load the patterns
-        knownPath = 'knownPatterns/'
-        myPath = 'myPatterns/'
-        
+        # only the pattern files added or modified since the last time are read
+        self.library.update()
+
         # creating layout..
+        searchBoxLayout = QHBoxLayout()
+        self.searchInput = QLineEdit()
+        self.searchInput.setPlaceholderText('Search')
+        self.kindInput = QComboBox()
+        self.kindInput.addItems(['All', 'Still lifes', 'Oscillators', 'Spaceships', 'Unknown'])
+        searchBoxLayout.addWidget(self.searchInput)
+        searchBoxLayout.addWidget(self.kindInput)
+        searchWidget = QWidget()
+        searchWidget.setLayout(searchBoxLayout)
+
         knownPatternBox = QGroupBox('Known Patterns')
         knownPatternLayout = QVBoxLayout()
         self.knownPatternList = QListWidget()
+        self.knownPatternList.setIconSize(QSize(32, 32))
         self.loadButton1 = QPushButton('Load')
         self.loadButton1.setFixedWidth(70)
-
-        # checking if directory of known patterns exist and extracting them
-        knownDirectory = os.path.dirname(knownPath)
-        if  os.path.exists(knownDirectory):
-            files = os.listdir(knownDirectory)
-            for f in files:
-                itm = QListWidgetItem(f)
-                self.knownPatternList.addItem(itm)
-            self.loadButton1.clicked.connect(self.loadKnownPattern)
-            self.knownPatternList.setCurrentItem(self.knownPatternList.item(0))
+        self.loadButton1.clicked.connect(self.loadKnownPattern)
 
         # creating layout..
         loadBoxLayout = QHBoxLayout()
@@ -150,18 +154,10 @@ class loadWindow(QDialog):
         myPatternBox = QGroupBox('My Patterns')
         myPatternLayout = QVBoxLayout()
         self.myPatternList = QListWidget()
+        self.myPatternList.setIconSize(QSize(32, 32))
         self.loadButton2 = QPushButton('Load')
         self.loadButton2.setFixedWidth(70)
-
-        # checking if directory of own patterns exist and extracting them
-        myDirectory = os.path.dirname(myPath)
-        if  os.path.exists(myDirectory):
-            files = os.listdir(myDirectory)
-            for f in files:
-                itm = QListWidgetItem(f)
-                self.myPatternList.addItem(itm)
-            self.loadButton2.clicked.connect(self.loadMyPattern)
-            self.myPatternList.setCurrentItem(self.myPatternList.item(0))
+        self.loadButton2.clicked.connect(self.loadMyPattern)
         
         # creating layout..
 
@@ -177,41 +173,68 @@ class loadWindow(QDialog):
         myPatternBox.setLayout(myPatternLayout)
 
         theLayout = QVBoxLayout()
+        theLayout.addWidget(searchWidget)
         theLayout.addWidget(knownPatternBox)
         theLayout.addWidget(myPatternBox)
 
         self.setLayout(theLayout)
         self.setWindowTitle("Load Pattern")
+
+        self.fillLists()
+        self.searchInput.textChanged.connect(self.fillLists)
+        self.kindInput.currentIndexChanged.connect(self.fillLists)
+
+    def fillLists(self):
+        """ Method to fill the lists with the indexed patterns matching the search text and the chosen kind """
+        kind = self.kindInput.currentText()
+        for patternList, path in ((self.knownPatternList, 'knownPatterns/'), (self.myPatternList, 'myPatterns/')):
+            patternList.clear()
+            for entry in self.library.search(self.searchInput.text(), path):
+                if kind != 'All' and entry.getKind() != kind:
+                    continue
+                itm = QListWidgetItem(self.thumbnailIcon(path, entry.name), entry.name)
+                itm.setToolTip('%d x %d, %d alive cells, %s' % (entry.height, entry.width, entry.population, entry.getDescription()))
+                patternList.addItem(itm)
+            patternList.setCurrentItem(patternList.item(0))
+
+    def thumbnailIcon(self, path, name):
+        """ Method to get the icon of the thumbnail of a pattern """
+        thumbnail = self.library.getThumbnail(path, name)
+        if thumbnail is None or thumbnail.size == 0:
+            return QIcon()
+        height, width = thumbnail.shape
+        pixels = (thumbnail * 255).astype('uint8')
+        image = QImage(pixels.tobytes(), width, height, width, QImage.Format_Grayscale8).copy()
+        return QIcon(QPixmap.fromImage(image.scaled(32, 32, Qt.KeepAspectRatio)))
         
     def loadKnownPattern(self):
         """ Method to load a known pattern """
-        path = 'knownPatterns/'
-        pattern = self.knownPatternList.currentItem().text()
-        
-        currentState = self.model.getCurrentState()
-        emptyState = self.model.clearModel()
-        newState = self.model.loadModel(path, pattern)
-        
-        self.board.updateView(emptyState, currentState, 'clear')
-        self.board.updateView(newState, emptyState, 'load')
-
-        self.aliveCells.updateInfoLabel(self.model.getAliveCells())
-        self.generation.updateInfoLabel(self.model.getGeneration())
-
-        self.close()
-
+        if self.knownPatternList.currentItem() is None:
+            return
+        self.loadPattern('knownPatterns/', self.knownPatternList.currentItem().text())
 
     def loadMyPattern(self):
         """ Method to load an own pattern """
-        path = 'myPatterns/'
-        pattern = self.myPatternList.currentItem().text()
-        
+        if self.myPatternList.currentItem() is None:
+            return
+        self.loadPattern('myPatterns/', self.myPatternList.currentItem().text())
+
+    def loadPattern(self, path, pattern):
+        """ Method to load a pattern into the cleared board. If the file cannot be read, the error is reported and the dialog stays open """
         currentState = self.model.getCurrentState()
-        emptyState = self.model.clearModel()
-        newState = self.model.loadModel(path, pattern)
+        self.model.clearModel()
+        try:
+            newState = self.model.loadModel(path, pattern, applyRule = True)
+        except (ValueError, OSError) as error:
+            self.board.updateView(currentState, self.model.getCurrentState(), 'clear')
+            self.aliveCells.updateInfoLabel(self.model.getAliveCells())
+            self.generation.updateInfoLabel(self.model.getGeneration())
+            self.mainWindow.showError('Cannot load ' + pattern + ': ' + str(error))
+            return
+        self.mainWindow.ruleSelector.setEditText(self.model.getRule())
         
-        self.board.updateView(emptyState, currentState, 'clear')
-        self.board.updateView(newState, emptyState, 'load')
+        # the cleared board is never displayed, the pattern is drawn in a single frame
+        self.board.updateView(currentState, newState, 'load')
 
         self.aliveCells.updateInfoLabel(self.model.getAliveCells())
         self.generation.updateInfoLabel(self.model.getGeneration())
@@ -241,8 +264,13 @@ class saveWindow(QDialog):
         titleText = QLabel('Save as: ')
         self.titleInput = QTextEdit('My Pattern')
 
+        # the format of the pattern file
+        self.formatInput = QComboBox()
+        self.formatInput.addItems(PATTERN_EXTENSIONS)
+
         titleBoxLayout.addWidget(titleText)
         titleBoxLayout.addWidget(self.titleInput)
+        titleBoxLayout.addWidget(self.formatInput)
 
         titleWidget = QWidget()
         titleWidget.setLayout(titleBoxLayout)
@@ -270,7 +298,7 @@ class saveWindow(QDialog):
 
     def savePattern(self):
         """ Method to save on own pattern """
-        myTitle = self.titleInput.toPlainText()
+        myTitle = self.titleInput.toPlainText() + self.formatInput.currentText()
         self.model.saveModel(myTitle)
         self.close()
         
\ No newline at end of file
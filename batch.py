@@ -0,0 +1,142 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from GameOfLifeEngines import ENGINES, TOPOLOGIES
+from GameOfLifeModel import GameOfLifeModel
+from GameOfLifePatterns import PATTERN_EXTENSIONS
+
+### HEADLESS BATCH SIMULATION
+
+PATTERN_DIRECTORIES = ['knownPatterns/', 'myPatterns/']
+
+def findPattern(pattern):
+    """ Function to get the (directory, file name) of a pattern. The pattern can be a path, or the name of a file
+        (with or without extension) in the known patterns or in the own patterns """
+    if os.path.isfile(pattern):
+        directory, name = os.path.split(pattern)
+        return (directory + os.sep if directory else ''), name
+    for directory in PATTERN_DIRECTORIES:
+        for name in [pattern] + [pattern + extension for extension in PATTERN_EXTENSIONS]:
+            if os.path.isfile(directory + name):
+                return directory, name
+    raise FileNotFoundError('Pattern not found: ' + pattern)
+
+def runBatch(pattern, generations, engine = 'bitpacked', rows = 50, columns = 86, sample = 1, stopWhenPeriodic = False, history = None, resume = False,
+             rule = 'B3/S23', topology = 'dead'):
+    """ Function to run a pattern for the given number of generations without the GUI.
+        If stopWhenPeriodic is True, the run stops as soon as the state repeats (still life or oscillator).
+        If history is a path, every generation is recorded into a history store, and with resume the run restarts from the last generation recorded.
+        It returns the model and a dictionary with the population curve (sampled every 'sample' generations), the cycle detected and the timing statistics """
+    directory, name = findPattern(pattern)
+
+    start = time.perf_counter()
+    model = GameOfLifeModel(rows, columns, engine, rule = rule, topology = topology)
+    model.loadModel(directory, name)
+    if history is not None:
+        model.startRecording(history, resume = resume)
+    firstGeneration = model.getGeneration()
+    loadTime = time.perf_counter() - start
+
+    population = [int(model.getAliveCells())]
+    start = time.perf_counter()
+    while model.getGeneration() < generations:
+        model.advance(min(sample, generations - model.getGeneration()))
+        population.append(int(model.getAliveCells()))
+        if stopWhenPeriodic and model.isPeriodic():
+            break
+    runTime = time.perf_counter() - start
+    model.stopRecording()
+
+    results = {
+        'pattern': directory + name,
+        'engine': engine,
+        'rule': model.getRule(),
+        'topology': topology,
+        'rows': rows,
+        'columns': columns,
+        'generations': model.getGeneration(),
+        'firstGeneration': firstGeneration,
+        'sample': sample,
+        'finalPopulation': population[-1],
+        'cycle': model.getCycle(),
+        'loadSeconds': loadTime,
+        'runSeconds': runTime,
+        'generationsPerSecond': (model.getGeneration() - firstGeneration) / runTime if runTime > 0 else None,
+        'population': population,
+    }
+    return model, results
+
+def saveResults(model, results, output):
+    """ Function to write the final state (.npy), the population curve (.csv) and the timing statistics (.json) into the output directory """
+    if not os.path.exists(output):
+        os.makedirs(output)
+    title = os.path.splitext(os.path.basename(results['pattern']))[0]
+    path = os.path.join(output, title)
+
+    np.save(path + '_final.npy', model.getCurrentState())
+
+    with open(path + '_population.csv', 'w') as f:
+        f.write('generation,aliveCells\n')
+        for k, alive in enumerate(results['population']):
+            f.write(str(min(results['firstGeneration'] + k * results['sample'], results['generations'])) + ',' + str(alive) + '\n')
+
+    stats = {key: value for key, value in results.items() if key != 'population'}
+    with open(path + '_stats.json', 'w') as f:
+        json.dump(stats, f, indent = 2)
+
+def main(argv = None):
+    """ Entry point of the headless simulation """
+    parser = argparse.ArgumentParser(description = 'Run a pattern of the Game of Life without the GUI.')
+    parser.add_argument('pattern', help = 'path or name of the pattern (searched in knownPatterns/ and myPatterns/)')
+    parser.add_argument('-n', '--generations', type = int, default = 100, help = 'number of generations to run')
+    parser.add_argument('-e', '--engine', default = 'bitpacked', choices = sorted(ENGINES), help = 'stepping engine')
+    parser.add_argument('-r', '--rule', default = 'B3/S23', help = 'rule of the game, a rule string (B36/S23, B2/S/C3, R5,C2,M1,S34..58,B34..45,NM) or a name (HighLife, Seeds, ...)')
+    parser.add_argument('-t', '--topology', default = 'dead', choices = TOPOLOGIES, help = 'topology of the board')
+    parser.add_argument('--rows', type = int, default = 50, help = 'number of rows of the board')
+    parser.add_argument('--columns', type = int, default = 86, help = 'number of columns of the board')
+    parser.add_argument('--sample', type = int, default = 1, help = 'record the population every SAMPLE generations')
+    parser.add_argument('--stop-when-periodic', action = 'store_true', help = 'stop as soon as the state repeats (still life or oscillator)')
+    parser.add_argument('--history', help = 'record every generation into the history store in the given path')
+    parser.add_argument('--resume', action = 'store_true', help = 'resume the run from the last generation recorded in the history store')
+    parser.add_argument('-o', '--output', default = 'batchResults/', help = 'directory where the results are written')
+    args = parser.parse_args(argv)
+
+    model, results = runBatch(args.pattern, args.generations, args.engine, args.rows, args.columns, args.sample, args.stop_when_periodic,
+                              args.history, args.resume, args.rule, args.topology)
+    saveResults(model, results, args.output)
+
+    print(results['pattern'] + ': ' + str(results['generations']) + ' generations in ' + '%.3f' % results['runSeconds'] +
+          ' s, ' + str(results['finalPopulation']) + ' alive cells')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
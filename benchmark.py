@@ -0,0 +1,333 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from GameOfLifeEngines import ENGINES
+from GameOfLifeModel import GameOfLifeModel
+from GameOfLifePatterns import parseSize
+
+### BENCHMARK OF THE ENGINES AND OF THE BOARD
+
+DEFAULT_SIZES = ['50x86', '256x256', '1024x1024', '4096x4096']
+# the sizes added by --large: they need a few GB of memory, and minutes on the slower engines
+LARGE_SIZES = ['16384x16384']
+# the number of cells of the blocks of rows in which the soups are generated and loaded, so that the large ones
+# do not need gigabytes of random numbers and of coordinates
+BLOCK_CELLS = 1 << 20
+DEFAULT_PATTERN_SIZES = ['50x86', '1024x1024']
+
+# the application of Qt, created by the first measure of the board
+application = None
+
+def randomSoup(rows, columns, density = 0.5, seed = 0):
+    """ Function to get a random soup: a board whose cells are alive with the given probability. It is generated by blocks of rows """
+    generator = np.random.default_rng(seed)
+    soup = np.empty((rows, columns), dtype = bool)
+    block = max(1, BLOCK_CELLS // columns)
+    for first in range(0, rows, block):
+        soup[first:first+block] = generator.random((min(block, rows - first), columns)) < density
+    return soup
+
+def loadSoup(model, soup):
+    """ Function to load a random soup into a model, by blocks of rows """
+    model.clearModel()
+    block = max(1, BLOCK_CELLS // soup.shape[1])
+    for first in range(0, soup.shape[0], block):
+        i, j = np.nonzero(soup[first:first+block])
+        model.setCells((i + first, j), 1)
+
+def loadFile(model, path):
+    """ Function to load the pattern in the given path into a model """
+    directory, name = os.path.split(path)
+    model.loadModel(directory + os.sep, name)
+
+def benchmarkEngine(engine, rows, columns, load, seconds = 1.0, maxGenerations = 1000, memoryGenerations = 2):
+    """ Function to measure a stepping engine on a board of the given size, loaded by the function load(model).
+        The cycle detection is disabled, so that every generation is computed by the engine.
+        The generations are timed for 'seconds' seconds (at least one generation, at most maxGenerations), after a tenth of that time 
+        that is not timed (the first generation builds the state of the engine). Then a few generations are traced by tracemalloc, without timing them:
+        'stepPeakBytes' is the largest memory allocated during every traced generation and 'peakBytes' its maximum, 'stepBlocks' the number of
+        memory blocks allocated by every traced generation and still held after it (buffers and caches of the engine, or leaks),
+        'retainedBytes' and 'retainedBlocks' are the memory and the number of Python memory blocks still allocated after all of them,
+        'stateBytes' the memory of the state of the model between two generations (the packed board, if the model steps it without unpacking it,
+        the dense cells otherwise) """
+    model = GameOfLifeModel(rows, columns, engine, historySize = 0)
+    load(model)
+    start = time.perf_counter()
+    model.nextState()
+    while time.perf_counter() - start < seconds / 10:
+        model.nextState()
+
+    generations = 0
+    start = time.perf_counter()
+    elapsed = 0
+    while generations < maxGenerations and (generations == 0 or elapsed < seconds):
+        model.nextState()
+        generations = generations + 1
+        elapsed = time.perf_counter() - start
+
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    # the blocks of the snapshots themselves are not counted
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    # the pattern of the filter is compiled (and cached) by its first use, not during a traced generation
+    tracemalloc.take_snapshot().filter_traces(ignored)
+    base = tracemalloc.get_traced_memory()[0]
+    stepPeaks, stepBlocks = [], []
+    for _ in range(memoryGenerations):
+        snapshot = tracemalloc.take_snapshot().filter_traces(ignored)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        model.nextState()
+        stepPeaks.append(int(tracemalloc.get_traced_memory()[1] - before))
+        differences = tracemalloc.take_snapshot().filter_traces(ignored).compare_to(snapshot, 'lineno')
+        stepBlocks.append(sum(max(difference.count_diff, 0) for difference in differences))
+        del snapshot, differences
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    if model.packedSteps():
+        state = model.engine.words.nbytes
+    else:
+        state = model.cells.nbytes
+
+    return {
+        'engine': engine,
+        'rows': rows,
+        'columns': columns,
+        'generations': generations,
+        'seconds': elapsed,
+        'generationsPerSecond': generations / elapsed,
+        'cellsPerSecond': generations * rows * columns / elapsed,
+        'finalPopulation': int(model.getAliveCells()),
+        'peakBytes': max(stepPeaks, default = 0),
+        'stepPeakBytes': stepPeaks,
+        'stepBlocks': stepBlocks,
+        'retainedBytes': int(retained),
+        'retainedBlocks': sys.getallocatedblocks() - blocks,
+        'stateBytes': int(state),
+    }
+
+def frameStatistics(times):
+    """ Function to get the median, the 95th percentile and the maximum (in milliseconds) of the given times (in seconds) """
+    times = np.array(times) * 1000
+    return {'median': float(np.median(times)), 'p95': float(np.percentile(times, 95)), 'max': float(times.max())}
+
+def benchmarkBoard(engine, rows, columns, load, frames = 50):
+    """ Function to measure the frames of GameOfLifeBoard on a board of the given size, loaded by the function load(model).
+        The board is drawn on the offscreen platform of Qt (unless another platform is chosen by QT_QPA_PLATFORM).
+        For every frame the model computes the next generation, then 'updateView' is the time of GameOfLifeBoard.updateView 
+        (the copy of the states into the image) and 'paint' the time to repaint the widget """
+    global application
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from GameOfLifeBoard import GameOfLifeBoard
+
+    if application is None:
+        application = QApplication.instance() or QApplication([])
+    model = GameOfLifeModel(rows, columns, engine, historySize = 0)
+    load(model)
+    board = GameOfLifeBoard(model, None)
+    hint = board.sizeHint()
+    board.resize(min(hint.width(), 1280), min(hint.height(), 800))
+    board.show()
+    application.processEvents()
+
+    updateTimes, paintTimes = [], []
+    for _ in range(frames):
+        model.nextState()
+        start = time.perf_counter()
+        board.updateView(None, None, 'nextStep')
+        updated = time.perf_counter()
+        board.repaint()
+        updateTimes.append(updated - start)
+        paintTimes.append(time.perf_counter() - updated)
+    board.close()
+    application.processEvents()
+
+    return {
+        'engine': engine,
+        'rows': rows,
+        'columns': columns,
+        'frames': frames,
+        'width': board.width(),
+        'height': board.height(),
+        'updateViewMs': frameStatistics(updateTimes),
+        'paintMs': frameStatistics(paintTimes),
+    }
+
+def runBenchmark(engines = None, sizes = DEFAULT_SIZES, patternSizes = DEFAULT_PATTERN_SIZES, patterns = 'knownPatterns/*.npy', 
+                 seconds = 1.0, maxGenerations = 1000, density = 0.5, seed = 0, board = True, boardEngine = 'bitpacked', frames = 50, log = None):
+    """ Function to run the whole benchmark: every engine on every pattern of the corpus (at every size of patternSizes) 
+        and on a random soup of every size of sizes, then the board on a random soup of every size.
+        It returns a dictionary with the description of the machine and the results of every case """
+    engines = sorted(ENGINES) if engines is None else engines
+    cases = []
+    for size in patternSizes:
+        rows, columns = parseSize(size)
+        for path in sorted(glob.glob(patterns)):
+            for engine in engines:
+                case = {'kind': 'pattern', 'name': os.path.splitext(os.path.basename(path))[0]}
+                case.update(benchmarkEngine(engine, rows, columns, lambda model: loadFile(model, path), seconds, maxGenerations))
+                cases.append(case)
+                if log is not None:
+                    log(case)
+    for size in sizes:
+        rows, columns = parseSize(size)
+        soup = randomSoup(rows, columns, density, seed)
+        for engine in engines:
+            case = {'kind': 'soup', 'name': 'soup ' + size}
+            case.update(benchmarkEngine(engine, rows, columns, lambda model: loadSoup(model, soup), seconds, maxGenerations))
+            cases.append(case)
+            if log is not None:
+                log(case)
+
+    boards = []
+    if board:
+        try:
+            import PyQt5
+        except ImportError:
+            board = False
+    if board:
+        for size in sizes:
+            rows, columns = parseSize(size)
+            soup = randomSoup(rows, columns, density, seed)
+            result = benchmarkBoard(boardEngine, rows, columns, lambda model: loadSoup(model, soup), frames)
+            boards.append(result)
+            if log is not None:
+                log(result)
+
+    return {
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'cpus': os.cpu_count(),
+        },
+        'seconds': seconds,
+        'density': density,
+        'seed': seed,
+        'cases': cases,
+        'boards': boards,
+    }
+
+def caseKey(case):
+    """ Function to get the key identifying a case, to compare it with the same case of another run """
+    return (case.get('kind', 'board'), case.get('name', ''), case['engine'], case['rows'], case['columns'])
+
+def compareResults(results, baseline, tolerance = 0.2):
+    """ Function to compare the results with the ones of a baseline. It returns the list of the regressions, as strings: 
+        the cases whose generations per second, or whose board frames, are slower than the baseline by more than the tolerance 
+        (a fraction), and the cases whose peak memory is larger by more than the tolerance. Cases missing from the baseline are ignored """
+    regressions = []
+    previous = {caseKey(case): case for case in baseline.get('cases', []) + baseline.get('boards', [])}
+    for case in results['cases']:
+        old = previous.get(caseKey(case))
+        if old is None:
+            continue
+        name = case['name'] + ' ' + case['engine'] + ' ' + str(case['rows']) + 'x' + str(case['columns'])
+        if case['generationsPerSecond'] < old['generationsPerSecond'] * (1 - tolerance):
+            regressions.append(name + ': ' + '%.1f' % case['generationsPerSecond'] + ' generations/s (baseline ' + 
+                               '%.1f' % old['generationsPerSecond'] + ')')
+        # a few KiB of slack, so that tiny allocations do not count
+        if case['peakBytes'] > old['peakBytes'] * (1 + tolerance) + 4096:
+            regressions.append(name + ': ' + str(case['peakBytes']) + ' peak bytes (baseline ' + str(old['peakBytes']) + ')')
+    for case in results['boards']:
+        old = previous.get(caseKey(case))
+        if old is None:
+            continue
+        name = 'board ' + case['engine'] + ' ' + str(case['rows']) + 'x' + str(case['columns'])
+        for frame in ['updateViewMs', 'paintMs']:
+            if case[frame]['median'] > old[frame]['median'] * (1 + tolerance):
+                regressions.append(name + ': ' + frame + ' ' + '%.3f' % case[frame]['median'] + ' (baseline ' + '%.3f' % old[frame]['median'] + ')')
+    return regressions
+
+def printCase(case):
+    """ Function to print the result of a case """
+    size = str(case['rows']) + 'x' + str(case['columns'])
+    if 'kind' in case:
+        print('%-28s %-12s %-11s %10.1f gen/s %12.3g cells/s %10d peak bytes %6d blocks/step %10d state bytes' % 
+              (case['name'], case['engine'], size, case['generationsPerSecond'], case['cellsPerSecond'], case['peakBytes'],
+               max(case['stepBlocks'], default = 0), case.get('stateBytes', 0)))
+    else:
+        print('%-28s %-12s %-11s %10.3f ms updateView %10.3f ms paint' % 
+              ('board', case['engine'], size, case['updateViewMs']['median'], case['paintMs']['median']))
+
+def main(argv = None):
+    """ Entry point of the benchmark """
+    parser = argparse.ArgumentParser(description = 'Measure the stepping engines and the board of the Game of Life.')
+    parser.add_argument('-e', '--engines', nargs = '+', choices = sorted(ENGINES), help = 'engines to measure (all of them by default)')
+    parser.add_argument('--sizes', nargs = '+', default = DEFAULT_SIZES, help = 'sizes (ROWSxCOLUMNS) of the random soups and of the board')
+    parser.add_argument('--large', action = 'store_true', help = 'measure the soups and the board at the large sizes too (' + ' '.join(LARGE_SIZES) + ')')
+    parser.add_argument('--pattern-sizes', nargs = '*', default = DEFAULT_PATTERN_SIZES, help = 'sizes of the boards where the patterns are run')
+    parser.add_argument('--patterns', default = 'knownPatterns/*.npy', help = 'glob of the patterns to run')
+    parser.add_argument('--seconds', type = float, default = 1.0, help = 'time spent on every case')
+    parser.add_argument('--max-generations', type = int, default = 1000, help = 'maximum number of generations of every case')
+    parser.add_argument('--density', type = float, default = 0.5, help = 'density of the random soups')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the random soups')
+    parser.add_argument('--no-board', action = 'store_true', help = 'do not measure the board (it requires PyQt5)')
+    parser.add_argument('--board-engine', default = 'bitpacked', choices = sorted(ENGINES), help = 'engine used to measure the board')
+    parser.add_argument('--frames', type = int, default = 50, help = 'number of frames drawn on every board')
+    parser.add_argument('-o', '--output', default = 'benchmarkResults/benchmark.json', help = 'path of the JSON results')
+    parser.add_argument('-b', '--baseline', help = 'path of the JSON results of a previous run, to compare with')
+    parser.add_argument('--tolerance', type = float, default = 0.2, help = 'slowdown (fraction) reported as a regression')
+    parser.add_argument('--update-baseline', action = 'store_true', help = 'write the results to the baseline path as well')
+    args = parser.parse_args(argv)
+    sizes = args.sizes + [size for size in LARGE_SIZES if args.large and size not in args.sizes]
+
+    results = runBenchmark(args.engines, sizes, args.pattern_sizes, args.patterns, args.seconds, args.max_generations, 
+                           args.density, args.seed, not args.no_board, args.board_engine, args.frames, printCase)
+
+    directory = os.path.dirname(args.output)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent = 2)
+
+    status = 0
+    if args.baseline is not None and os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as f:
+            regressions = compareResults(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            status = 1
+        else:
+            print('No regressions against ' + args.baseline)
+    if args.baseline is not None and args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent = 2)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
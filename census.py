@@ -0,0 +1,88 @@
+##
+## MIT License
+## 
+## Copyright (c) 2017 Riccardo Reali 
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+##
+
+import argparse
+import sys
+
+from GameOfLifeCensus import CensusStore, runCensus
+from GameOfLifeEngines import TOPOLOGIES
+from GameOfLifePatterns import parseSize
+
+### CENSUS OF RANDOM SOUPS
+
+def printCensus(store, top = 20):
+    """ Function to print the most common objects of a census, and the soups that ran longest """
+    soups = store.getSoupCount()
+    print(str(soups) + ' soups, ' + '%.1f' % store.getSeconds() + ' s of computation')
+    for entry in store.getCensus()[:top]:
+        print('%12d  %-40s first in soup %d' % (entry.count, entry.name, entry.soup))
+    print('Longest soups (soup, generations, period, population, objects):')
+    for outcome in store.getSoups(5):
+        print('    ' + str(outcome))
+
+def main(argv = None):
+    """ Entry point of the census """
+    parser = argparse.ArgumentParser(description = 'Run random soups of the Game of Life until they stabilize, and count the objects they leave.')
+    parser.add_argument('-n', '--soups', type = int, default = 1000, help = 'number of soups of the census (a census is resumed, or extended, up to this number)')
+    parser.add_argument('-o', '--store', default = 'censusResults/census.sqlite', help = 'path of the results store')
+    parser.add_argument('-w', '--workers', type = int, help = 'number of processes (by default, one per core)')
+    parser.add_argument('--top', type = int, default = 20, help = 'number of objects printed')
+    # the settings of the census: when a census is resumed, the settings not given are the ones it has been run with
+    parser.add_argument('-r', '--rule', help = 'rule of the game, with 2 states on the 8 nearest neighbours (B3/S23 by default)')
+    parser.add_argument('-t', '--topology', choices = ['open'] + TOPOLOGIES,
+                        help = 'topology of the boards (open by default: the spaceships escaping from a board are removed and counted)')
+    parser.add_argument('--board-size', type = parseSize, help = 'size of the boards, ROWSxCOLUMNS (128x128 by default)')
+    parser.add_argument('--soup-size', type = parseSize, help = 'size of the soups, placed in the center of the boards (16x16 by default)')
+    parser.add_argument('--density', type = float, help = 'probability of a cell of a soup to be alive (0.5 by default)')
+    parser.add_argument('--seed', type = int, help = 'seed of the soups (0 by default)')
+    parser.add_argument('--max-generations', type = int, help = 'number of generations after which a soup that is not periodic is given up (10000 by default)')
+    parser.add_argument('--max-period', type = int, help = 'maximum period detected (256 by default)')
+    parser.add_argument('--batch-size', type = int, help = 'number of soups of a batch, run together and recorded at once (256 by default)')
+    args = parser.parse_args(argv)
+
+    given = {'rule': args.rule, 'topology': args.topology, 'density': args.density, 'seed': args.seed, 'maxGenerations': args.max_generations,
+             'maxPeriod': args.max_period, 'batchSize': args.batch_size}
+    if args.board_size is not None:
+        given['rows'], given['columns'] = args.board_size
+    if args.soup_size is not None:
+        given['soupRows'], given['soupColumns'] = args.soup_size
+    store = CensusStore(args.store)
+    settings = dict(store.getSettings() or {}, **{name: value for name, value in given.items() if value is not None})
+    store.close()
+
+    def progress(soups, computed, seconds):
+        print('\r' + str(soups) + ' soups, ' + '%.1f' % (computed / seconds if seconds > 0 else 0) + ' soups/s', end = '', flush = True)
+
+    try:
+        store = runCensus(args.store, args.soups, settings, args.workers, progress)
+    except ValueError as error:
+        print(error, file = sys.stderr)
+        return 1
+    print()
+    printCensus(store, args.top)
+    store.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,7 +22,9 @@
 ## SOFTWARE.
 ##
 
+import os
 import sys
+import tempfile
 
 from PyQt5.QtWidgets import QApplication 
 
@@ -41,7 +43,14 @@ if __name__ == '__main__':
 	#The Model
     model = GameOfLifeModel() 
 
+    #Recording the states, so that the game can step back, into a private temporary directory deleted on exit
+    historyDirectory = tempfile.TemporaryDirectory(prefix = 'gameOfLife')
+    model.startRecording(os.path.join(historyDirectory.name, 'history.golh'))
+
     #The View and Controller
     window = MainWindow(model) 
     window.setStyleSheet(style)
-    sys.exit(app.exec_())
+    status = app.exec_()
+    model.stopRecording()
+    historyDirectory.cleanup()
+    sys.exit(status)
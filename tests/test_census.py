@@ -0,0 +1,27 @@
+import numpy as np
+
+from GameOfLifeCensus import censusBatch, censusSettings, stabilize
+from GameOfLifePatterns import readPlaintext
+
+GLIDER = readPlaintext('.O.\n..O\nOOO')
+
+def test_escaping_glider_is_removed_from_open_boards():
+	""" on the open topology a glider leaves the board instead of crashing into its edge """
+	boards = np.zeros((1, 32, 32), dtype = np.uint8)
+	boards[0, 5:8, 5:8] = GLIDER
+	boards[0, 5:7, 25:27] = 1
+	final, generations, periods, escaped = stabilize(boards)
+	assert periods[0] == 1
+	assert final[0].sum() == 4
+	assert [component.sum() for component in escaped[0]] == [5]
+
+	final, generations, periods, escaped = stabilize(boards, topology = 'dead')
+	assert final[0].sum() > 4
+	assert escaped[0] == []
+
+def test_census_counts_escaped_gliders():
+	""" the gliders escaped from the soups are counted, and no edge debris is """
+	outcomes, objects = censusBatch(censusSettings(), 0, 32)
+	names = {entry.name: entry.count for entry in objects.values()}
+	assert names.get('glider', 0) > 0
+	assert all(not name.startswith('unknown') for name in names)
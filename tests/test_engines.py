@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from GameOfLifeEngines import ConvolutionEngine, createEngine
+from GameOfLifeModel import GameOfLifeModel
+from GameOfLifeRules import parseRule
+
+def countSquares(padded, r, rows, columns):
+	""" the number of alive cells in the square of radius r around every cell of a board padded with its halo """
+	return sum(padded[r+dr:r+dr+rows, r+dc:r+dc+columns].astype(int) for dr in range(-r, r + 1) for dc in range(-r, r + 1))
+
+@pytest.mark.parametrize('shape', [(3, 4), (2, 9), (12, 5)])
+@pytest.mark.parametrize('topology', ['torus', 'klein', 'reflect'])
+def test_radius_larger_than_the_board(topology, shape):
+	""" the neighbourhoods of Larger than Life wider than the board wrap around it as many times as needed """
+	r = 5
+	rows, columns = shape
+	alive = np.random.default_rng(rows * columns).random(shape) < 0.5
+	engine = ConvolutionEngine()
+	engine.setRule(parseRule('R5,C2,M1,S34..58,B34..45,NM'))
+	engine.setTopology(topology)
+	if topology == 'klein':
+		# the rows wrap with the columns reversed every time
+		rowIndices = np.arange(-r, rows + r)
+		padded = np.array([np.take(alive[i % rows] if (i // rows) % 2 == 0 else alive[i % rows, ::-1], np.arange(-r, columns + r), mode = 'wrap')
+		                   for i in rowIndices])
+	else:
+		padded = np.pad(alive, r, mode = 'wrap' if topology == 'torus' else 'symmetric')
+	assert (engine.neighbours(alive) == countSquares(padded, r, rows, columns)).all()
+
+@pytest.mark.parametrize('topology', ['dead', 'torus', 'klein'])
+def test_packed_steps(topology):
+	""" the model stepping the packed board only unpacks the same cells and states as the model stepping the dense cells, edits included """
+	models = [GameOfLifeModel(40, 70, engine, topology = topology) for engine in ('bitpacked', 'convolution')]
+	alive = np.nonzero(np.random.default_rng(1).random((40, 70)) < 0.35)
+	for model in models:
+		model.setCells(alive, 1)
+		model.advance(20)
+		model.setCellActive(3, 3)
+		model.advance(200, untilPeriodic = True)
+	packed, dense = models
+	assert packed.getGeneration() == dense.getGeneration() and packed.getCycle() == dense.getCycle()
+	assert (packed.getCurrentState() == dense.getCurrentState()).all()
+	assert (packed.getCellStates() == dense.getCellStates()).all()
+	assert packed.getAliveCells() == dense.getAliveCells()
+
+@pytest.mark.parametrize('engine', ['convolution', 'bitpacked', 'tiled', 'hashlife'])
+def test_updated_tiles(engine):
+	""" the tiles updated by the generations computed cover all the states that changed, with every engine """
+	model = GameOfLifeModel(100, 130, engine)
+	model.setCells(np.nonzero(np.pad(np.random.default_rng(3).random((20, 20)) < 0.4, ((40, 40), (70, 40)))), 1)
+	for n in (1, 1, 7, 30):
+		previous = model.getCellStates().copy()
+		model.advance(n)
+		tileSize, tiles = model.getUpdatedTiles()
+		covered = np.repeat(np.repeat(tiles, tileSize, axis = 0), tileSize, axis = 1)[:100, :130]
+		assert not (model.getCellStates() != previous)[~covered].any()
+		assert not covered.all()
+
+@pytest.mark.parametrize('rule', ['B3/S23', 'B2/S/C3'])
+@pytest.mark.parametrize('topology', ['dead', 'torus', 'klein', 'reflect'])
+def test_tiled_matches_full_steps(topology, rule):
+	""" the tiled engine, which recomputes only the active tiles, steps to the same cells as the convolution engine, which recomputes them all """
+	rule = parseRule(rule)
+	tiled, full = (createEngine(name, rule, topology) for name in ('tiled', 'convolution'))
+	cells = np.zeros((90, 100), dtype = rule.dtype)
+	cells[35:55, 40:60] = np.random.default_rng(5).random((20, 20)) < 0.4
+	# a block far from the soup and from the edges, its tile stays inactive until the soup reaches it
+	cells[70:72, 10:12] = 1
+	expected = cells
+	for generation in range(60):
+		cells = tiled.step(cells)
+		expected = full.step(expected)
+		assert (cells == expected).all(), generation
+		if generation == 3 and rule.states == 2:
+			# the tile of the block (a still life in the Game of Life only)
+			assert not tiled.active[4, 0]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from GameOfLifeEnsemble import GameOfLifeEnsemble, boardHashes
+
+def test_remove_stable_removes_oscillators():
+	""" the still lifes and the oscillators are removed, the boards still changing are kept """
+	boards = np.zeros((3, 16, 16), dtype = np.uint8)
+	boards[0, 5:7, 5:7] = 1
+	boards[1, 8, 7:10] = 1
+	boards[2, 1:4, 1:4] = [[0, 1, 0], [0, 0, 1], [1, 1, 1]]
+	ensemble = GameOfLifeEnsemble(boards, topology = 'torus')
+	ensemble.nextState()
+	assert list(ensemble.removeStable()) == [0]
+	ensemble.nextState()
+	assert list(ensemble.getPeriods()) == [2, 0]
+	assert list(ensemble.removeStable()) == [1]
+	ensemble.advance(10)
+	assert list(ensemble.getIds()) == [2]
+
+def test_large_boards_are_hashed():
+	""" boards of more than 65536 words get distinct hashes for distinct states """
+	words = np.zeros((2, 2048, 64), dtype = np.uint64)
+	words[1, -1, -1] = 1
+	first, second = boardHashes(words)
+	assert first != second
+
+def test_periods_after_the_history_wraps():
+	""" the periods are the smallest ones, also once the last maxPeriod states are overwritten """
+	boards = np.zeros((2, 16, 16), dtype = np.uint8)
+	boards[0, 5:7, 5:7] = 1
+	boards[1, 8, 7:10] = 1
+	ensemble = GameOfLifeEnsemble(boards, topology = 'torus', maxPeriod = 16)
+	for generation in range(1, 101):
+		ensemble.nextState()
+		if generation >= 2:
+			assert list(ensemble.getPeriods()) == [1, 2], generation
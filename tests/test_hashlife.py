@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from GameOfLifeModel import GameOfLifeModel
+
+def soupModel(engine, seed = 4):
+	""" a model of 64x64 cells, with a random soup of 24x24 cells in its center (the cells leaving the board die with the dead topology) """
+	model = GameOfLifeModel(64, 64, engine, historySize = 0)
+	soup = np.random.default_rng(seed).random((24, 24)) < 0.4
+	model.setCells(np.nonzero(np.pad(soup, 20)), 1)
+	return model
+
+@pytest.mark.parametrize('generation', [1, 7, 64, 100])
+def test_jump_matches_convolution(generation):
+	""" hashlife jumps to the same state as the convolution engine steps to, as long as nothing leaves the window """
+	hashlife = GameOfLifeModel(128, 128, 'hashlife', historySize = 0)
+	convolution = GameOfLifeModel(128, 128, 'convolution', historySize = 0)
+	rpentomino = (np.array([60, 60, 61, 61, 62]), np.array([61, 62, 60, 61, 61]))
+	for model in (hashlife, convolution):
+		model.setCells(rpentomino, 1)
+	hashlife.jumpTo(generation)
+	convolution.advance(generation)
+	assert (hashlife.getCurrentState() == convolution.getCurrentState()).all()
+
+def test_bounded_cache():
+	""" the table of the nodes stays within its limit during a long jump, and the results memoized before an eviction are still right """
+	model = soupModel('hashlife')
+	engine = model.engine
+	engine.setCacheLimit(2000)
+	largest = 0
+	collect = engine.collect
+	def tracedCollect(force = False):
+		nonlocal largest
+		largest = max(largest, len(engine.table))
+		collect(force)
+	engine.collect = tracedCollect
+	model.jumpTo(1000)
+	# the table is checked before every new successor is computed: it exceeds the limit by the few nodes joined between two checks
+	assert engine.collectAt == 2000
+	assert largest <= 2000 + 16
+	assert engine.getCacheSize() <= 2000 and engine.getResultsCount() > 0
+	unbounded = soupModel('hashlife')
+	unbounded.jumpTo(1000)
+	assert (model.getCurrentState() == unbounded.getCurrentState()).all()
+	model.jumpTo(1500)
+	unbounded.jumpTo(1500)
+	assert (model.getCurrentState() == unbounded.getCurrentState()).all()
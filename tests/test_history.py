@@ -0,0 +1,41 @@
+import numpy as np
+
+from GameOfLifeHistory import HistoryStore
+from GameOfLifeModel import GameOfLifeModel
+
+def test_generations_round_trip(tmp_path):
+	""" the dying states of a Generations rule are recorded and restored exactly """
+	model = GameOfLifeModel(40, 60, rule = "Brian's Brain")
+	model.setCells(np.nonzero(np.random.default_rng(2).random((40, 60)) < 0.3), 1)
+	model.startRecording(str(tmp_path / 'history'), keyframeInterval = 8)
+	recorded = {}
+	for _ in range(30):
+		recorded[model.getGeneration()] = model.getCurrentState().copy()
+		model.nextState()
+	assert any((cells > 1).any() for cells in recorded.values())
+	for generation in (5, 20, 3, 29, 0):
+		assert np.array_equal(model.seek(generation), recorded[generation])
+
+def test_store_planes(tmp_path):
+	""" a store keeps enough bit planes for the states of the cells """
+	path = str(tmp_path / 'history')
+	store = HistoryStore(path, 4, 5, states = 3)
+	cells = np.arange(20, dtype = np.uint8).reshape(4, 5) % 3
+	store.append(0, cells, int((cells == 1).sum()))
+	assert store.getStates() == 4
+	assert np.array_equal(store.readCells(0)[1], cells)
+	store.close()
+
+def test_rule_with_more_states_restarts_recording(tmp_path):
+	""" a rule with more states than the store can record starts the recording again """
+	model = GameOfLifeModel(30, 30)
+	model.startRecording(str(tmp_path / 'history'))
+	model.setCells(np.nonzero(np.ones((3, 3))), 1)
+	model.nextState()
+	model.setRule("Brian's Brain")
+	assert model.getRecording().getStates() >= 3
+	for _ in range(4):
+		model.nextState()
+	cells = model.getCurrentState().copy()
+	model.nextState()
+	assert np.array_equal(model.stepBack(), cells)
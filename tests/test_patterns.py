@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from GameOfLifeModel import GameOfLifeModel
+from GameOfLifePatterns import loadPattern, patternRule, readRLE, savePattern, writeRLE
+
+def test_generations_pattern_keeps_alive_cells_and_rule(tmp_path):
+	""" a Generations board is saved with its alive cells only, and the RLE format keeps its rule """
+	model = GameOfLifeModel(30, 30, rule = "Brian's Brain")
+	model.setCells(np.nonzero(np.random.default_rng(0).random((30, 30)) < 0.3), 1)
+	for _ in range(3):
+		model.nextState()
+	cells = model.getCurrentState()
+	assert (cells > 1).any()
+	for extension in ('.rle', '.npy', '.cells', '.lpk'):
+		path = savePattern(str(tmp_path / ('pattern' + extension)), cells, model.getRule())
+		pattern, _ = loadPattern(path)
+		assert pattern.sum() == (cells == 1).sum()
+	assert patternRule(str(tmp_path / 'pattern.rle')) == 'B2/S/C3'
+
+	loaded = GameOfLifeModel(30, 30)
+	loaded.loadModel(str(tmp_path) + '/', 'pattern.rle', applyRule = True)
+	assert loaded.getRule() == 'B2/S/C3'
+
+def test_larger_than_life_rule_header():
+	""" the commas of a Larger than Life rule do not break the RLE header """
+	text = writeRLE(np.ones((2, 3)), 'block', 'R5,C2,M1,S34..58,B34..45,NM')
+	assert readRLE(text).shape == (2, 3)
+
+def test_multistate_rle_tags():
+	""" in a multi-state pattern only the state A is alive, the dying states are dead, and an unknown tag is rejected """
+	pattern = readRLE('x = 5, y = 2, rule = B2/S/C3\n.AB2A$pA3.A!')
+	assert pattern.tolist() == [[False, True, False, True, True], [False, False, False, False, True]]
+	with pytest.raises(ValueError):
+		readRLE('x = 3, y = 1\nb2z!')
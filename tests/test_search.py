@@ -0,0 +1,35 @@
+import numpy as np
+
+from GameOfLifeCensus import OBJECTS, orientations
+from GameOfLifeModel import GameOfLifeModel
+from GameOfLifePatterns import loadPattern, readPlaintext
+from GameOfLifeSearch import ObjectScanner, PatternIndex
+
+NAMES = ['glider', 'lightweight spaceship', 'eater 1', 'aircraft carrier']
+
+def test_objects_found_in_all_orientations():
+	""" the known objects are found in their 8 orientations, also in another phase after a few generations """
+	scanner = ObjectScanner(PatternIndex(directories = ()))
+	model = GameOfLifeModel(12 * len(NAMES) + 12, 12 * 8 + 12, historySize = 0)
+	placed = {}
+	for i, name in enumerate(NAMES):
+		for k, oriented in enumerate(orientations(readPlaintext(OBJECTS[name].replace('/', '\n')))):
+			top, left = 6 + 12 * i, 6 + 12 * k
+			rows, columns = np.nonzero(oriented)
+			model.setCells((rows + top, columns + left), 1)
+			placed[(top, left)] = name
+	matches = scanner.scan(model.getCurrentState())
+	assert {(match.top, match.left): match.getName() for match in matches} == placed
+	model.advance(2)
+	matches = scanner.scan(model.getCurrentState())
+	assert sorted(match.getName() for match in matches) == sorted(placed.values())
+
+def test_constellation_found_rotated():
+	""" a pattern made of several objects (the glider gun) is found in its 8 orientations """
+	gun, _ = loadPattern('knownPatterns/Gosper Glider Gun.npy')
+	scanner = ObjectScanner(PatternIndex(directories = ('knownPatterns/',)))
+	for oriented in orientations(np.asarray(gun) != 0):
+		board = np.zeros((oriented.shape[0] + 10, oriented.shape[1] + 10), dtype = np.int8)
+		board[5:-5, 5:-5] = oriented
+		scanner.reset()
+		assert 'Gosper Glider Gun' in [match.getName() for match in scanner.scan(board)]